@@ -0,0 +1,154 @@
+"""
+AG-UI payload size per turn on one long session, state deltas on vs off.
+
+Runs the real app in-process against bench.fakes and posts a growing
+CopilotKit conversation to the AG-UI endpoint, once with full
+STATE_SNAPSHOT sync and once with DeltaStateAGUIAgent's STATE_DELTA
+sync. Like CopilotKit, each run posts back the state the client holds,
+and deltas are applied on top of it. Reports total and state bytes per
+turn, and checks that the delta-reconstructed state matches full sync.
+
+Usage (from agent/):
+    python -m bench.agui_payload --turns 20
+"""
+
+import sys
+import json
+import uuid
+import asyncio
+import argparse
+from collections import Counter
+
+from bench import fakes
+
+fakes.install()
+
+import httpx  # noqa: E402
+
+from src import agui  # noqa: E402
+from src.main import app  # noqa: E402
+
+fakes.patch_probes()
+
+USER_TURNS = [
+    "Hi, I'm not really sure where to start with all of this.",
+    "The children must live with me during term time.",
+    "We need to share the school holidays fairly.",
+    "How much does a MIAM cost?",
+    "Red line: no relocation, they must stay in London.",
+    "Do I get a certificate afterwards?",
+]
+
+
+def apply_patch(state, ops: list):
+    """Minimal JSON Patch apply for the ops json_patch() produces."""
+    for op in ops:
+        if op["path"] == "":
+            state = op["value"]
+            continue
+        *parents, last = [
+            t.replace("~1", "/").replace("~0", "~") for t in op["path"].split("/")[1:]
+        ]
+        target = state
+        for token in parents:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        if op["op"] == "remove":
+            del target[last]
+        elif isinstance(target, list):
+            if last == "-":
+                target.append(op["value"])
+            else:
+                target[int(last)] = op["value"]
+        else:
+            target[last] = op["value"]
+    return state
+
+
+async def session(client: httpx.AsyncClient, turns: int) -> list:
+    thread_id = str(uuid.uuid4())
+    user = {"id": "bench-user", "name": "Sam"}
+    client_state = {"user": user}
+    messages = []
+    rows = []
+    for i in range(turns):
+        messages.append({"id": str(uuid.uuid4()), "role": "user", "content": USER_TURNS[i % len(USER_TURNS)]})
+        response = await client.post(
+            "/",
+            json={
+                "threadId": thread_id,
+                "runId": str(uuid.uuid4()),
+                "state": client_state,
+                "messages": list(messages),
+                "tools": [],
+                "context": [],
+                "forwardedProps": {},
+            },
+            headers={"accept": "text/event-stream"},
+        )
+        by_type = Counter()
+        state = client_state
+        consistent = True
+        for line in response.text.split("\n"):
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            by_type[event["type"]] += len(line) + 2
+            if event["type"] == "STATE_SNAPSHOT":
+                state = event["snapshot"]
+            elif event["type"] == "STATE_DELTA":
+                try:
+                    state = apply_patch(state, event["delta"])
+                except (KeyError, IndexError, TypeError, ValueError):
+                    consistent = False
+        rows.append({
+            "turn": i + 1,
+            "total": len(response.content),
+            "state": by_type["STATE_SNAPSHOT"] + by_type["STATE_DELTA"],
+            "raw": by_type["RAW"],
+            "state_messages": len(state.get("messages", [])) if isinstance(state, dict) else 0,
+            "consistent": consistent,
+        })
+        client_state = state
+        messages.append({"id": str(uuid.uuid4()), "role": "assistant", "content": fakes.REPLY})
+    return rows
+
+
+async def measure(turns: int, deltas: bool) -> list:
+    agui.AGUI_STATE_DELTAS = deltas
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        return await session(client, turns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--mediators", type=int, default=100)
+    args = parser.parse_args()
+
+    fakes.patch_database(args.mediators)
+    full = asyncio.run(measure(args.turns, deltas=False))
+    delta = asyncio.run(measure(args.turns, deltas=True))
+
+    print(f"{'turn':>4} {'total full':>11} {'total delta':>12} {'state full':>11} {'state delta':>12} {'raw':>9}")
+    for f, d in zip(full, delta):
+        print(f"{f['turn']:>4} {f['total']:>11} {d['total']:>12} {f['state']:>11} {d['state']:>12} {d['raw']:>9}")
+
+    def totals(rows, key):
+        return sum(r[key] for r in rows)
+
+    print(json.dumps({
+        "turns": args.turns,
+        "total_bytes": {"full": totals(full, "total"), "delta": totals(delta, "total")},
+        "state_bytes": {"full": totals(full, "state"), "delta": totals(delta, "state")},
+        "raw_bytes": totals(delta, "raw"),
+        "deltas_consistent": all(r["consistent"] for r in delta),
+        "final_state_messages": {"full": full[-1]["state_messages"], "delta": delta[-1]["state_messages"]},
+    }, indent=2))
+    if not all(r["consistent"] for r in delta) or full[-1]["state_messages"] != delta[-1]["state_messages"]:
+        print("[BENCH] Delta-reconstructed state does not match full sync", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Checkpoint write amplification and load time: MemorySaver vs CompactingSaver.
+
+Runs one long conversation through the real agent graph (scripted model
+from bench.fakes, with no artificial latency) on each checkpointer and
+reports, per turn, bytes serialised and bytes held, then the time to
+load the thread's latest state. Write amplification is bytes serialised
+over the size of the final message history serialised once (plain
+msgpack, uncompressed).
+
+Usage (from agent/):
+    python -m bench.checkpoint --turns 40
+"""
+
+import os
+
+os.environ.setdefault("FAKE_LLM_FIRST_TOKEN_MS", "0")
+os.environ.setdefault("FAKE_LLM_PER_CHUNK_MS", "0")
+
+import re  # noqa: E402
+import sys  # noqa: E402
+import json  # noqa: E402
+import time  # noqa: E402
+import asyncio  # noqa: E402
+import argparse  # noqa: E402
+
+from bench import fakes  # noqa: E402
+
+fakes.install()
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+from langgraph.checkpoint.memory import InMemorySaver  # noqa: E402
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer  # noqa: E402
+
+from src.agent import build_agent  # noqa: E402
+from src.checkpoint import CompactingSaver  # noqa: E402
+
+# capture_position mints a random id per item, so the two runs differ there
+POSITION_ID = re.compile(r'"id": "[0-9a-f-]+"')
+
+USER_TURNS = [
+    "The children must live with me during term time.",
+    "How much does a MIAM cost?",
+    "We need to share the school holidays fairly.",
+    "Can you find a mediator near me in London?",
+    "Red line: no relocation, they must stay in London.",
+    "Do I get a certificate afterwards?",
+]
+
+
+class CountingSerializer:
+    """Wraps a saver's serializer to count bytes written."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.written = 0
+
+    def dumps_typed(self, obj):
+        type_, data = self.inner.dumps_typed(obj)
+        self.written += len(data)
+        return type_, data
+
+    def loads_typed(self, data):
+        return self.inner.loads_typed(data)
+
+
+def held_bytes(saver) -> int:
+    if isinstance(saver, CompactingSaver):
+        return saver.storage_bytes()
+    total = sum(
+        len(cp[1]) + len(md[1])
+        for namespaces in saver.storage.values()
+        for checkpoints in namespaces.values()
+        for cp, md, _ in checkpoints.values()
+    )
+    total += sum(len(blob[1]) for blob in saver.blobs.values())
+    total += sum(len(w[2][1]) for writes in saver.writes.values() for w in writes.values())
+    return total
+
+
+async def run(saver, turns: int, loads: int) -> dict:
+    counting = CountingSerializer(saver.serde)
+    saver.serde = counting
+    graph = build_agent(checkpointer=saver)
+    config = {"configurable": {"thread_id": "bench-thread"}}
+    rows = []
+    for i in range(turns):
+        await graph.ainvoke({"messages": [HumanMessage(content=USER_TURNS[i % len(USER_TURNS)])]}, config)
+        rows.append({"turn": i + 1, "written": counting.written, "held": held_bytes(saver)})
+
+    state = await graph.aget_state(config)
+    messages = state.values["messages"]
+    history_bytes = len(JsonPlusSerializer().dumps_typed(messages)[1])
+
+    started = time.perf_counter()
+    for _ in range(loads):
+        await graph.aget_state(config)
+    load_ms = (time.perf_counter() - started) / loads * 1000
+
+    return {
+        "rows": rows,
+        "messages": len(messages),
+        "contents": [POSITION_ID.sub('"id": "<id>"', str(m.content)) for m in messages],
+        "history_bytes": history_bytes,
+        "write_amplification": round(counting.written / history_bytes, 1),
+        "load_ms": round(load_ms, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--loads", type=int, default=50)
+    args = parser.parse_args()
+
+    fakes.patch_database(100)
+    baseline = asyncio.run(run(InMemorySaver(), args.turns, args.loads))
+    compact = asyncio.run(run(CompactingSaver(), args.turns, args.loads))
+
+    print(f"{'turn':>4} {'written mem':>12} {'written cmp':>12} {'held mem':>10} {'held cmp':>10}")
+    for b, c in zip(baseline["rows"], compact["rows"]):
+        if b["turn"] % max(1, args.turns // 10) == 0 or b["turn"] == 1:
+            print(f"{b['turn']:>4} {b['written']:>12} {c['written']:>12} {b['held']:>10} {c['held']:>10}")
+
+    print(json.dumps({
+        name: {k: v for k, v in result.items() if k not in ("rows", "contents")}
+        for name, result in (("memory_saver", baseline), ("compacting_saver", compact))
+    }, indent=2))
+    if baseline["contents"] != compact["contents"]:
+        print("[BENCH] Final message history differs between checkpointers", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
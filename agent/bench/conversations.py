@@ -0,0 +1,211 @@
+"""
+Conversation recording benchmark: per-turn writes vs batched appends.
+
+Simulates --sessions concurrent voice calls of --turns turns each (one
+turn every --turn-seconds, staggered) on a virtual clock, with the
+flusher running once a second, and compares:
+
+    per_turn   one conversation_sessions write per turn on the request
+               path (what a naive recorder would do)
+    batched    src.conversations: record_turn() on the request path,
+               CONVERSATION_FLUSH_TURNS / CONVERSATION_FLUSH_SECONDS
+               batches, and the final update when each session ends
+
+It reports the request-path cost of record_turn(), database statements
+and rows written, and checks, by replaying the upserts, that every
+session ends with its full transcript, turn count, items captured and
+exactly one final write. It also checks that a batch which fails after
+one of its recordings was finished is retried with that row once, that
+a row the database keeps rejecting is retried alone and then dropped
+without holding back the rest, that an outage drops nothing, that NULs
+never reach a row, and exits 1 if any check fails.
+
+Usage (from agent/):
+    python -m bench.conversations --sessions 200 --turns 20
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import types
+import asyncio
+import argparse
+
+import psycopg2
+
+from bench import fakes
+
+fakes.install()
+
+from src import conversations  # noqa: E402
+from src.state import Position  # noqa: E402
+
+USER_TURN = "I want the children to live with me during term time"
+REPLY = fakes.REPLY
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def replay(batches: list) -> dict:
+    """Apply the upserts the way UPSERT_SQL does, keyed by row id."""
+    rows = {}
+    for batch in batches:
+        for (row_id, user_id, kind, started_at, ended_at, duration, topics, items, chunk, metadata) in batch:
+            row = rows.setdefault(row_id, {"transcript": "", "ended_at": None, "finals": 0})
+            row["transcript"] += chunk
+            row.update(topics=topics, items=items, metadata=json.loads(metadata))
+            if ended_at is not None:
+                row["ended_at"] = ended_at
+                row["duration_minutes"] = duration
+                row["finals"] += 1
+    return rows
+
+
+def restore_after_finish() -> dict:
+    """take_due -> finish -> failed write (restore) -> take_due: one row, one chunk."""
+    recorder = conversations.ConversationRecorder()
+    recorder.record_turn("k", str(uuid.uuid4()), "voice", USER_TURN, REPLY)
+    due = recorder.take_due(now=time.monotonic() + conversations.CONVERSATION_FLUSH_SECONDS)
+    recorder.finish("k")
+    recorder.restore(due)
+    retried = recorder.take_due()
+    rows = [recording.row(chunk) for recording, chunk in retried]
+    ok = len(rows) == 1 and rows[0][8] == due[0][1] and rows[0][4] is not None and recorder.take_due() == []
+    return {"rows": len(rows), "ok": ok}
+
+
+async def poison_row() -> dict:
+    """One row the database rejects, then an outage: who gets written, kept, dropped."""
+    conversations.recorder = recorder = conversations.ConversationRecorder()
+    written, outage = [], [False]
+
+    def write(rows):
+        if outage[0]:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        if any("poison" in row[8] for row in rows):
+            raise psycopg2.DataError("invalid input syntax")
+        written.extend(rows)
+
+    conversations._write_batch = write
+    for key in ("a", "b", "poison"):
+        recorder.record_turn(key, str(uuid.uuid4()), "voice", f"{key}\x00 turn", REPLY)
+    later = time.monotonic() + conversations.CONVERSATION_FLUSH_SECONDS
+    step = conversations.CONVERSATION_FLUSH_SECONDS
+    dropped = conversations.DROPPED.value(reason="row_failed")
+    for attempt in range(conversations.CONVERSATION_MAX_ATTEMPTS):
+        await conversations.flush(now=later + attempt * step)
+    healthy_written = sorted(row[8].split(" ")[1] for row in written) == ["a", "b"]
+    poison_dropped = conversations.DROPPED.value(reason="row_failed") - dropped == 1
+
+    outage[0] = True
+    recorder.record_turn("a", str(uuid.uuid4()), "voice", USER_TURN, REPLY)
+    for attempt in range(conversations.CONVERSATION_MAX_ATTEMPTS + 1):
+        await conversations.flush(now=later + (conversations.CONVERSATION_MAX_ATTEMPTS + attempt) * step)
+    kept = [chunk for _, chunk in recorder.take_due(now=later + 10 * step) if chunk]
+    kept = len(kept) == 1 and USER_TURN in kept[0] and conversations.DROPPED.value(reason="row_failed") - dropped == 1
+    return {
+        "healthy_written": healthy_written,
+        "poison_dropped": poison_dropped,
+        "kept_through_outage": kept,
+        "nul_free": all("\x00" not in row[8] for row in written),
+        "ok": healthy_written and poison_dropped and kept and all("\x00" not in row[8] for row in written),
+    }
+
+
+def record_turn_cost(rounds: int = 20000) -> float:
+    recorder = conversations.ConversationRecorder()
+    user_id = str(uuid.uuid4())
+    captured = [Position("p1", 0, 0, "Term time with me")]
+    started = time.perf_counter()
+    for i in range(rounds):
+        recorder.record_turn(f"bench-{i % 50}", user_id, "voice", USER_TURN, REPLY, captured if i % 5 == 0 else ())
+    return round((time.perf_counter() - started) / rounds * 1e6, 2)
+
+
+async def simulate(sessions: int, turns: int, turn_seconds: float, idle_seconds: float) -> dict:
+    clock = Clock()
+    conversations.time = types.SimpleNamespace(monotonic=clock.monotonic)
+    conversations.CONVERSATION_IDLE_SECONDS = idle_seconds
+    conversations.recorder = recorder = conversations.ConversationRecorder()
+
+    batches = []
+    conversations._write_batch = batches.append
+
+    keys = [f"miam_Sam|{uuid.uuid4()}" for _ in range(sessions)]
+    users = {key: key.split("|")[1] for key in keys}
+    # Session i starts at second i % turn_seconds and speaks every turn_seconds
+    end = turns * turn_seconds + turn_seconds + idle_seconds + 2
+    second = 0
+    while second <= end:
+        clock.now = 1000.0 + second
+        for i, key in enumerate(keys):
+            offset = second - (i % int(turn_seconds))
+            if offset >= 0 and offset % int(turn_seconds) == 0 and offset // int(turn_seconds) < turns:
+                turn = offset // int(turn_seconds)
+                captured = [Position(f"{key}-{turn}", 0, turn % 12, "item")] if turn % 4 == 0 else ()
+                recorder.record_turn(key, users[key], "voice", f"{USER_TURN} ({turn})", REPLY, captured)
+        await conversations.flush()
+        second += 1
+
+    rows = replay(batches)
+    expected_items = len(range(0, turns, 4))
+    complete = sum(
+        1 for row in rows.values()
+        if row["transcript"].count("User: ") == turns and row["metadata"]["turns"] == turns
+        and row["items"] == expected_items and row["finals"] == 1
+    )
+    return {
+        "statements": len(batches),
+        "rows_written": sum(len(batch) for batch in batches),
+        "sessions_recorded": len(rows),
+        "sessions_complete_and_final_once": complete,
+        "left_open": recorder.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--turn-seconds", type=float, default=8)
+    parser.add_argument("--idle-seconds", type=float, default=60)
+    args = parser.parse_args()
+
+    fakes.patch_database(10)
+    db_latency_ms = float(os.environ.get("FAKE_DB_LATENCY_MS", "0")) or 20.0
+    total_turns = args.sessions * args.turns
+
+    restore = restore_after_finish()
+    poison = asyncio.run(poison_row())
+    batched = asyncio.run(simulate(args.sessions, args.turns, args.turn_seconds, args.idle_seconds))
+    results = {
+        "turns": total_turns,
+        "per_turn": {
+            "statements": total_turns,
+            "request_path_ms_per_turn": db_latency_ms,  # one DB round trip (FAKE_DB_LATENCY_MS or 20)
+        },
+        "batched": {
+            **batched,
+            "request_path_us_per_turn": record_turn_cost(),
+            "flush_turns": conversations.CONVERSATION_FLUSH_TURNS,
+            "flush_seconds": conversations.CONVERSATION_FLUSH_SECONDS,
+        },
+        "restore_after_finish": restore,
+        "poison_row": poison,
+    }
+    print(json.dumps(results, indent=2))
+    if not restore["ok"] or not poison["ok"] or batched["sessions_complete_and_final_once"] != args.sessions:
+        print("[BENCH] Conversation recording check failed", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
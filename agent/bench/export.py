@@ -0,0 +1,116 @@
+"""
+Document export benchmark: render cost, event-loop stalls and cache hits.
+
+Seeds a large case in the SQLite stand-in from bench.fakes and exports
+its preparation summary through the real FastAPI endpoint. Reports the
+cold (process pool) and cached request latency per format, and the
+longest event-loop stall seen while a cold render is in flight, against
+the same render done inline on the loop. It also checks that callers
+without a valid identity token, other users and malformed case ids are
+refused.
+
+Usage (from agent/):
+    python -m bench.export --positions 2000
+"""
+
+import os
+import time
+import json
+import uuid
+import asyncio
+import tempfile
+import argparse
+
+os.environ.setdefault("EXPORT_CACHE_DIR", tempfile.mkdtemp(prefix="miam-export-bench-"))
+os.environ.setdefault("AGENT_AUTH_SECRET", "bench-secret")
+
+from bench import fakes  # noqa: E402
+
+fakes.install()
+
+import httpx  # noqa: E402
+
+from src import export, identity, render, summary  # noqa: E402
+from src.main import app  # noqa: E402
+
+
+async def max_stall(task, interval: float = 0.005) -> float:
+    """Longest gap between event-loop ticks (ms) while task runs."""
+    worst = 0.0
+    last = time.perf_counter()
+    while not task.done():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        worst = max(worst, now - last - interval)
+        last = now
+    await task
+    return worst * 1000
+
+
+def bearer(user_id: str, signature: str = "") -> dict:
+    token = identity.sign(user_id)
+    if signature:
+        token = token.rsplit(".", 1)[0] + "." + signature
+    return {"authorization": f"Bearer {token}"}
+
+
+async def timed(client: httpx.AsyncClient, url: str) -> dict:
+    started = time.perf_counter()
+    size = 0
+    async with client.stream("GET", url, headers=bearer(fakes.BENCH_USER_ID)) as response:
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+    return {
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+        "bytes": size,
+        "cache": response.headers.get("x-export-cache"),
+    }
+
+
+async def run(case_id: str) -> dict:
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        # Start the pool outside the timings
+        await asyncio.get_running_loop().run_in_executor(export.get_pool(), len, "warm")
+        for fmt in export.MEDIA_TYPES:
+            url = f"/cases/{case_id}/documents/{summary.DOC_TYPE}/export?format={fmt}"
+            cold = asyncio.ensure_future(timed(client, url))
+            stall = await max_stall(cold)
+            results[fmt] = {"cold": cold.result(), "cold_max_stall_ms": round(stall, 1), "cached": await timed(client, url)}
+        owner = bearer(fakes.BENCH_USER_ID)
+        malformed = url.replace(case_id, "not-a-case")
+        results["refused"] = {
+            "no_token": (await client.get(url)).status_code,
+            "claimed_user_header": (await client.get(url, headers={"x-user-id": fakes.BENCH_USER_ID})).status_code,
+            "forged_token": (await client.get(url, headers=bearer(fakes.BENCH_USER_ID, "x"))).status_code,
+            "other_user": (await client.get(url, headers=bearer(str(uuid.uuid4())))).status_code,
+            "malformed_case_id": (await client.get(malformed, headers=owner)).status_code,
+        }
+
+    content = summary.generate(case_id, fakes.BENCH_USER_ID)["content"]
+    for fmt, writer in render.WRITERS.items():
+        async def inline():
+            await asyncio.sleep(0.01)
+            with open(os.devnull, "wb") as out:
+                writer(out, summary.TITLE, content)
+        results[fmt]["inline_max_stall_ms"] = round(await max_stall(asyncio.ensure_future(inline())), 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", type=int, default=2000)
+    args = parser.parse_args()
+
+    fakes.patch_database(100)
+    fakes.seed_positions(fakes.BENCH_EXPORT_CASE_ID, args.positions)
+    summary.generate(fakes.BENCH_EXPORT_CASE_ID, fakes.BENCH_USER_ID)
+    try:
+        print(json.dumps(asyncio.run(run(fakes.BENCH_EXPORT_CASE_ID)), indent=2))
+    finally:
+        export.shutdown()
+
+
+if __name__ == "__main__":
+    main()
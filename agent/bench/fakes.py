@@ -0,0 +1,433 @@
+"""
+Deterministic stand-ins for Gemini, Zep and Neon.
+
+install() must run before anything under src/ is imported: it swaps the
+chat model class used by src.llm.make_chat_model and the Zep client
+class, so build_agent() and the FastAPI app are built exactly as in
+production but never leave the process. patch_database() points
+src.db.get_connection at a shared in-memory SQLite database seeded with
+a mediators table.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+# =============================================================================
+# Fake Chat Model
+# =============================================================================
+
+REPLY = (
+    "I hear how much this matters to you. What matters most is what works best for "
+    "your children, so let's take this one step at a time. Would you say that is a "
+    "must-have for you, or something you could be flexible on? When you're ready we "
+    "can look at living arrangements, school, and holidays together."
+)
+
+# (keyword pattern, tool name, args) checked against the latest user message
+TOOL_SCRIPT = [
+    (re.compile(r"mediator", re.I), "search_mediators", {"location": "London"}),
+    (re.compile(r"exempt|abuse|prison|abroad", re.I), "check_exemption_eligibility", {"circumstances": "domestic_abuse"}),
+    (re.compile(r"cost|price|\bfees?\b", re.I), "get_miam_info", {"topic": "cost"}),
+    (re.compile(r"certificate", re.I), "get_miam_info", {"topic": "certificate"}),
+    (re.compile(r"must|need|red line", re.I), "capture_position", {
+        "category": "must_have", "topic": "living_arrangements", "item": "Children live with me in term time",
+    }),
+    (re.compile(r"remember|last time", re.I), "load_user_memory", {"user_id": "bench-user"}),
+]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Scripted, deterministic chat model.
+
+    Accepts the same constructor arguments as ChatGoogleGenerativeAI.
+    Calls every scripted tool whose TOOL_SCRIPT pattern matches the latest
+    user message (once per tool, all in one step), then answers with
+    REPLY once tool results are in.
+    Latency is simulated as a time-to-first-token plus a per-chunk delay.
+    """
+
+    model: str = "fake-gemini"
+    temperature: float = 0.7
+    google_api_key: Any = None
+    timeout: Any = None
+    max_retries: int = 0
+    first_token_ms: float = float(os.environ.get("FAKE_LLM_FIRST_TOKEN_MS", "150"))
+    per_chunk_ms: float = float(os.environ.get("FAKE_LLM_PER_CHUNK_MS", "5"))
+    error_rate: float = float(os.environ.get("FAKE_LLM_ERROR_RATE", "0"))
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self
+
+    def _respond(self, messages) -> AIMessage:
+        last = messages[-1] if messages else None
+        input_tokens = sum(len(str(getattr(m, "content", "")).split()) for m in messages)
+
+        if getattr(last, "type", "") == "human":
+            text = str(last.content)
+            calls = {}
+            for pattern, name, args in TOOL_SCRIPT:
+                if name not in calls and pattern.search(text):
+                    calls[name] = {"name": name, "args": dict(args), "id": f"call_{abs(hash((text, name))) % 10**8}"}
+            if calls:
+                output_tokens = 12 * len(calls)
+                return AIMessage(
+                    content="",
+                    tool_calls=list(calls.values()),
+                    usage_metadata={
+                        "input_tokens": input_tokens,
+                        "output_tokens": output_tokens,
+                        "total_tokens": input_tokens + output_tokens,
+                    },
+                )
+
+        output_tokens = len(REPLY.split())
+        return AIMessage(
+            content=REPLY,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+
+    def _maybe_fail(self):
+        if self.error_rate and random.random() < self.error_rate:
+            raise ConnectionError("scripted fake failure")
+
+    def _generation_seconds(self, message: AIMessage) -> float:
+        """Non-streaming calls take as long as streaming the whole answer."""
+        chunks = len(message.content.split(" ")) if message.content else 1
+        return (self.first_token_ms + self.per_chunk_ms * chunks) / 1000
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._respond(messages)
+        time.sleep(self._generation_seconds(message))
+        self._maybe_fail()
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._respond(messages)
+        await asyncio.sleep(self._generation_seconds(message))
+        self._maybe_fail()
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_ms / 1000)
+        self._maybe_fail()
+        message = self._respond(messages)
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                    for i, c in enumerate(message.tool_calls)
+                ],
+                usage_metadata=message.usage_metadata,
+            ))
+            return
+        words = message.content.split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.per_chunk_ms / 1000)
+            last = i == len(words) - 1
+            chunk = AIMessageChunk(
+                content=word + ("" if last else " "),
+                usage_metadata=message.usage_metadata if last else None,
+            )
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+# =============================================================================
+# Fake Zep
+# =============================================================================
+
+class _Obj:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class _FakeUsers:
+    def __init__(self, store, latency):
+        self._store = store
+        self._latency = latency
+
+    def get(self, user_id, request_options=None):
+        time.sleep(self._latency)
+        if user_id not in self._store:
+            from zep_cloud import NotFoundError
+            raise NotFoundError(body="not found")
+        return self._store[user_id]
+
+    def add(self, user_id, email=None, first_name=None, last_name=None, request_options=None):
+        time.sleep(self._latency)
+        self._store[user_id] = _Obj(user_id=user_id, email=email, first_name=first_name, last_name=last_name)
+        return self._store[user_id]
+
+    def get_context(self, user_id, min_score=None, request_options=None):
+        time.sleep(self._latency)
+        return _Obj(facts=[_Obj(fact="Has two children aged 6 and 9"), _Obj(fact="Prefers remote sessions")])
+
+    def list_ordered(self, page_number=None, page_size=None, request_options=None):
+        return _Obj(users=list(self._store.values())[:page_size or 10])
+
+
+class _FakeGraph:
+    def __init__(self, latency):
+        self._latency = latency
+        self.episodes = 0
+
+    def add(self, user_id=None, type=None, data=None, request_options=None, **kwargs):
+        time.sleep(self._latency)
+        self.episodes += 1
+
+
+class FakeZep:
+    """In-process Zep client with the call shapes the agent uses."""
+
+    latency = float(os.environ.get("FAKE_ZEP_LATENCY_MS", "20")) / 1000
+    _users = {}
+
+    def __init__(self, api_key=None, **kwargs):
+        self.user = _FakeUsers(self._users, self.latency)
+        self.graph = _FakeGraph(self.latency)
+
+
+# =============================================================================
+# Fake Neon (SQLite)
+# =============================================================================
+
+SQLITE_URI = "file:miam_bench?mode=memory&cache=shared"
+# Simulated Neon round trip per statement
+DB_LATENCY = float(os.environ.get("FAKE_DB_LATENCY_MS", "0")) / 1000
+
+MEDIATORS_DDL = """
+CREATE TABLE IF NOT EXISTS mediators (
+    id TEXT PRIMARY KEY, name TEXT NOT NULL, fmc_accredited BOOLEAN DEFAULT 1,
+    fmc_number TEXT, specializations TEXT, location TEXT, postcode TEXT,
+    remote_available BOOLEAN DEFAULT 1, in_person_available BOOLEAN DEFAULT 1,
+    miam_cost INTEGER, legal_aid_available BOOLEAN DEFAULT 0, is_active BOOLEAN DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_mediators_location ON mediators(location);
+CREATE INDEX IF NOT EXISTS idx_mediators_postcode ON mediators(postcode);
+"""
+
+CASE_DDL = """
+CREATE TABLE IF NOT EXISTS cases (
+    id TEXT PRIMARY KEY, party_a_id TEXT NOT NULL, party_b_id TEXT
+);
+CREATE TABLE IF NOT EXISTS position_items (
+    id TEXT PRIMARY KEY, case_id TEXT NOT NULL, user_id TEXT NOT NULL,
+    category TEXT NOT NULL, topic TEXT NOT NULL, item TEXT NOT NULL, context TEXT,
+    importance INTEGER, created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_position_items_case ON position_items(case_id);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, case_id TEXT NOT NULL, user_id TEXT,
+    doc_type TEXT NOT NULL, title TEXT NOT NULL, content TEXT NOT NULL,
+    status TEXT DEFAULT 'draft', version INTEGER DEFAULT 1, metadata TEXT DEFAULT '{}',
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_documents_case ON documents(case_id);
+"""
+
+# party_a_id of every seeded case, and the cases the benches seed
+BENCH_USER_ID = "00000000-0000-4000-8000-000000000001"
+BENCH_CASE_ID = "00000000-0000-4000-8000-0000000000ca"
+BENCH_EXPORT_CASE_ID = "00000000-0000-4000-8000-0000000000ce"
+
+POSITION_ITEMS = [
+    "The children live with me during term time",
+    "Alternate weekends with the other parent",
+    "Christmas split between households each year",
+    "School runs shared on weekdays",
+    "No relocation outside the area",
+    "Weekly video calls when away",
+]
+
+CITIES = [
+    ("London", "EC1A"), ("Manchester", "M1"), ("Birmingham", "B1"), ("Bristol", "BS1"),
+    ("Leeds", "LS1"), ("Liverpool", "L1"), ("Sheffield", "S1"), ("Newcastle", "NE1"),
+    ("Nottingham", "NG1"), ("Cardiff", "CF10"), ("Brighton", "BN1"), ("Oxford", "OX1"),
+]
+
+
+def _translate(query: str) -> Optional[str]:
+    """Postgres -> SQLite for the statements the agent issues."""
+    stripped = query.strip()
+    if stripped.upper().startswith("SET "):
+        return None
+    # SQLite serialises writers itself and has no row locks
+    return query.replace("%s", "?").replace("ILIKE", "LIKE").replace(" FOR UPDATE", "")
+
+
+class _Cursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def execute(self, query, params=()):
+        translated = _translate(query)
+        if translated is not None:
+            if DB_LATENCY:
+                time.sleep(DB_LATENCY)
+            self._cursor.execute(translated, tuple(params or ()))
+
+    def executemany(self, query, rows):
+        translated = _translate(query)
+        if translated is not None:
+            self._cursor.executemany(translated, rows)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def close(self):
+        self._cursor.close()
+
+
+class _Connection:
+    closed = False
+
+    def __init__(self):
+        self._conn = sqlite3.connect(SQLITE_URI, uri=True, check_same_thread=False)
+
+    def cursor(self):
+        return _Cursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+
+# Keeps the shared in-memory database alive for the life of the process
+_keepalive = None
+_seed_lock = threading.Lock()
+
+
+def seed_mediators(rows: int = 500, seed: int = 7):
+    """Create and fill the mediators table with deterministic rows."""
+    global _keepalive
+    with _seed_lock:
+        if _keepalive is None:
+            _keepalive = sqlite3.connect(SQLITE_URI, uri=True, check_same_thread=False)
+        conn = _keepalive
+        conn.executescript(MEDIATORS_DDL)
+        conn.execute("DELETE FROM mediators")
+        rng = random.Random(seed)
+        conn.executemany(
+            "INSERT INTO mediators VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, 1)",
+            [
+                (
+                    f"{i:08d}", f"Mediator {i:05d}", f"FMC{i:05d}",
+                    json.dumps(["child_arrangements"]), *CITIES[i % len(CITIES)],
+                    rng.random() < 0.8, rng.random() < 0.7, rng.randint(90, 150) * 100, rng.random() < 0.4,
+                )
+                for i in range(rows)
+            ],
+        )
+        conn.commit()
+
+
+def seed_positions(case_id: str, rows: int = 50, seed: int = 7):
+    """Create the case tables and give case_id `rows` position items."""
+    from src.state import POSITION_CATEGORIES, POSITION_TOPICS
+
+    global _keepalive
+    with _seed_lock:
+        if _keepalive is None:
+            _keepalive = sqlite3.connect(SQLITE_URI, uri=True, check_same_thread=False)
+        conn = _keepalive
+        conn.executescript(CASE_DDL)
+        conn.execute("INSERT OR REPLACE INTO cases (id, party_a_id) VALUES (?, ?)", (case_id, BENCH_USER_ID))
+        conn.execute("DELETE FROM position_items WHERE case_id = ?", (case_id,))
+        rng = random.Random(seed)
+        conn.executemany(
+            "INSERT INTO position_items (id, case_id, user_id, category, topic, item, context, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    f"{case_id}-{i:06d}", case_id, BENCH_USER_ID, rng.choice(POSITION_CATEGORIES), rng.choice(POSITION_TOPICS),
+                    rng.choice(POSITION_ITEMS), None if rng.random() < 0.7 else "Raised in conversation",
+                    f"2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}",
+                )
+                for i in range(rows)
+            ],
+        )
+        conn.commit()
+
+
+@contextmanager
+def sqlite_connection():
+    conn = _Connection()
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn._conn.close()
+
+
+# =============================================================================
+# Installation
+# =============================================================================
+
+def install():
+    """Swap Gemini and Zep for fakes; call before importing src.*"""
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    os.environ.setdefault("ZEP_API_KEY", "fake-key")
+    os.environ.setdefault("USAGE_FLUSH_SECONDS", "86400")
+    os.environ.setdefault("READINESS_PROBE_INTERVAL", "3600")
+    os.environ.pop("DATABASE_URL", None)
+
+    import langchain_google_genai
+    import zep_cloud.client
+
+    langchain_google_genai.ChatGoogleGenerativeAI = ScriptedChatModel
+    zep_cloud.client.Zep = FakeZep
+
+
+def patch_database(rows: int = 500):
+    """Point src.db at the seeded SQLite stand-in; token_usage and conversation_sessions writes are dropped."""
+    from src import conversations, db, usage
+
+    seed_mediators(rows)
+    db.get_connection = sqlite_connection
+    db.get_database_url = lambda: SQLITE_URI
+    db.ping = lambda: True
+    usage._write_batch = lambda pending: None
+    conversations._write_batch = lambda rows: None
+
+
+def patch_probes():
+    """Replace network readiness probes with always-healthy fakes."""
+    from src import health
+
+    for name in ("llm", "database", "memory"):
+        health.register_probe(name, lambda: None)
@@ -0,0 +1,290 @@
+"""
+Load test for the MIAM.quest agent against local fakes.
+
+Starts the real FastAPI app (real build_agent graph, middleware and
+endpoints) with Gemini, Zep and Neon replaced by bench.fakes, then
+drives multi-turn Hume /chat/completions and AG-UI conversations at a
+fixed concurrency and reports throughput, TTFB, latency percentiles and
+RSS growth. Results are written as JSON tagged with the git commit so
+runs can be compared across commits.
+
+Usage (from agent/):
+    python -m bench.loadtest --concurrency 16 --conversations 64
+    python -m bench.loadtest --compare bench/results/<earlier>.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+
+from bench import fakes
+
+fakes.install()
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from src.main import app  # noqa: E402
+
+fakes.patch_probes()
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+USER_TURNS = [
+    "Hi, I'm not really sure where to start with all of this.",
+    "The main thing is the children need to live with me during term time.",
+    "How much does a MIAM cost?",
+    "Can you find a mediator near me in London?",
+    "I'm worried about what happens at the meeting.",
+    "Do I get a certificate afterwards?",
+    "I think we could be flexible on the holidays.",
+    "Thanks, that really helps.",
+]
+
+
+# =============================================================================
+# Helpers
+# =============================================================================
+
+def rss_kb() -> int:
+    """Resident set size of this process (server and client share it)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples: list) -> dict:
+    ok = [s for s in samples if s["ok"]]
+    ttfb = [s["ttfb_ms"] for s in ok]
+    total = [s["total_ms"] for s in ok]
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "ttfb_ms": {"p50": percentile(ttfb, 0.50), "p95": percentile(ttfb, 0.95), "p99": percentile(ttfb, 0.99)},
+        "latency_ms": {"p50": percentile(total, 0.50), "p95": percentile(total, 0.95), "p99": percentile(total, 0.99)},
+        "bytes": sum(s["bytes"] for s in ok),
+    }
+
+
+# =============================================================================
+# Conversations
+# =============================================================================
+
+async def timed_stream(client: httpx.AsyncClient, url: str, payload: dict, headers: dict) -> dict:
+    started = time.perf_counter()
+    ttfb = None
+    size = 0
+    try:
+        async with client.stream("POST", url, json=payload, headers=headers) as response:
+            async for chunk in response.aiter_bytes():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+                size += len(chunk)
+            ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    total = time.perf_counter() - started
+    return {
+        "ok": ok,
+        "ttfb_ms": round((ttfb or total) * 1000, 2),
+        "total_ms": round(total * 1000, 2),
+        "bytes": size,
+    }
+
+
+async def clm_conversation(client: httpx.AsyncClient, turns: int, rng: random.Random) -> list:
+    """One Hume EVI call: the full messages array grows every turn."""
+    session = f"miam_Sam|{uuid.uuid4()}"
+    messages = [{"role": "system", "content": "You are Miam."}]
+    samples = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": USER_TURNS[(i + rng.randrange(len(USER_TURNS))) % len(USER_TURNS)]})
+        sample = await timed_stream(
+            client,
+            f"/chat/completions?custom_session_id={session}",
+            {"model": "miam", "messages": list(messages), "stream": True},
+            {"accept": "text/event-stream"},
+        )
+        samples.append(sample)
+        messages.append({"role": "assistant", "content": fakes.REPLY})
+    return samples
+
+
+async def agui_conversation(client: httpx.AsyncClient, turns: int, rng: random.Random) -> list:
+    """One CopilotKit chat: each run posts the thread's messages and state."""
+    thread_id = str(uuid.uuid4())
+    user = {"id": str(uuid.uuid4()), "name": "Sam", "email": "sam@example.com"}
+    messages = []
+    samples = []
+    for i in range(turns):
+        messages.append({
+            "id": str(uuid.uuid4()),
+            "role": "user",
+            "content": USER_TURNS[(i + rng.randrange(len(USER_TURNS))) % len(USER_TURNS)],
+        })
+        sample = await timed_stream(
+            client,
+            "/",
+            {
+                "threadId": thread_id,
+                "runId": str(uuid.uuid4()),
+                "state": {"user": user},
+                "messages": list(messages),
+                "tools": [],
+                "context": [],
+                "forwardedProps": {},
+            },
+            {"accept": "text/event-stream"},
+        )
+        samples.append(sample)
+        messages.append({"id": str(uuid.uuid4()), "role": "assistant", "content": fakes.REPLY})
+    return samples
+
+
+async def drive(base_url: str, mode: str, conversations: int, turns: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+    runner = clm_conversation if mode == "clm" else agui_conversation
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def one():
+            async with semaphore:
+                return await runner(client, turns, random.Random(rng.random()))
+
+        rss_before = rss_kb()
+        started = time.perf_counter()
+        results = await asyncio.gather(*[one() for _ in range(conversations)])
+        elapsed = time.perf_counter() - started
+        rss_after = rss_kb()
+
+    samples = [s for conversation in results for s in conversation]
+    report = summarize(samples)
+    report.update({
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "rss_kb_before": rss_before,
+        "rss_kb_after": rss_after,
+        "rss_growth_kb": rss_after - rss_before,
+    })
+    return report
+
+
+# =============================================================================
+# Server
+# =============================================================================
+
+class BackgroundServer:
+    """uvicorn on a daemon thread so the client and app share one process."""
+
+    def __init__(self, port: int):
+        config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def compare(current: dict, baseline: dict):
+    print(f"\nvs {baseline.get('commit')} ({baseline.get('timestamp')})")
+    for mode, report in current["modes"].items():
+        base = baseline.get("modes", {}).get(mode)
+        if not base:
+            continue
+        for key, getter in [
+            ("throughput_rps", lambda r: r["throughput_rps"]),
+            ("ttfb_p99_ms", lambda r: r["ttfb_ms"]["p99"]),
+            ("latency_p99_ms", lambda r: r["latency_ms"]["p99"]),
+            ("rss_growth_kb", lambda r: r["rss_growth_kb"]),
+        ]:
+            now, then = getter(report), getter(base)
+            change = f"{(now - then) / then * 100:+.1f}%" if then else "n/a"
+            print(f"  {mode:5} {key:16} {then:>10} -> {now:>10}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["clm", "agui", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--conversations", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--mediators", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    fakes.patch_database(args.mediators)
+    modes = ["clm", "agui"] if args.mode == "both" else [args.mode]
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            **{k: v for k, v in vars(args).items() if k not in ("compare", "no_save")},
+            "fake_llm_first_token_ms": fakes.ScriptedChatModel.model_fields["first_token_ms"].default,
+            "fake_zep_latency_ms": fakes.FakeZep.latency * 1000,
+        },
+        "modes": {},
+    }
+
+    with BackgroundServer(args.port):
+        base_url = f"http://127.0.0.1:{args.port}"
+        for mode in modes:
+            print(f"[BENCH] {mode}: {args.conversations} conversations x {args.turns} turns, "
+                  f"concurrency {args.concurrency}", file=sys.stderr)
+            result["modes"][mode] = asyncio.run(
+                drive(base_url, mode, args.conversations, args.turns, args.concurrency, args.seed)
+            )
+
+    print(json.dumps(result, indent=2))
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"loadtest-{result['commit']}-{int(time.time())}.json"
+        path.write_text(json.dumps(result, indent=2))
+        print(f"[BENCH] Saved {path}", file=sys.stderr)
+
+    if args.compare:
+        compare(result, json.loads(Path(args.compare).read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Memory benchmark for per-thread position storage.
+
+Builds the positions held for many threads twice: as PositionItem dicts
+(the shape capture_position returns and the wire format) and as compact
+state.Position records. Measures each with tracemalloc and reports
+bytes per position and per thread. Item text is generated fresh per
+position, like real user input, so only the record overhead differs.
+
+Usage (from agent/):
+    python -m bench.memory --threads 2000 --positions 200
+"""
+
+import json
+import random
+import argparse
+import tracemalloc
+
+from src.state import POSITION_CATEGORIES, POSITION_TOPICS, Position
+
+
+def generate(threads: int, positions: int, seed: int) -> list:
+    """Per-thread lists of wire-format positions, as JSON (like ToolMessage content)."""
+    rng = random.Random(seed)
+    return [
+        [
+            json.dumps({
+                "id": f"{rng.getrandbits(32):08x}",
+                "category": rng.choice(POSITION_CATEGORIES),
+                "topic": rng.choice(POSITION_TOPICS),
+                "item": f"Position {t}-{p}: the children spend alternate weekends with me",
+                "context": None if rng.random() < 0.7 else "Raised when discussing school runs",
+            })
+            for p in range(positions)
+        ]
+        for t in range(threads)
+    ]
+
+
+def measure(encoded: list, build) -> int:
+    """Bytes allocated (and kept) by build() over every thread's positions."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [[build(json.loads(raw)) for raw in thread] for thread in encoded]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=2000)
+    parser.add_argument("--positions", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    encoded = generate(args.threads, args.positions, args.seed)
+    count = args.threads * args.positions
+
+    results = {
+        "dict": measure(encoded, lambda data: data),
+        "compact": measure(encoded, Position.from_wire),
+    }
+
+    print(f"{args.threads} threads x {args.positions} positions")
+    print(f"{'layout':>8} {'total MB':>10} {'B/position':>11} {'KB/thread':>10}")
+    for name, total in results.items():
+        print(f"{name:>8} {total / 1e6:>10.1f} {total / count:>11.0f} {total / args.threads / 1024:>10.1f}")
+    saving = 1 - results["compact"] / results["dict"]
+    print(f"compact saves {saving:.0%} ({(results['dict'] - results['compact']) / args.threads / 1024:.1f} KB/thread)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Microbenchmarks for the per-turn helpers and tools.
+
+Times extract_session_id, parse_session_id, stream_sse_response, the
+capture_position, check_exemption_eligibility and search_mediators tools
+(as invoked by the graph, including argument validation), the
+deterministic tools' bodies through to ToolMessage content, and the
+summary engine with inputs sized like the worst real traffic: long Hume
+message arrays, long responses through the SSE generator, a 10k-row
+mediators table and a 500-position case in the SQLite stand-in from
+bench.fakes.
+
+Each benchmark reports the best-of-repeats time per call. Results are
+compared with the stored baseline (bench/baselines/micro.json) and the
+run exits non-zero if any benchmark is slower than baseline by more than
+the threshold. Baselines are machine-specific: refresh them with
+--save-baseline on the machine that runs the comparison.
+
+Usage (from agent/):
+    python -m bench.micro
+    python -m bench.micro --only sse --threshold 1.5
+    python -m bench.micro --save-baseline
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import timeit
+from pathlib import Path
+
+from bench import fakes
+
+fakes.install()
+
+from starlette.requests import Request  # noqa: E402
+from langgraph.prebuilt.tool_node import msg_content_output  # noqa: E402
+
+from src import main as app_module  # noqa: E402
+from src import summary  # noqa: E402
+from src.tools.miam import (  # noqa: E402
+    capture_position, check_exemption_eligibility, search_mediators,
+    get_miam_info, get_position_summary, generate_preparation_summary,
+)
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "micro.json"
+DEFAULT_THRESHOLD = 1.25
+# Differences below this are timer noise for sub-microsecond helpers
+MIN_DELTA_US = 0.5
+
+
+# =============================================================================
+# Fixtures
+# =============================================================================
+
+def hume_body(turns: int) -> dict:
+    """A Hume EVI /chat/completions body with `turns` user/assistant pairs."""
+    messages = [{"role": "system", "content": "You are Miam, a MIAM preparation assistant."}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Turn {i}: the children should stay with me during the week."})
+        messages.append({"role": "assistant", "content": fakes.REPLY})
+    return {
+        "model": "miam",
+        "messages": messages,
+        "metadata": {"custom_session_id": "miam_Sam|7f8b6c1e-1d2a-4c7e-9a51-3f0c2b8d9e10"},
+    }
+
+
+def hume_request(query: str = "") -> Request:
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/chat/completions",
+        "query_string": query.encode(),
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"x-hume-session-id", b"miam_Sam|7f8b6c1e-1d2a-4c7e-9a51-3f0c2b8d9e10"),
+        ],
+    })
+
+
+def long_response(words: int) -> str:
+    base = fakes.REPLY.split(" ")
+    return " ".join(base[i % len(base)] for i in range(words))
+
+
+async def drain(generator) -> int:
+    size = 0
+    async for frame in generator:
+        size += len(frame)
+    return size
+
+
+# =============================================================================
+# Benchmarks
+# =============================================================================
+
+def build_benchmarks(mediator_rows: int, sse_words: int) -> dict:
+    """name -> (callable, number, repeat)"""
+    big_body = hume_body(500)
+    header_only = {k: v for k, v in big_body.items() if k != "metadata"}
+    body_request = hume_request()
+    query_request = hume_request("custom_session_id=miam_Sam%7C7f8b6c1e")
+
+    response = long_response(sse_words)
+    short = long_response(40)
+
+    fakes.patch_database(mediator_rows)
+    fakes.seed_positions(fakes.BENCH_CASE_ID, 500)
+    summary.generate(fakes.BENCH_CASE_ID, fakes.BENCH_USER_ID)
+    with fakes.sqlite_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(summary.POSITIONS_QUERY, (fakes.BENCH_CASE_ID,))
+            position_rows = cur.fetchall()
+
+    def render_cold():
+        summary._rendered.clear()
+        return summary.render(summary.group_rows(position_rows))
+
+    return {
+        "extract_session_id.query": (lambda: app_module.extract_session_id(query_request, big_body), 200000, 7),
+        "extract_session_id.metadata": (lambda: app_module.extract_session_id(body_request, big_body), 200000, 7),
+        "extract_session_id.header": (lambda: app_module.extract_session_id(body_request, header_only), 200000, 7),
+        "parse_session_id": (lambda: app_module.parse_session_id("miam_Sam|7f8b6c1e-1d2a-4c7e-9a51-3f0c2b8d9e10"), 200000, 7),
+        "parse_session_id.anon": (lambda: app_module.parse_session_id("miam_anon_1234"), 200000, 7),
+        "sse.short": (lambda: asyncio.run(drain(app_module.stream_sse_response(short, "clm-1"))), 3, 3),
+        "sse.long": (lambda: asyncio.run(drain(app_module.stream_sse_response(response, "clm-1"))), 1, 3),
+        "capture_position": (lambda: capture_position.invoke({
+            "category": "must_have", "topic": "living_arrangements",
+            "item": "Children live with me during term time", "context": "School is nearby",
+        }), 2000, 5),
+        "check_exemption_eligibility": (lambda: check_exemption_eligibility.invoke({
+            "circumstances": "domestic abuse, urgency, previous_miam",
+        }), 2000, 5),
+        "tool_message.get_miam_info": (lambda: tool_message(get_miam_info, {"topic": "cost"}), 20000, 5),
+        "tool_message.get_position_summary": (lambda: tool_message(get_position_summary, {}), 20000, 5),
+        "tool_message.check_exemption_eligibility": (lambda: tool_message(check_exemption_eligibility, {
+            "circumstances": "domestic abuse, urgency, previous_miam",
+        }), 20000, 5),
+        "tool_message.preparation_outline": (lambda: tool_message(generate_preparation_summary, {}), 20000, 5),
+        "search_mediators.location": (lambda: search_mediators.invoke({"location": "London"}), 20, 5),
+        "search_mediators.filtered": (lambda: search_mediators.invoke({
+            "location": "M1", "remote_only": True, "legal_aid_only": True,
+        }), 20, 5),
+        "search_mediators.all": (lambda: search_mediators.invoke({}), 20, 5),
+        "summary.render": (render_cold, 200, 5),
+        "summary.unchanged": (lambda: summary.generate(fakes.BENCH_CASE_ID, fakes.BENCH_USER_ID), 200, 5),
+    }
+
+
+def tool_message(tool, args: dict):
+    """Tool body through to the ToolMessage content the graph stores (no invoke overhead)."""
+    return msg_content_output(tool.func(**args))
+
+
+def run(benchmarks: dict, only: str = None) -> dict:
+    results = {}
+    for name, (fn, number, repeat) in benchmarks.items():
+        if only and only not in name:
+            continue
+        fn()  # warm caches, lazy imports and the SQLite page cache
+        timings = timeit.repeat(fn, number=number, repeat=repeat)
+        best = min(timings) / number
+        results[name] = {"us_per_call": round(best * 1e6, 3), "number": number, "repeat": repeat}
+        print(f"  {name:32} {best * 1e6:>14,.1f} us", file=sys.stderr)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        ratio = result["us_per_call"] / base["us_per_call"] if base["us_per_call"] else 1.0
+        regressed = ratio > threshold and result["us_per_call"] - base["us_per_call"] > MIN_DELTA_US
+        flag = "REGRESSION" if regressed else ""
+        print(f"  {name:32} {base['us_per_call']:>12,.1f} -> {result['us_per_call']:>12,.1f} us  x{ratio:.2f} {flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="Run benchmarks whose name contains this")
+    parser.add_argument("--mediators", type=int, default=10000)
+    parser.add_argument("--sse-words", type=int, default=600)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Fail if slower than baseline by this factor")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    print(f"[BENCH] mediators={args.mediators} sse_words={args.sse_words}", file=sys.stderr)
+    results = run(build_benchmarks(args.mediators, args.sse_words), args.only)
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(exist_ok=True)
+        previous = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        merged = {**previous.get("results", {}), **results}
+        baseline_path.write_text(json.dumps({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "config": {"mediators": args.mediators, "sse_words": args.sse_words},
+            "results": dict(sorted(merged.items())),
+        }, indent=2) + "\n")
+        print(f"[BENCH] Saved baseline {baseline_path}", file=sys.stderr)
+        return
+
+    if not baseline_path.exists():
+        print("[BENCH] No baseline; run with --save-baseline", file=sys.stderr)
+        return
+
+    regressions = compare(results, json.loads(baseline_path.read_text()), args.threshold)
+    if regressions:
+        print(f"[BENCH] {len(regressions)} regression(s) over x{args.threshold}: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Multi-tool turn benchmark: one tool per step vs a batched parallel step.
+
+Runs a turn that needs load_user_memory, get_miam_info and
+search_mediators through the real agent graph (scripted model, Zep and
+Neon fakes with simulated latency) in three ways:
+
+    sequential_steps   the model asks for one tool per step (three model
+                       round trips, tools run one after another)
+    serial_step        all three calls in one step, executor serialised
+    parallel_step      all three calls in one step on the managed pools
+
+It checks that ToolMessages always come back in tool_call order, then
+reruns the parallel turn with a slow Zep and a short
+TOOL_STEP_BUDGET_SECONDS to show the step ending at its deadline.
+
+Usage (from agent/):
+    python -m bench.parallel_tools --turns 10
+"""
+
+import os
+
+os.environ.setdefault("FAKE_ZEP_LATENCY_MS", "150")
+os.environ.setdefault("FAKE_DB_LATENCY_MS", "100")
+os.environ.setdefault("FAKE_LLM_FIRST_TOKEN_MS", "150")
+
+import sys  # noqa: E402
+import json  # noqa: E402
+import time  # noqa: E402
+import uuid  # noqa: E402
+import asyncio  # noqa: E402
+import argparse  # noqa: E402
+import statistics  # noqa: E402
+
+from bench import fakes  # noqa: E402
+
+fakes.install()
+
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+
+from src import executor as tool_executor  # noqa: E402
+from src.agent import build_agent  # noqa: E402
+from src.tools.miam import get_zep_client  # noqa: E402
+
+TURN = "Do you remember me from last time? How much does a mediator cost in London?"
+
+_respond = fakes.ScriptedChatModel._respond
+
+
+def one_tool_per_step(self, messages) -> AIMessage:
+    """Scripted model that asks for the step's tools one at a time."""
+    turn_start = max(i for i, m in enumerate(messages) if m.type == "human")
+    called = {m.name for m in messages[turn_start:] if m.type == "tool"}
+    planned = _respond(self, messages[:turn_start + 1])
+    remaining = [c for c in planned.tool_calls if c["name"] not in called]
+    if not remaining:
+        return _respond(self, messages)
+    return AIMessage(content="", tool_calls=remaining[:1], usage_metadata=planned.usage_metadata)
+
+
+async def run_turns(graph, turns: int) -> dict:
+    wall, orders_ok = [], True
+    for _ in range(turns):
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        started = time.perf_counter()
+        result = await graph.ainvoke({"messages": [HumanMessage(content=TURN)]}, config)
+        wall.append((time.perf_counter() - started) * 1000)
+
+        messages = result["messages"]
+        for i, message in enumerate(messages):
+            calls = getattr(message, "tool_calls", None)
+            if calls:
+                returned = [m.tool_call_id for m in messages[i + 1:i + 1 + len(calls)] if m.type == "tool"]
+                orders_ok &= returned == [c["id"] for c in calls]
+        errors = [m.content for m in messages if m.type == "tool" and '"success": false' in str(m.content)]
+    return {
+        "mean_ms": round(statistics.mean(wall), 1),
+        "max_ms": round(max(wall), 1),
+        "tool_order_matches_calls": orders_ok,
+        "tool_errors_last_turn": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--slow-zep-ms", type=float, default=2000)
+    parser.add_argument("--step-budget", type=float, default=0.5)
+    args = parser.parse_args()
+
+    fakes.patch_database(500)
+    graph = build_agent()
+    results = {}
+
+    fakes.ScriptedChatModel._respond = one_tool_per_step
+    results["sequential_steps"] = asyncio.run(run_turns(graph, args.turns))
+    fakes.ScriptedChatModel._respond = _respond
+
+    call = tool_executor.executor.call
+    lock = None
+
+    async def serialised(*a, **kw):
+        nonlocal lock
+        lock = lock or asyncio.Lock()
+        async with lock:
+            return await call(*a, **kw)
+
+    tool_executor.executor.call = serialised
+    results["serial_step"] = asyncio.run(run_turns(graph, args.turns))
+    tool_executor.executor.call = call
+
+    results["parallel_step"] = asyncio.run(run_turns(graph, args.turns))
+
+    get_zep_client().user._latency = args.slow_zep_ms / 1000
+    tool_executor.TOOL_STEP_BUDGET_SECONDS = args.step_budget
+    results[f"parallel_step_slow_zep_budget_{args.step_budget}s"] = asyncio.run(run_turns(graph, max(1, args.turns // 5)))
+
+    print(json.dumps(results, indent=2))
+    if not all(r["tool_order_matches_calls"] for r in results.values()):
+        print("[BENCH] ToolMessages out of tool_call order", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
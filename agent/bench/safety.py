@@ -0,0 +1,170 @@
+"""
+Safety detector benchmark: coverage, cost, and turn latency.
+
+Three parts:
+
+    detector   flag rates on bench/fixtures/exemption_phrasings.jsonl for
+               the router's previous SAFETY_PATTERN regex and
+               safety.detect(), grouped by the phrasing's expected
+               exemption, plus the cost of one call
+    start      what safety.start() costs the request coroutine itself
+               (creating the task), against screening inline
+    turns      CLM-style turns through the real agent graph (scripted
+               model, Zep/Neon fakes) without and with the concurrent
+               stage: turn latency, how many model-step lookups found the
+               concurrent result ready, and whether flagged turns put
+               "safety" in state and the exemption note in the prompt
+
+Usage (from agent/):
+    python -m bench.safety --turns 20
+"""
+
+import os
+
+os.environ.setdefault("FAKE_LLM_FIRST_TOKEN_MS", "150")
+
+import re  # noqa: E402
+import json  # noqa: E402
+import time  # noqa: E402
+import uuid  # noqa: E402
+import asyncio  # noqa: E402
+import argparse  # noqa: E402
+import statistics  # noqa: E402
+from pathlib import Path  # noqa: E402
+
+from bench import fakes  # noqa: E402
+
+fakes.install()
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+from src import safety  # noqa: E402
+from src.agent import build_agent  # noqa: E402
+
+FIXTURE = Path(__file__).parent / "fixtures" / "exemption_phrasings.jsonl"
+
+# router.SAFETY_PATTERN before the detector replaced it
+OLD_SAFETY_PATTERN = re.compile(
+    r"\b(abus\w*|violen\w*|hit(s|ting)?\s+me|hurt(s|ing)?\s+(me|the\s+(kids|children))|"
+    r"threat\w*|scared|afraid|frightened|unsafe|coercive|controlling|stalk\w*|"
+    r"non[- ]molestation|injunction|refuge|marac|police|"
+    r"safeguarding|social\s+services|child\s+protection|abduct\w*|kidnap\w*)\b",
+    re.IGNORECASE,
+)
+
+TURNS = [
+    "He hit me last week and I'm scared to be in the same room as him",
+    "What does a MIAM cost?",
+    "She's threatened to take the kids abroad and not come back",
+    "I want the children to live with me during term time, that's a must",
+    "Social services are involved because of his drinking",
+    "Thanks, that's helpful",
+]
+
+
+def per_call_us(fn, texts: list, rounds: int = 200) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            fn(text)
+    return round((time.perf_counter() - started) / (rounds * len(texts)) * 1e6, 2)
+
+
+def detector(cases: list) -> dict:
+    groups: dict = {}
+    for case in cases:
+        group = "+".join(case["expected"]) or "none"
+        counts = groups.setdefault(group, {"cases": 0, "old_regex": 0, "detector": 0})
+        counts["cases"] += 1
+        counts["old_regex"] += bool(OLD_SAFETY_PATTERN.search(case["text"]))
+        counts["detector"] += safety.detect(case["text"]) is not None
+    texts = [case["text"] for case in cases]
+    return {
+        "flagged_by_expected_exemption": {
+            group: f"old {c['old_regex']}/{c['cases']}, new {c['detector']}/{c['cases']}"
+            for group, c in sorted(groups.items())
+        },
+        "old_regex_us_per_call": per_call_us(OLD_SAFETY_PATTERN.search, texts),
+        "detect_us_per_call": per_call_us(safety.detect, texts),
+    }
+
+
+async def start_cost(texts: list, rounds: int = 2000) -> dict:
+    spent = 0.0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        tasks = [safety.start(text) for text in texts]
+        spent += time.perf_counter() - started
+        await asyncio.gather(*tasks)
+    inline = per_call_us(safety.detect, texts, rounds // 10)
+    return {"start_us_on_request_path": round(spent / (rounds * len(texts)) * 1e6, 2), "inline_detect_us": inline}
+
+
+def lookups() -> dict:
+    return {source: safety.LOOKUPS.value(source=source) for source in ("concurrent", "inline")}
+
+
+async def run_turns(graph, turns: int, concurrent: bool, prompts: list) -> dict:
+    before, seen = lookups(), len(prompts)
+    wall, flagged_state, expected_flags = [], 0, 0
+    for i in range(turns):
+        text = TURNS[i % len(TURNS)]
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+
+        async def turn():
+            if concurrent:
+                safety.start(text)
+            return await graph.ainvoke({"messages": [HumanMessage(content=text)]}, config)
+
+        started = time.perf_counter()
+        # Own task per turn, like a request, so the ContextVar does not leak across turns
+        result = await asyncio.ensure_future(turn())
+        wall.append((time.perf_counter() - started) * 1000)
+        expected_flags += safety.detect(text) is not None
+        flagged_state += bool(result.get("safety"))
+
+    after = lookups()
+    wall.sort()
+    return {
+        "mean_ms": round(statistics.mean(wall), 1),
+        "p95_ms": round(wall[int(len(wall) * 0.95) - 1], 1),
+        "lookups": {source: int(after[source] - before[source]) for source in after},
+        "flagged_turns_with_state": f"{flagged_state}/{expected_flags}",
+        "prompts_with_exemption_note": sum("SAFETY SIGNAL" in p for p in prompts[seen:]),
+        "model_steps": len(prompts) - seen,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    cases = [json.loads(line) for line in FIXTURE.read_text().splitlines() if line.strip()]
+    results = {"detector": detector(cases), "start": asyncio.run(start_cost(TURNS))}
+
+    # Record the system prompt each model step saw
+    prompts = []
+    respond = fakes.ScriptedChatModel._respond
+
+    def recording(self, messages):
+        prompts.append(str(messages[0].content) if messages and messages[0].type == "system" else "")
+        return respond(self, messages)
+
+    fakes.ScriptedChatModel._respond = recording
+    fakes.patch_database(500)
+    graph = build_agent()
+
+    async def turns():
+        await run_turns(graph, len(TURNS), False, prompts)  # warm up
+        return {
+            "inline_only": await run_turns(graph, args.turns, False, prompts),
+            "concurrent": await run_turns(graph, args.turns, True, prompts),
+        }
+
+    results["turns"] = asyncio.run(turns())
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
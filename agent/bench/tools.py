@@ -0,0 +1,102 @@
+"""
+Tool executor benchmark: can one slow dependency starve the other tools?
+
+Simulates a Zep slowdown (FAKE_ZEP_LATENCY_MS, 1s by default) and fires
+a burst of load_user_memory calls. While they run, it times the tools
+that should stay fast (get_miam_info, check_exemption_eligibility,
+search_mediators against the SQLite stand-in) and a bare
+asyncio.to_thread probe, which shares the loop's default executor, one
+every --interval-ms. Tools are invoked with ainvoke, the way the graph's
+ToolNode runs them. The burst runs twice: once on the default executor
+(no managed coroutine) and once on src.executor's pools.
+
+Usage (from agent/):
+    python -m bench.tools --slow-calls 64 --fast-calls 40
+"""
+
+import os
+
+os.environ.setdefault("FAKE_ZEP_LATENCY_MS", "1000")
+
+import json  # noqa: E402
+import time  # noqa: E402
+import asyncio  # noqa: E402
+import argparse  # noqa: E402
+import statistics  # noqa: E402
+
+from bench import fakes  # noqa: E402
+
+fakes.install()
+
+from src.executor import executor  # noqa: E402
+from src.tools.miam import (  # noqa: E402
+    MIAM_TOOLS, load_user_memory, get_miam_info, check_exemption_eligibility, search_mediators,
+)
+
+FAST_CALLS = [
+    ("get_miam_info", lambda: get_miam_info.ainvoke({"topic": "cost"})),
+    ("check_exemption_eligibility", lambda: check_exemption_eligibility.ainvoke({
+        "circumstances": "There was domestic violence and a police caution last year",
+    })),
+    ("search_mediators", lambda: search_mediators.ainvoke({"location": "London"})),
+    ("to_thread", lambda: asyncio.to_thread(time.sleep, 0)),
+]
+
+
+async def timed(factory) -> float:
+    started = time.perf_counter()
+    await factory()
+    return (time.perf_counter() - started) * 1000
+
+
+async def burst(slow_calls: int, fast_calls: int, interval: float) -> dict:
+    slow = [
+        asyncio.ensure_future(load_user_memory.ainvoke({"user_id": f"bench-user-{i}"}))
+        for i in range(slow_calls)
+    ]
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    fast = []
+    for i in range(fast_calls):
+        name, factory = FAST_CALLS[i % len(FAST_CALLS)]
+        fast.append((name, asyncio.ensure_future(timed(factory))))
+        await asyncio.sleep(interval)
+    latencies = {name: [] for name, _ in FAST_CALLS}
+    for name, task in fast:
+        latencies[name].append(await task)
+
+    results = await asyncio.gather(*slow)
+    return {
+        "slow_drain_ms": round((time.perf_counter() - started) * 1000),
+        "slow_ok": sum(1 for r in results if r.get("success")),
+        **{
+            name: {"p50_ms": round(statistics.median(values), 1), "max_ms": round(max(values), 1)}
+            for name, values in latencies.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slow-calls", type=int, default=64)
+    parser.add_argument("--fast-calls", type=int, default=40)
+    parser.add_argument("--interval-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    fakes.patch_database(2000)
+
+    managed = {t.name: t.coroutine for t in MIAM_TOOLS}
+    for t in MIAM_TOOLS:
+        t.coroutine = None
+    default = asyncio.run(burst(args.slow_calls, args.fast_calls, args.interval_ms / 1000))
+
+    for t in MIAM_TOOLS:
+        t.coroutine = managed[t.name]
+    result = asyncio.run(burst(args.slow_calls, args.fast_calls, args.interval_ms / 1000))
+
+    print(json.dumps({"default_executor": default, "managed_executor": result, "pools": executor.stats()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Admission control for agent runs.
+
+Bounds how many agent_graph runs are in flight per worker. Requests
+beyond the limit wait in a bounded queue with a deadline; waiting
+requests are granted round-robin across users, and each user is capped
+at ADMISSION_PER_USER_LIMIT concurrent runs, so one noisy session
+cannot starve the rest. When the queue is full or the wait deadline
+passes the caller gets AdmissionRejected and should answer fast
+("please hold") instead of piling onto Gemini.
+"""
+
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from . import metrics
+
+
+MAX_CONCURRENT_AGENT_RUNS = int(os.environ.get("MAX_CONCURRENT_AGENT_RUNS", "8"))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get("ADMISSION_MAX_WAIT_SECONDS", "3"))
+ADMISSION_PER_USER_LIMIT = int(os.environ.get("ADMISSION_PER_USER_LIMIT", "2"))
+
+WAIT_SECONDS = metrics.histogram(
+    "miam_admission_wait_seconds",
+    "Time agent runs spent waiting for an admission slot",
+    ["endpoint"],
+)
+REJECTED = metrics.counter(
+    "miam_admission_rejected_total",
+    "Agent runs rejected by admission control",
+    ["endpoint", "reason"],
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a run cannot be admitted (queue_full or timeout)."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Ticket:
+    """An admitted run; release exactly once via AdmissionController.release."""
+    __slots__ = ("key", "released")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.released = False
+
+
+class AdmissionController:
+    """Per-worker concurrency limit with a fair, bounded wait queue."""
+
+    def __init__(
+        self,
+        limit: int = MAX_CONCURRENT_AGENT_RUNS,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_wait: float = ADMISSION_MAX_WAIT_SECONDS,
+        per_user_limit: int = ADMISSION_PER_USER_LIMIT,
+    ):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.per_user_limit = per_user_limit
+        self._active = 0
+        self._active_by_key: Dict[str, int] = {}
+        # key -> deque of waiter futures; insertion order is the round-robin order
+        self._waiters: "OrderedDict[str, deque]" = OrderedDict()
+        self._queued = 0
+
+    # -------------------------------------------------------------------------
+
+    @property
+    def in_flight(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def _can_run(self, key: str) -> bool:
+        return self._active < self.limit and self._active_by_key.get(key, 0) < self.per_user_limit
+
+    def _grant(self, key: str) -> Ticket:
+        self._active += 1
+        self._active_by_key[key] = self._active_by_key.get(key, 0) + 1
+        return Ticket(key)
+
+    def _dispatch(self):
+        """Hand free slots to waiting users, round-robin."""
+        while self._active < self.limit and self._waiters:
+            progressed = False
+            for key in list(self._waiters):
+                if self._active >= self.limit:
+                    break
+                if self._active_by_key.get(key, 0) >= self.per_user_limit:
+                    continue
+                queue = self._waiters.pop(key)
+                fut = queue.popleft()
+                progressed = True
+                self._queued -= 1
+                if queue:
+                    # Re-append so this user goes to the back of the rotation
+                    self._waiters[key] = queue
+                if fut.done():
+                    continue
+                fut.set_result(self._grant(key))
+            if not progressed:
+                return
+
+    def _remove_waiter(self, key: str, fut: asyncio.Future):
+        queue = self._waiters.get(key)
+        if queue is None:
+            return
+        try:
+            queue.remove(fut)
+            self._queued -= 1
+        except ValueError:
+            return
+        if not queue:
+            del self._waiters[key]
+
+    # -------------------------------------------------------------------------
+
+    async def acquire(self, key: str, endpoint: str = "clm", max_wait: Optional[float] = None) -> Ticket:
+        """Wait for a slot; raises AdmissionRejected if saturated."""
+        key = key or "anonymous"
+        started = time.monotonic()
+
+        if not self._waiters and self._can_run(key):
+            WAIT_SECONDS.observe(0.0, endpoint=endpoint)
+            return self._grant(key)
+
+        if self._queued >= self.max_queue:
+            REJECTED.inc(endpoint=endpoint, reason="queue_full")
+            raise AdmissionRejected("queue_full")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(fut)
+        self._queued += 1
+        # A slot may already be free for this user even though others wait
+        self._dispatch()
+
+        timeout = self.max_wait if max_wait is None else max(0.0, max_wait)
+        try:
+            ticket = await asyncio.wait_for(asyncio.shield(fut), timeout)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                # Granted in the same tick the deadline fired: hand it back
+                self.release(fut.result())
+            else:
+                fut.cancel()
+                self._remove_waiter(key, fut)
+            WAIT_SECONDS.observe(time.monotonic() - started, endpoint=endpoint)
+            REJECTED.inc(endpoint=endpoint, reason="timeout")
+            raise AdmissionRejected("timeout")
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(fut.result())
+            else:
+                fut.cancel()
+                self._remove_waiter(key, fut)
+            raise
+
+        WAIT_SECONDS.observe(time.monotonic() - started, endpoint=endpoint)
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """Return a slot (idempotent per ticket)."""
+        if ticket.released:
+            return
+        ticket.released = True
+        self._active -= 1
+        remaining = self._active_by_key.get(ticket.key, 1) - 1
+        if remaining > 0:
+            self._active_by_key[ticket.key] = remaining
+        else:
+            self._active_by_key.pop(ticket.key, None)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, key: str, endpoint: str = "clm", max_wait: Optional[float] = None):
+        """Hold a slot for the duration of the block."""
+        ticket = await self.acquire(key, endpoint=endpoint, max_wait=max_wait)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._active,
+            "limit": self.limit,
+            "queued": self._queued,
+            "max_queue": self.max_queue,
+            "utilization": round(self._active / self.limit, 3) if self.limit else 0.0,
+            "saturated": self._active >= self.limit,
+        }
+
+
+# Shared per-worker controller
+controller = AdmissionController()
+
+metrics.gauge(
+    "miam_agent_runs_in_flight", "Agent runs currently holding an admission slot"
+).set_function(lambda: {(): controller.in_flight})
+metrics.gauge(
+    "miam_agent_runs_queued", "Agent runs waiting for an admission slot"
+).set_function(lambda: {(): controller.queued})
@@ -5,7 +5,6 @@ Uses create_deep_agent with CopilotKitMiddleware for
 real-time state sync with the frontend.
 """
 
-import os
 import sys
 from dotenv import load_dotenv
 
@@ -13,10 +12,15 @@ load_dotenv()
 
 from deepagents import create_deep_agent
 from copilotkit import CopilotKitMiddleware
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 from .tools.miam import MIAM_TOOLS
+from .llm import GOOGLE_MODEL, make_chat_model, build_model_policy
+from .router import build_model_router
+from .tracing import TracingMiddleware
+from .usage import TokenUsageMiddleware
+from .executor import ToolStepMiddleware
+from .safety import SafetyMiddleware
+from .checkpoint import build_checkpointer, bind_graph
 
 
 # =============================================================================
@@ -107,7 +111,7 @@ Help users identify:
 - Financial support
 
 ## TOOLS AVAILABLE
-- `load_user_memory`: Load user context from memory (call first if user_id available)
+- `load_user_memory`: Load user context from memory (call first if user_id available, together with any other tool the first message needs)
 - `capture_position`: Record a position item from the user
 - `get_position_summary`: Show topics to discuss
 - `get_miam_info`: Get information about MIAM process
@@ -115,6 +119,8 @@ Help users identify:
 - `search_mediators`: Find FMC-accredited mediators
 - `generate_preparation_summary`: Information about preparation
 
+When a message needs several independent tools, call them all in the same turn; they run in parallel.
+
 ## CONVERSATION STYLE
 - Be concise but warm
 - Ask one question at a time
@@ -134,34 +140,40 @@ Help users identify:
 # Agent Builder
 # =============================================================================
 
-def build_agent():
+def build_agent(checkpointer=None):
     """Build the Deep Agents graph with CopilotKit middleware."""
 
-    # Get API key
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        raise RuntimeError("GOOGLE_API_KEY not set")
-
-    # Initialize LLM
-    llm = ChatGoogleGenerativeAI(
-        model=os.environ.get("GOOGLE_MODEL", "gemini-2.0-flash"),
-        temperature=0.7,
-        google_api_key=api_key,
-    )
+    # Initialize LLM (raises if GOOGLE_API_KEY is not set)
+    llm = make_chat_model(GOOGLE_MODEL)
 
     # Define tools that require HITL confirmation (optional - can add later)
     # For now, we don't interrupt on any tools
     interrupt_on = {}
 
+    # Outermost first: CopilotKit shapes the request, safety flags the
+    # turn and adds exemption hints, the router picks a model tier, the
+    # policy applies retries/fallback to that model, tracing times each
+    # individual model and tool call, and usage accounting sees every
+    # actual model response (including retries)
+    middleware = [CopilotKitMiddleware(), SafetyMiddleware()]
+    router = build_model_router()
+    if router is not None:
+        middleware.append(router)
+    middleware.append(build_model_policy())
+    middleware.append(TracingMiddleware())
+    middleware.append(ToolStepMiddleware())
+    middleware.append(TokenUsageMiddleware())
+
     # Create the Deep Agents graph
     agent_graph = create_deep_agent(
         model=llm,
         system_prompt=MIAM_SYSTEM_PROMPT,
         tools=MIAM_TOOLS,
-        middleware=[CopilotKitMiddleware()],
-        checkpointer=MemorySaver(),
+        middleware=middleware,
+        checkpointer=checkpointer if checkpointer is not None else build_checkpointer(),
         interrupt_on=interrupt_on,
     )
+    bind_graph(agent_graph)
 
     print("[AGENT] Deep Agents graph created", file=sys.stderr)
     print(f"[AGENT] Tools: {[t.name for t in MIAM_TOOLS]}", file=sys.stderr)
@@ -0,0 +1,187 @@
+"""
+AG-UI agent with delta-encoded state sync.
+
+The stock LangGraph AG-UI agent emits a full STATE_SNAPSHOT every time a
+node changes state, so each emission re-serialises the whole state
+(messages, position items, topics) and the payload grows with the
+session. DeltaStateAGUIAgent instead sends each emission as a
+STATE_DELTA JSON Patch (RFC 6902) against what the client already has,
+starting from the state it posted with the run: list growth becomes
+"add /key/-" ops. A client that posted no state gets one full snapshot
+first. State events inside a step are coalesced and flushed once, at
+the next step or run boundary.
+
+Mid-run snapshots (node exits, tool-emitted state) carry the node's
+partial view of "messages", which would make the list shrink and regrow
+and defeat appends. Those flushes keep the client's messages as they
+are; the thread's full list is diffed once, at the end of the run.
+
+Each run's exchange (user message, reply text, captured positions) is
+also buffered on the thread's conversation recording (src.conversations).
+"""
+
+import os
+import json
+from typing import Any, List, Optional
+
+from ag_ui.core import EventType, StateDeltaEvent, StateSnapshotEvent
+from copilotkit import LangGraphAGUIAgent
+from pydantic_core import to_jsonable_python
+
+from . import safety
+from . import metrics
+from . import conversations
+from .state import Position
+
+
+AGUI_STATE_DELTAS = os.environ.get("AGUI_STATE_DELTAS", "true").lower() == "true"
+
+# Pending state is flushed before these; other events pass it by
+FLUSH_BEFORE = {
+    EventType.STEP_STARTED,
+    EventType.STEP_FINISHED,
+    EventType.RUN_FINISHED,
+    EventType.RUN_ERROR,
+    EventType.CUSTOM,
+    EventType.MESSAGES_SNAPSHOT,
+}
+# Flushes before these carry the run's final messages
+FINAL_FLUSH = {EventType.RUN_FINISHED, EventType.RUN_ERROR, EventType.MESSAGES_SNAPSHOT}
+
+STATE_EVENTS = metrics.counter(
+    "miam_agui_state_events_total",
+    "AG-UI state emissions by encoding (snapshot, delta, coalesced, unchanged)",
+    ["kind"],
+)
+
+
+# =============================================================================
+# JSON Patch
+# =============================================================================
+
+def _pointer(token: Any) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def json_patch(old: Any, new: Any, path: str = "") -> List[dict]:
+    """
+    RFC 6902 ops turning old into new.
+
+    Dicts are diffed key by key, lists that only grew become appends,
+    anything else that changed is replaced wholesale.
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_pointer(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_pointer(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(json_patch(old[key], value, child))
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(new) > len(old) and new[:len(old)] == old:
+        return [{"op": "add", "path": f"{path}/-", "value": value} for value in new[len(old):]]
+    return [{"op": "replace", "path": path or "", "value": new}]
+
+
+# =============================================================================
+# Agent
+# =============================================================================
+
+class DeltaStateAGUIAgent(LangGraphAGUIAgent):
+    """LangGraphAGUIAgent that syncs state as coalesced JSON Patch deltas."""
+
+    async def run(self, input):
+        # Reply text and tool results, for the thread's conversation recording
+        reply, results = [], []
+        async for event in self._events(input):
+            if event.type == EventType.TEXT_MESSAGE_CONTENT:
+                reply.append(event.delta)
+            elif event.type == EventType.TOOL_CALL_RESULT:
+                results.append(event.content)
+            yield event
+        record_turn(input, "".join(reply), results)
+
+    async def _events(self, input):
+        if not AGUI_STATE_DELTAS:
+            async for event in super().run(input):
+                yield event
+            return
+
+        # The client applies deltas to the state it just sent us
+        sent: Optional[Any] = to_jsonable_python(input.state, fallback=str) or None
+        pending: Optional[StateSnapshotEvent] = None
+
+        async for event in super().run(input):
+            if event.type == EventType.STATE_SNAPSHOT:
+                if pending is not None:
+                    STATE_EVENTS.inc(kind="coalesced")
+                pending = event
+                continue
+            if pending is not None and event.type in FLUSH_BEFORE:
+                sent, encoded = self._encode_state(sent, pending, event.type in FINAL_FLUSH)
+                pending = None
+                if encoded is not None:
+                    yield encoded
+            yield event
+
+        if pending is not None:
+            sent, encoded = self._encode_state(sent, pending, True)
+            if encoded is not None:
+                yield encoded
+
+    @staticmethod
+    def _encode_state(sent, event: StateSnapshotEvent, final: bool):
+        """(new baseline, event to emit or None) for a pending snapshot."""
+        snapshot = to_jsonable_python(event.snapshot, fallback=str)
+        if not final and isinstance(sent, dict) and "messages" in sent and isinstance(snapshot, dict):
+            snapshot["messages"] = sent["messages"]
+        if sent is None:
+            STATE_EVENTS.inc(kind="snapshot")
+            return snapshot, StateSnapshotEvent(type=EventType.STATE_SNAPSHOT, snapshot=snapshot)
+        ops = json_patch(sent, snapshot)
+        if not ops:
+            STATE_EVENTS.inc(kind="unchanged")
+            return sent, None
+        STATE_EVENTS.inc(kind="delta")
+        return snapshot, StateDeltaEvent(type=EventType.STATE_DELTA, delta=ops)
+
+
+# =============================================================================
+# Conversation Recording
+# =============================================================================
+
+def _captured(results: List[str]) -> List[Position]:
+    """Positions from the run's capture_position results."""
+    positions = []
+    for content in results:
+        if '"captured"' not in (content or ""):
+            continue
+        try:
+            captured = json.loads(content).get("captured")
+        except (TypeError, ValueError, AttributeError):
+            continue
+        position = Position.from_wire(captured) if isinstance(captured, dict) else None
+        if position is not None:
+            positions.append(position)
+    return positions
+
+
+def record_turn(input, reply: str, results: List[str]):
+    """Buffer the run's exchange on the thread's conversation recording."""
+    if not reply:
+        return
+    state = input.state if isinstance(input.state, dict) else {}
+    user_text = next(
+        (m.content for m in reversed(input.messages or []) if m.role == "user" and isinstance(m.content, str)), "",
+    )
+    conversations.recorder.record_turn(
+        input.thread_id, (state.get("user") or {}).get("id"), "chat", user_text, reply,
+        # Screened by the admission middleware; input.state is the client's to forge
+        captured=_captured(results), safety=safety.turn_flag(),
+    )
@@ -0,0 +1,315 @@
+"""
+Compacting in-memory checkpointer for the agent graph.
+
+MemorySaver keeps every checkpoint of every thread: one per graph step,
+each with its channel versions, metadata and pending writes, and (for
+plain reducer channels) a full copy of the channel value whenever it
+changed. Over a long call that grows without bound. CompactingSaver:
+
+- keeps only the latest CHECKPOINT_KEEP checkpoints per thread (root
+  namespace), dropping older checkpoints, their writes and any blobs no
+  kept checkpoint references;
+- rebases DeltaChannel values (messages, files) onto the oldest kept
+  checkpoint before dropping its ancestors, since their history is
+  otherwise rebuilt by replaying the writes of those ancestors;
+- stores message histories as an append-only log per thread, so each
+  message is serialised once and a messages blob is just (log id,
+  length). A history that does not extend the log (a message edited or
+  removed) starts a new log.
+
+Values are serialised with LangGraph's msgpack serializer and, when
+zstandard is installed, blobs over CHECKPOINT_ZSTD_MIN_BYTES are
+zstd-compressed. Time travel to dropped checkpoints is not possible.
+"""
+
+import os
+import itertools
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import ormsgpack
+from langgraph.channels.delta import DeltaChannel
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from . import metrics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CHECKPOINT_COMPACTION = os.environ.get("CHECKPOINT_COMPACTION", "true").lower() == "true"
+CHECKPOINT_KEEP = int(os.environ.get("CHECKPOINT_KEEP", "4"))
+CHECKPOINT_ZSTD_MIN_BYTES = int(os.environ.get("CHECKPOINT_ZSTD_MIN_BYTES", "1024"))
+CHECKPOINT_ZSTD_LEVEL = int(os.environ.get("CHECKPOINT_ZSTD_LEVEL", "3"))
+
+# Channels stored as append-only logs
+LOG_CHANNELS = ("messages",)
+LOG_TYPE = "msglog"
+ZSTD_SUFFIX = "+zstd"
+
+BYTES_WRITTEN = metrics.counter(
+    "miam_checkpoint_bytes_written_total",
+    "Serialised bytes written to the checkpointer",
+    ["kind"],
+)
+COMPACTED = metrics.counter(
+    "miam_checkpoints_compacted_total",
+    "Checkpoints dropped by compaction",
+)
+
+
+# =============================================================================
+# Serializers
+# =============================================================================
+
+class CompressedSerializer(JsonPlusSerializer):
+    """JsonPlusSerializer (msgpack) with zstd for large blobs."""
+
+    def __init__(self, min_bytes: int = CHECKPOINT_ZSTD_MIN_BYTES, level: int = CHECKPOINT_ZSTD_LEVEL, **kwargs):
+        super().__init__(**kwargs)
+        self.min_bytes = min_bytes
+        self.level = level
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = super().dumps_typed(obj)
+        if zstandard is not None and len(data) >= self.min_bytes and type_ == "msgpack":
+            return type_ + ZSTD_SUFFIX, zstandard.compress(data, self.level)
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, data_ = data
+        if type_.endswith(ZSTD_SUFFIX):
+            return super().loads_typed((type_[:-len(ZSTD_SUFFIX)], zstandard.decompress(data_)))
+        return super().loads_typed(data)
+
+
+class _LogSerializer:
+    """Resolves message-log blobs; everything else goes to the inner serializer."""
+
+    def __init__(self, inner, logs: Dict[int, "MessageLog"]):
+        self.inner = inner
+        self.logs = logs
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        return self.inner.dumps_typed(obj)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        if data[0] != LOG_TYPE:
+            return self.inner.loads_typed(data)
+        log_id, length = ormsgpack.unpackb(data[1])
+        return [self.inner.loads_typed(entry) for entry in self.logs[log_id].entries[:length]]
+
+
+# =============================================================================
+# Message Log
+# =============================================================================
+
+def _fingerprint(message: Any) -> Optional[tuple]:
+    """Identity of a message for prefix matching; None if it has no id."""
+    message_id = getattr(message, "id", None)
+    if not message_id:
+        return None
+    content = getattr(message, "content", None)
+    return (
+        message_id,
+        getattr(message, "type", None),
+        hash(content) if isinstance(content, str) else hash(repr(content)),
+        tuple(call.get("id") for call in getattr(message, "tool_calls", None) or ()),
+        getattr(message, "tool_call_id", None),
+    )
+
+
+class MessageLog:
+    """Append-only serialised messages for one thread."""
+    __slots__ = ("log_id", "entries", "prints")
+
+    def __init__(self, log_id: int):
+        self.log_id = log_id
+        self.entries: List[Tuple[str, bytes]] = []
+        self.prints: List[Optional[tuple]] = []
+
+    def prefix_of(self, messages: list) -> bool:
+        """True if the log and messages agree wherever both have entries."""
+        for fingerprint, message in zip(self.prints, messages):
+            if fingerprint is None or fingerprint != _fingerprint(message):
+                return False
+        return True
+
+
+# =============================================================================
+# Saver
+# =============================================================================
+
+class CompactingSaver(InMemorySaver):
+    """InMemorySaver with message logs and latest-N checkpoint retention."""
+
+    def __init__(self, *, keep: int = CHECKPOINT_KEEP, serde=None):
+        super().__init__(serde=serde or CompressedSerializer())
+        self.logs: Dict[int, MessageLog] = {}
+        self.serde = _LogSerializer(self.serde, self.logs)
+        self.keep = max(1, keep)
+        self.delta_channels: Dict[str, DeltaChannel] = {}
+        self._log_ids = itertools.count(1)
+        # Per (thread, ns): current log, every log created, channel versions
+        # of each stored checkpoint, blob keys written, and blob -> log id
+        self._current: Dict[Tuple[str, str], MessageLog] = {}
+        self._key_logs: Dict[Tuple[str, str], Set[int]] = {}
+        self._versions: Dict[Tuple[str, str], Dict[str, dict]] = {}
+        self._blob_keys: Dict[Tuple[str, str], Set[Tuple[str, Any]]] = {}
+        self._blob_logs: Dict[Tuple[str, str], Dict[Tuple[str, Any], int]] = {}
+
+    def bind(self, graph) -> "CompactingSaver":
+        """Learn the graph's DeltaChannels, which compaction has to rebase."""
+        self.delta_channels = {
+            name: channel for name, channel in graph.channels.items()
+            if isinstance(channel, DeltaChannel)
+        }
+        return self
+
+    # -------------------------------------------------------------------------
+    # Writes
+    # -------------------------------------------------------------------------
+
+    def _log_messages(self, key: Tuple[str, str], messages: list) -> Tuple[str, bytes]:
+        """Append new messages to the thread's log; return the blob for this value."""
+        log = self._current.get(key)
+        if log is None or not log.prefix_of(messages):
+            log = MessageLog(next(self._log_ids))
+            self.logs[log.log_id] = log
+            self._current[key] = log
+            self._key_logs.setdefault(key, set()).add(log.log_id)
+        written = 0
+        for message in messages[len(log.entries):]:
+            entry = self.serde.dumps_typed(message)
+            written += len(entry[1])
+            log.entries.append(entry)
+            log.prints.append(_fingerprint(message))
+        BYTES_WRITTEN.inc(written, kind="messages")
+        return LOG_TYPE, ormsgpack.packb([log.log_id, len(messages)])
+
+    def _store_blob(self, key: Tuple[str, str], channel: str, version: Any, value: Any) -> int:
+        """Serialise one channel value; returns bytes written outside the logs."""
+        if channel in LOG_CHANNELS and isinstance(value, list):
+            blob = self._log_messages(key, value)
+            self._blob_logs.setdefault(key, {})[(channel, version)] = self._current[key].log_id
+            written = 0
+        else:
+            blob = self.serde.dumps_typed(value)
+            written = len(blob[1])
+        self.blobs[(*key, channel, version)] = blob
+        self._blob_keys.setdefault(key, set()).add((channel, version))
+        return written
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        key = (thread_id, checkpoint_ns)
+        values = checkpoint["channel_values"]
+
+        written = 0
+        for channel, version in new_versions.items():
+            if channel in values:
+                written += self._store_blob(key, channel, version, values[channel])
+            else:
+                self.blobs[(*key, channel, version)] = ("empty", b"")
+                self._blob_keys.setdefault(key, set()).add((channel, version))
+
+        # Blobs are written above, so the base class only stores the checkpoint
+        result = super().put(config, {**checkpoint, "channel_values": {}}, metadata, {})
+        saved = self.storage[thread_id][checkpoint_ns][checkpoint["id"]]
+        BYTES_WRITTEN.inc(written + len(saved[0][1]) + len(saved[1][1]), kind="checkpoint")
+
+        self._versions.setdefault(key, {})[checkpoint["id"]] = dict(checkpoint["channel_versions"])
+        if checkpoint_ns == "":
+            self._compact(key)
+        return result
+
+    # -------------------------------------------------------------------------
+    # Compaction
+    # -------------------------------------------------------------------------
+
+    def _rebase(self, key: Tuple[str, str], checkpoint_id: str):
+        """Store DeltaChannel values at checkpoint_id so its ancestors can go."""
+        versions = self._versions[key][checkpoint_id]
+        channels = [name for name in self.delta_channels if name in versions]
+        if not channels:
+            return
+        config = {"configurable": {"thread_id": key[0], "checkpoint_ns": key[1], "checkpoint_id": checkpoint_id}}
+        histories = self.get_delta_channel_history(config=config, channels=channels)
+        for name in channels:
+            blob = self.blobs.get((*key, name, versions[name]))
+            if blob is not None and blob[0] != "empty":
+                continue
+            history = histories[name]
+            spec = self.delta_channels[name]
+            channel = spec.from_checkpoint(history["seed"] if "seed" in history else spec.typ())
+            channel.replay_writes(history["writes"])
+            BYTES_WRITTEN.inc(self._store_blob(key, name, versions[name], channel.value), kind="rebase")
+
+    def _compact(self, key: Tuple[str, str]):
+        """Drop all but the latest `keep` checkpoints and what only they used."""
+        thread_id, checkpoint_ns = key
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.keep:
+            return
+        ordered = sorted(checkpoints)
+        self._rebase(key, ordered[-self.keep])
+
+        versions = self._versions[key]
+        for checkpoint_id in ordered[:-self.keep]:
+            del checkpoints[checkpoint_id]
+            versions.pop(checkpoint_id, None)
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        COMPACTED.inc(len(ordered) - self.keep)
+
+        referenced = {item for kept in versions.values() for item in kept.items()}
+        blob_keys = self._blob_keys[key]
+        blob_logs = self._blob_logs.get(key, {})
+        for channel, version in blob_keys - referenced:
+            self.blobs.pop((*key, channel, version), None)
+            blob_logs.pop((channel, version), None)
+        blob_keys &= referenced
+
+        live_logs = set(blob_logs.values())
+        if key in self._current:
+            live_logs.add(self._current[key].log_id)
+        key_logs = self._key_logs.get(key, set())
+        for log_id in key_logs - live_logs:
+            del self.logs[log_id]
+        key_logs &= live_logs
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        for key in [k for k in self._blob_keys if k[0] == thread_id]:
+            for log_id in self._key_logs.pop(key, ()):
+                self.logs.pop(log_id, None)
+            self._current.pop(key, None)
+            self._versions.pop(key, None)
+            self._blob_keys.pop(key, None)
+            self._blob_logs.pop(key, None)
+
+    def storage_bytes(self) -> int:
+        """Serialised bytes currently held (checkpoints, blobs, writes, logs)."""
+        total = 0
+        for namespaces in self.storage.values():
+            for checkpoints in namespaces.values():
+                for checkpoint, metadata, _ in checkpoints.values():
+                    total += len(checkpoint[1]) + len(metadata[1])
+        total += sum(len(blob[1]) for blob in self.blobs.values())
+        total += sum(len(w[2][1]) for writes in self.writes.values() for w in writes.values())
+        total += sum(len(entry[1]) for log in self.logs.values() for entry in log.entries)
+        return total
+
+
+def build_checkpointer():
+    """Checkpointer for build_agent(): CompactingSaver unless disabled."""
+    return CompactingSaver() if CHECKPOINT_COMPACTION else InMemorySaver()
+
+
+def bind_graph(graph):
+    """Bind a compiled graph's CompactingSaver to its channels."""
+    if isinstance(graph.checkpointer, CompactingSaver):
+        graph.checkpointer.bind(graph)
+    return graph
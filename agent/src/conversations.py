@@ -0,0 +1,334 @@
+"""
+Conversation session recording into conversation_sessions (migration 003).
+
+Each CLM call (session_type "voice", keyed by custom_session_id) and
+each AG-UI thread ("chat", keyed by threadId) gets one row. record_turn()
+only appends the exchange to an in-memory Recording, so a voice turn
+does no database work. A background flusher writes buffered turns in
+batches: a recording is flushed once it holds CONVERSATION_FLUSH_TURNS
+turns or has waited CONVERSATION_FLUSH_SECONDS. Every flush is one
+multi-row upsert that inserts new rows and appends to existing
+transcripts.
+
+A recording ends when its CLM session expires (sessions expiry hook),
+when it has been idle for CONVERSATION_IDLE_SECONDS, or at shutdown.
+Its remaining turns then go out with ended_at, duration, topics covered
+and items captured, as the final update to that row.
+
+A failed batch is retried row by row, so one bad row cannot hold back
+the rest. A row that keeps failing is dropped after
+CONVERSATION_MAX_ATTEMPTS, and while the database is unreachable each
+recording keeps at most CONVERSATION_MAX_PENDING_TURNS turns.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from . import db
+from . import metrics
+from .sessions import SESSION_IDLE_SECONDS
+
+
+CONVERSATION_RECORDING = os.environ.get("CONVERSATION_RECORDING", "true").lower() == "true"
+CONVERSATION_FLUSH_TURNS = int(os.environ.get("CONVERSATION_FLUSH_TURNS", "8"))
+CONVERSATION_FLUSH_SECONDS = float(os.environ.get("CONVERSATION_FLUSH_SECONDS", "30"))
+CONVERSATION_IDLE_SECONDS = float(os.environ.get("CONVERSATION_IDLE_SECONDS", str(SESSION_IDLE_SECONDS)))
+CONVERSATION_MAX_OPEN = int(os.environ.get("CONVERSATION_MAX_OPEN", "10000"))
+CONVERSATION_MAX_ATTEMPTS = int(os.environ.get("CONVERSATION_MAX_ATTEMPTS", "3"))
+CONVERSATION_MAX_PENDING_TURNS = int(os.environ.get("CONVERSATION_MAX_PENDING_TURNS", "200"))
+
+ROWS = metrics.counter(
+    "miam_conversation_rows_written_total",
+    "conversation_sessions rows written by kind (append, final)",
+    ["kind"],
+)
+DROPPED = metrics.counter(
+    "miam_conversation_dropped_total",
+    "Conversation data given up on by reason (row_failed: turns of a row that kept failing, "
+    "backlog: turns over CONVERSATION_MAX_PENDING_TURNS, ended_backlog: ended recordings over the cap)",
+    ["reason"],
+)
+
+
+class Recording:
+    """One conversation_sessions row and the turns not yet written to it."""
+    __slots__ = (
+        "id", "key", "user_id", "session_type", "started_at", "started", "last_seen",
+        "pending", "turns", "topics", "items", "metadata", "ended", "last_flush", "attempts",
+    )
+
+    def __init__(self, key: str, user_id: str, session_type: str):
+        now = time.monotonic()
+        self.id = str(uuid.uuid4())
+        self.key = key
+        self.user_id = user_id
+        self.session_type = session_type
+        self.started_at = datetime.now(timezone.utc)
+        self.started = now
+        self.last_seen = now
+        self.pending: List[str] = []
+        self.turns = 0
+        # Insertion-ordered set of topic names
+        self.topics: Dict[str, None] = {}
+        self.items = 0
+        self.metadata: dict = {}
+        self.ended: Optional[float] = None
+        self.last_flush = now
+        # Consecutive failed writes of this row on its own
+        self.attempts = 0
+
+    def row(self, chunk: str) -> tuple:
+        """Values for UPSERT_SQL carrying chunk as the transcript to append."""
+        ended_at = duration = None
+        metadata = dict(self.metadata, turns=self.turns)
+        if self.ended is not None:
+            seconds = self.ended - self.started
+            ended_at = self.started_at + timedelta(seconds=seconds)
+            duration = round(seconds / 60)
+            metadata["duration_seconds"] = round(seconds, 1)
+        return (
+            self.id, self.user_id, self.session_type, self.started_at, ended_at, duration,
+            list(self.topics), self.items, chunk, json.dumps(metadata),
+        )
+
+
+def _valid_user(user_id: Optional[str]) -> bool:
+    # conversation_sessions.user_id is a NOT NULL UUID; anonymous callers are not recorded
+    try:
+        uuid.UUID(str(user_id))
+        return True
+    except ValueError:
+        return False
+
+
+class ConversationRecorder:
+    """Open recordings by key plus ended ones awaiting their final write."""
+
+    def __init__(self, max_open: int = CONVERSATION_MAX_OPEN):
+        self.max_open = max_open
+        self._open: "OrderedDict[str, Recording]" = OrderedDict()
+        # Recording id -> recording awaiting its final write (at most once each)
+        self._ended: "OrderedDict[str, Recording]" = OrderedDict()
+
+    def record_turn(self, key: str, user_id: Optional[str], session_type: str, user_text: str, reply: str,
+                    captured: Iterable = (), safety: Optional[dict] = None):
+        """Buffer one exchange; captured are the Positions recorded during it."""
+        if not CONVERSATION_RECORDING or not key or not _valid_user(user_id) or not db.get_database_url():
+            return
+        recording = self._open.get(key)
+        if recording is None:
+            recording = self._open[key] = Recording(key, user_id, session_type)
+            if len(self._open) > self.max_open:
+                self._end(self._open.popitem(last=False)[1])
+        else:
+            self._open.move_to_end(key)
+        recording.last_seen = time.monotonic()
+        recording.turns += 1
+        # Postgres text cannot hold NUL
+        recording.pending.append(f"User: {user_text}\nMiam: {reply}\n".replace("\x00", ""))
+        if len(recording.pending) > CONVERSATION_MAX_PENDING_TURNS:
+            del recording.pending[0]
+            DROPPED.inc(reason="backlog")
+        for position in captured:
+            recording.items += 1
+            recording.topics[position.topic_name] = None
+        if safety:
+            # Every category flagged in the conversation, not just the latest turn's
+            flagged = recording.metadata.get("safety", []) + safety["categories"]
+            recording.metadata["safety"] = list(dict.fromkeys(flagged))
+
+    def finish(self, key: str):
+        """End the recording for key, if any; its final write goes out with the next flush."""
+        recording = self._open.pop(key, None)
+        if recording is not None:
+            self._end(recording)
+
+    def _end(self, recording: Recording):
+        recording.ended = recording.last_seen
+        self._ended[recording.id] = recording
+        if len(self._ended) > self.max_open:
+            self._ended.popitem(last=False)
+            DROPPED.inc(reason="ended_backlog")
+
+    def expire(self, now: Optional[float] = None, all_open: bool = False):
+        """End recordings idle past CONVERSATION_IDLE_SECONDS (or every open one)."""
+        now = now or time.monotonic()
+        while self._open:
+            key, recording = next(iter(self._open.items()))
+            if not all_open and now - recording.last_seen < CONVERSATION_IDLE_SECONDS:
+                break
+            del self._open[key]
+            self._end(recording)
+
+    def take_due(self, now: Optional[float] = None) -> List[tuple]:
+        """(recording, chunk) for ended recordings and open ones due a flush."""
+        now = now or time.monotonic()
+        due = [(r, "".join(r.pending)) for r in self._ended.values()]
+        self._ended = OrderedDict()
+        for recording in self._open.values():
+            if recording.pending and (
+                len(recording.pending) >= CONVERSATION_FLUSH_TURNS
+                or now - recording.last_flush >= CONVERSATION_FLUSH_SECONDS
+            ):
+                due.append((recording, "".join(recording.pending)))
+        for recording, _ in due:
+            recording.pending = []
+            recording.last_flush = now
+        return due
+
+    def restore(self, due: List[tuple]):
+        """
+        Put a failed batch back so it is retried on the next flush.
+
+        A recording that was finish()ed while its write was in flight is
+        already in _ended; keying by id keeps it there once, so the next
+        upsert never carries the same row (or chunk) twice.
+        """
+        for recording, chunk in due:
+            recording.pending.insert(0, chunk)
+            del recording.pending[:-CONVERSATION_MAX_PENDING_TURNS]
+            if recording.ended is not None:
+                self._ended.setdefault(recording.id, recording)
+                if len(self._ended) > self.max_open:
+                    self._ended.popitem(last=False)
+                    DROPPED.inc(reason="ended_backlog")
+
+    def stats(self) -> dict:
+        return {
+            "open": len(self._open),
+            "ended": len(self._ended),
+            "pending_turns": sum(len(r.pending) for r in self._open.values()),
+        }
+
+
+recorder = ConversationRecorder()
+
+metrics.gauge(
+    "miam_conversation_recordings", "Conversation recordings by state (open, ended, pending_turns)", ["state"],
+).set_function(lambda: {(state,): value for state, value in recorder.stats().items()})
+
+
+def finish_session(session):
+    """sessions expiry hook: end the CLM call's recording."""
+    recorder.finish(session.session_id)
+
+
+# =============================================================================
+# Batched Persistence
+# =============================================================================
+
+UPSERT_SQL = """
+    INSERT INTO conversation_sessions
+        (id, user_id, session_type, started_at, ended_at, duration_minutes,
+         topics_covered, items_captured, transcript, metadata)
+    VALUES %s
+    ON CONFLICT (id) DO UPDATE SET
+        transcript = COALESCE(conversation_sessions.transcript, '') || EXCLUDED.transcript,
+        topics_covered = EXCLUDED.topics_covered,
+        items_captured = EXCLUDED.items_captured,
+        ended_at = COALESCE(EXCLUDED.ended_at, conversation_sessions.ended_at),
+        duration_minutes = COALESCE(EXCLUDED.duration_minutes, conversation_sessions.duration_minutes),
+        metadata = conversation_sessions.metadata || EXCLUDED.metadata
+"""
+ROW_TEMPLATE = "(%s::uuid, %s::uuid, %s, %s, %s, %s, %s::text[], %s, %s, %s::jsonb)"
+
+
+def _write_batch(rows: List[tuple]):
+    from psycopg2.extras import execute_values
+
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, UPSERT_SQL, rows, template=ROW_TEMPLATE, page_size=200)
+
+
+def _transient(error: Exception) -> bool:
+    """Whether a write failed for want of a database rather than because of its rows."""
+    from psycopg2 import InterfaceError, OperationalError
+    from psycopg2.pool import PoolError
+
+    return isinstance(error, (InterfaceError, OperationalError, PoolError))
+
+
+async def _write_each(due: List[tuple]) -> List[tuple]:
+    """Write a failed batch's rows one at a time; returns those written."""
+    written = []
+    for i, (recording, chunk) in enumerate(due):
+        try:
+            await asyncio.to_thread(_write_batch, [recording.row(chunk)])
+        except Exception as e:
+            if _transient(e):
+                # Nothing will get through now; keep the rest without charging them
+                recorder.restore(due[i:])
+                break
+            recording.attempts += 1
+            if recording.attempts < CONVERSATION_MAX_ATTEMPTS:
+                recorder.restore([(recording, chunk)])
+                continue
+            DROPPED.inc(chunk.count("User: ") or 1, reason="row_failed")
+            print(
+                f"[CONVERSATIONS] Dropped {recording.id[:8]} after {recording.attempts} failed writes: {e}",
+                file=sys.stderr,
+            )
+            recording.attempts = 0
+            continue
+        recording.attempts = 0
+        written.append((recording, chunk))
+    return written
+
+
+async def flush(now: Optional[float] = None):
+    """Write due recordings in one batch; a failed batch is retried row by row."""
+    if not db.get_database_url():
+        return
+    recorder.expire(now)
+    due = recorder.take_due(now)
+    if not due:
+        return
+    try:
+        await asyncio.to_thread(_write_batch, [recording.row(chunk) for recording, chunk in due])
+    except Exception as e:
+        if _transient(e):
+            recorder.restore(due)
+            print(f"[CONVERSATIONS] Flush failed ({len(due)} sessions kept): {e}", file=sys.stderr)
+            return
+        print(f"[CONVERSATIONS] Batch of {len(due)} failed ({e}), retrying row by row", file=sys.stderr)
+        due = await _write_each(due)
+    final = sum(1 for recording, _ in due if recording.ended is not None)
+    ROWS.inc(len(due) - final, kind="append")
+    ROWS.inc(final, kind="final")
+
+
+_flush_task: Optional[asyncio.Task] = None
+
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(1)
+        await flush()
+
+
+def start_flusher():
+    global _flush_task
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_loop())
+
+
+async def stop_flusher():
+    """Stop the flusher and end every open recording with a final write."""
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    recorder.expire(all_open=True)
+    await flush()
@@ -0,0 +1,107 @@
+"""
+Neon PostgreSQL connection pool for the MIAM.quest agent.
+
+A single lazily-created ThreadedConnectionPool shared by tools and
+endpoints, so each query reuses a warm connection instead of paying
+for a fresh TLS handshake to Neon. ThreadedConnectionPool raises
+PoolError as soon as all DB_POOL_MAX connections are out, so borrowers
+first wait (bounded) on a semaphore with one slot per connection.
+"""
+
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+from . import deadline
+
+
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "10"))
+DB_CONNECT_TIMEOUT = int(os.environ.get("DB_CONNECT_TIMEOUT", "5"))
+DB_POOL_WAIT_SECONDS = float(os.environ.get("DB_POOL_WAIT_SECONDS", "10"))
+
+_pool = None
+_pool_lock = threading.Lock()
+# One slot per pooled connection; getconn() only runs while holding one
+_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+
+def get_database_url():
+    """Get database URL."""
+    return os.environ.get("DATABASE_URL")
+
+
+def get_pool():
+    """Lazy create the shared connection pool (None if no DATABASE_URL)."""
+    global _pool
+    if _pool is None:
+        database_url = get_database_url()
+        if not database_url:
+            return None
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    database_url,
+                    connect_timeout=DB_CONNECT_TIMEOUT,
+                )
+                print(f"[DB] Pool created (min={DB_POOL_MIN}, max={DB_POOL_MAX})", file=sys.stderr)
+    return _pool
+
+
+@contextmanager
+def get_connection():
+    """
+    Borrow a pooled connection.
+
+    Waits up to DB_POOL_WAIT_SECONDS (or the request deadline, if
+    sooner) for a free connection, then raises PoolError. Commits on
+    success, rolls back on error, and discards the connection instead of
+    returning it if it was closed underneath us.
+    """
+    pool = get_pool()
+    if pool is None:
+        raise RuntimeError("DATABASE_URL not set")
+
+    wait = DB_POOL_WAIT_SECONDS
+    left = deadline.remaining()
+    if left is not None:
+        wait = max(0.0, min(wait, left))
+    if not _slots.acquire(timeout=wait):
+        print(f"[DB] No free connection after {wait:.1f}s (max={DB_POOL_MAX})", file=sys.stderr)
+        raise PoolError(f"no free connection after {wait:.1f}s")
+    try:
+        conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
+    finally:
+        _slots.release()
+
+
+def ping() -> bool:
+    """Run SELECT 1 on a pooled connection."""
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+            return cur.fetchone() == (1,)
+
+
+def close_pool():
+    """Close all pooled connections (used on shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
@@ -0,0 +1,128 @@
+"""
+Per-request deadlines and cancellation for agent runs.
+
+The active deadline lives in a ContextVar, so it follows the request
+into the LangGraph run and into sync tools (LangChain copies the
+context when it hands them to an executor thread). Tools call
+remaining() to bound their own I/O or bail out early.
+"""
+
+import os
+import math
+import time
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Optional, Tuple
+
+from . import metrics
+
+
+CLM_REQUEST_BUDGET_SECONDS = float(os.environ.get("CLM_REQUEST_BUDGET_SECONDS", "20"))
+AGUI_REQUEST_BUDGET_SECONDS = float(os.environ.get("AGUI_REQUEST_BUDGET_SECONDS", "120"))
+MAX_REQUEST_BUDGET_SECONDS = float(os.environ.get("MAX_REQUEST_BUDGET_SECONDS", "180"))
+DISCONNECT_POLL_SECONDS = 0.25
+
+# Headers a caller can use to set its own budget (milliseconds)
+BUDGET_HEADERS = ("x-request-timeout-ms", "x-request-budget-ms")
+
+ABANDONED = metrics.counter(
+    "miam_abandoned_runs_total",
+    "Agent runs abandoned before completion",
+    ["endpoint", "reason"],
+)
+
+_deadline: ContextVar[Optional[float]] = ContextVar("miam_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised by check() once the request budget is spent."""
+
+
+def budget_from_request(request, default: float = CLM_REQUEST_BUDGET_SECONDS) -> float:
+    """Request budget in seconds from headers, clamped to the configured max."""
+    for header in BUDGET_HEADERS:
+        value = request.headers.get(header)
+        if value:
+            try:
+                return max(0.1, min(float(value) / 1000, MAX_REQUEST_BUDGET_SECONDS))
+            except ValueError:
+                break
+    return default
+
+
+@contextmanager
+def scope(expires_at: float):
+    """Make expires_at (time.monotonic) the active deadline within the block."""
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left on the active deadline, or None if there is none."""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check():
+    """Raise DeadlineExceeded if the active deadline has passed."""
+    if expired():
+        raise DeadlineExceeded("request deadline exceeded")
+
+
+def request_options(cap: Optional[float] = None) -> Optional[dict]:
+    """Zep SDK request_options bounded by the active deadline."""
+    left = remaining()
+    if left is None and cap is None:
+        return None
+    timeout = min(x for x in (left, cap) if x is not None)
+    return {"timeout_in_seconds": max(1, math.ceil(timeout))}
+
+
+async def _wait_for_disconnect(request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def run_until_deadline_or_disconnect(
+    coro: Awaitable[Any], request, endpoint: str
+) -> Tuple[str, Any]:
+    """
+    Run coro until it finishes, the deadline passes, or the client leaves.
+
+    Returns ("ok", result), ("deadline", None) or ("disconnect", None).
+    The work is cancelled in the last two cases and counted as abandoned.
+    """
+    work = asyncio.ensure_future(coro)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        timeout = remaining()
+        done, _ = await asyncio.wait(
+            {work, watcher},
+            timeout=None if timeout is None else max(0.0, timeout),
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if work in done:
+            return "ok", work.result()
+
+        reason = "disconnect" if watcher in done else "deadline"
+        ABANDONED.inc(endpoint=endpoint, reason=reason)
+        return reason, None
+    except asyncio.CancelledError:
+        # Server cancelled the response task: the client went away
+        ABANDONED.inc(endpoint=endpoint, reason="disconnect")
+        raise
+    finally:
+        for task in (work, watcher):
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,271 @@
+"""
+Managed executor for MIAM tools.
+
+Every MIAM tool is a synchronous function. Without this module, LangGraph
+runs each async tool call on the event loop's default executor, so a
+slow Zep or Neon call holds threads that every other tool (and
+asyncio.to_thread) needs. install() gives each tool a coroutine that runs
+it on one of two bounded thread pools instead: "io" for tools that wait
+on the network, and "cpu" for tools that only compute.
+
+Each tool also has a concurrency limit and a timeout. A call waits for a
+slot in its tool's limit and then runs on the pool. Its slot is held
+until the thread actually finishes, even after the caller has timed
+out. That caps how many pool threads one stuck dependency can occupy,
+so other tools in the same pool keep their threads. ToolStepMiddleware
+gives all the tool calls of one model step a shared deadline.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from langchain.agents.middleware import AgentMiddleware
+
+from . import deadline
+from . import metrics
+
+
+TOOL_IO_WORKERS = int(os.environ.get("TOOL_IO_WORKERS", "16"))
+TOOL_CPU_WORKERS = int(os.environ.get("TOOL_CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+TOOL_TIMEOUT_SECONDS = float(os.environ.get("TOOL_TIMEOUT_SECONDS", "15"))
+TOOL_EXECUTOR_ENABLED = os.environ.get("TOOL_EXECUTOR", "true").lower() != "false"
+TOOL_STEP_BUDGET_SECONDS = float(os.environ.get("TOOL_STEP_BUDGET_SECONDS", "12"))
+
+CALLS = metrics.counter(
+    "miam_tool_calls_total",
+    "Tool calls run on the managed executor by outcome (ok, error, timeout)",
+    ["tool", "outcome"],
+)
+QUEUE_SECONDS = metrics.histogram(
+    "miam_tool_queue_seconds",
+    "Time tool calls waited for their tool limit and a pool thread",
+    ["pool"],
+)
+STEP_WIDTH = metrics.histogram(
+    "miam_tool_step_calls",
+    "Tool calls issued together in one model step",
+    buckets=(1, 2, 3, 4, 6, 8),
+)
+
+
+class ToolTimeout(Exception):
+    """Raised when a tool call does not finish within its timeout."""
+
+
+class ToolPolicy:
+    """Pool, concurrency limit and timeout for one tool."""
+    __slots__ = ("pool", "limit", "timeout")
+
+    def __init__(self, pool: str = "cpu", limit: int = 8, timeout: float = TOOL_TIMEOUT_SECONDS):
+        self.pool = pool
+        self.limit = limit
+        self.timeout = timeout
+
+
+# Network-bound tools go to "io" with a tighter cap each; the rest are cheap
+DEFAULT_POLICIES = {
+    "search_mediators": ToolPolicy("io", limit=6, timeout=8),
+    "generate_preparation_summary": ToolPolicy("io", limit=4, timeout=10),
+    "load_user_memory": ToolPolicy("io", limit=6, timeout=10),
+    "capture_position": ToolPolicy("cpu", limit=8, timeout=5),
+    "get_position_summary": ToolPolicy("cpu", limit=8, timeout=5),
+    "get_miam_info": ToolPolicy("cpu", limit=8, timeout=5),
+    "check_exemption_eligibility": ToolPolicy("cpu", limit=8, timeout=5),
+}
+
+
+def load_policies() -> Dict[str, ToolPolicy]:
+    """DEFAULT_POLICIES overridden by TOOL_POLICIES_JSON ({"tool": {"pool", "limit", "timeout"}})."""
+    policies = dict(DEFAULT_POLICIES)
+    for name, override in json.loads(os.environ.get("TOOL_POLICIES_JSON", "{}")).items():
+        base = policies.get(name, ToolPolicy())
+        policies[name] = ToolPolicy(
+            override.get("pool", base.pool),
+            int(override.get("limit", base.limit)),
+            float(override.get("timeout", base.timeout)),
+        )
+    return policies
+
+
+class ToolExecutor:
+    """Bounded io/cpu thread pools with per-tool limits and timeouts."""
+
+    def __init__(
+        self,
+        io_workers: int = TOOL_IO_WORKERS,
+        cpu_workers: int = TOOL_CPU_WORKERS,
+        policies: Optional[Dict[str, ToolPolicy]] = None,
+    ):
+        self.policies = policies if policies is not None else load_policies()
+        self.workers = {"io": io_workers, "cpu": cpu_workers}
+        self.pools = {
+            name: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"tool-{name}")
+            for name, workers in self.workers.items()
+        }
+        self._lock = threading.Lock()
+        self._queued = {name: 0 for name in self.pools}
+        self._active = {name: 0 for name in self.pools}
+        # Per-tool slots belong to one event loop; rebuilt if the loop changes
+        self._loop = None
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    def policy(self, name: str) -> ToolPolicy:
+        return self.policies.get(name) or ToolPolicy()
+
+    def _slot(self, name: str, limit: int) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop, self._slots = loop, {}
+        slot = self._slots.get(name)
+        if slot is None:
+            slot = self._slots[name] = asyncio.Semaphore(limit)
+        return slot
+
+    def _run(self, pool: str, submitted: float, context: contextvars.Context, func, args, kwargs):
+        with self._lock:
+            self._queued[pool] -= 1
+            self._active[pool] += 1
+        QUEUE_SECONDS.observe(time.monotonic() - submitted, pool=pool)
+        try:
+            return context.run(func, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._active[pool] -= 1
+
+    async def call(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        """Run func on its tool's pool; raises ToolTimeout past the tool timeout or request deadline."""
+        policy = self.policy(name)
+        timeout = policy.timeout
+        left = deadline.remaining()
+        if left is not None:
+            timeout = min(timeout, left)
+        expires_at = time.monotonic() + timeout
+
+        slot = self._slot(name, policy.limit)
+        submitted = time.monotonic()
+        try:
+            await asyncio.wait_for(slot.acquire(), max(0.0, timeout))
+        except asyncio.TimeoutError:
+            CALLS.inc(tool=name, outcome="timeout")
+            raise ToolTimeout(f"{name} waited {timeout:.1f}s for a slot")
+
+        with self._lock:
+            self._queued[policy.pool] += 1
+        future = asyncio.get_running_loop().run_in_executor(
+            self.pools[policy.pool], self._run, policy.pool, submitted, contextvars.copy_context(), func, args, kwargs,
+        )
+        # Hold the slot until the thread is done, not just until we stop waiting
+        future.add_done_callback(lambda _: slot.release())
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), max(0.0, expires_at - time.monotonic()))
+        except asyncio.TimeoutError:
+            CALLS.inc(tool=name, outcome="timeout")
+            print(f"[EXECUTOR] {name} timed out after {timeout:.1f}s", file=sys.stderr)
+            raise ToolTimeout(f"{name} timed out after {timeout:.1f}s")
+        except Exception:
+            CALLS.inc(tool=name, outcome="error")
+            raise
+        CALLS.inc(tool=name, outcome="ok")
+        return result
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                pool: {"workers": self.workers[pool], "queued": self._queued[pool], "active": self._active[pool]}
+                for pool in self.pools
+            }
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared per-worker executor
+executor = ToolExecutor()
+
+metrics.gauge(
+    "miam_tool_pool_tasks", "Tool calls per executor pool by state (queued, active)", ["pool", "state"],
+).set_function(lambda: {
+    (pool, state): value
+    for pool, stats in executor.stats().items()
+    for state, value in stats.items() if state != "workers"
+})
+
+
+def _coroutine_for(name: str, func: Callable):
+    async def run_on_executor(*args, **kwargs):
+        try:
+            return await executor.call(name, func, *args, **kwargs)
+        except ToolTimeout as e:
+            return {"success": False, "error": str(e)}
+    return run_on_executor
+
+
+def install(tools: list) -> list:
+    """Route async invocations of sync tools through the managed executor."""
+    if TOOL_EXECUTOR_ENABLED:
+        for t in tools:
+            if getattr(t, "func", None) is not None and getattr(t, "coroutine", None) is None:
+                t.coroutine = _coroutine_for(t.name, t.func)
+    return tools
+
+
+# =============================================================================
+# Parallel Tool Steps
+# =============================================================================
+
+# Step key (the AIMessage that issued the calls) -> monotonic deadline
+_step_deadlines: "OrderedDict[str, float]" = OrderedDict()
+_MAX_TRACKED_STEPS = 1024
+
+
+def _step_of(request):
+    """(key, width) of the model step that issued this tool call."""
+    call_id = (request.tool_call or {}).get("id")
+    messages = (request.state or {}).get("messages", []) if isinstance(request.state, dict) else []
+    for message in reversed(messages):
+        calls = getattr(message, "tool_calls", None)
+        if calls and any(c.get("id") == call_id for c in calls):
+            return getattr(message, "id", None) or calls[0].get("id"), len(calls)
+    return call_id, 1
+
+
+def _step_deadline(request) -> float:
+    key, width = _step_of(request)
+    expires_at = _step_deadlines.get(key)
+    if expires_at is None:
+        expires_at = _step_deadlines[key] = time.monotonic() + TOOL_STEP_BUDGET_SECONDS
+        STEP_WIDTH.observe(width)
+        while len(_step_deadlines) > _MAX_TRACKED_STEPS:
+            _step_deadlines.popitem(last=False)
+    left = deadline.remaining()
+    return expires_at if left is None else min(expires_at, time.monotonic() + left)
+
+
+class ToolStepMiddleware(AgentMiddleware):
+    """
+    Share one deadline across the tool calls of a model step.
+
+    The graph already dispatches each tool call of a step as its own
+    task, so they run side by side on the managed pools and their
+    ToolMessages are applied in tool_call order. This bounds the step:
+    every call in it stops at the same TOOL_STEP_BUDGET_SECONDS deadline
+    (or the request deadline, if sooner), so one slow call cannot hold
+    the others' results back past it.
+    """
+
+    async def awrap_tool_call(self, request, handler: Callable[..., Awaitable]):
+        with deadline.scope(_step_deadline(request)):
+            return await handler(request)
+
+    def wrap_tool_call(self, request, handler):
+        with deadline.scope(_step_deadline(request)):
+            return handler(request)
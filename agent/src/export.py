@@ -0,0 +1,248 @@
+"""
+Document export pipeline (PDF / DOCX).
+
+Renders `documents` rows (preparation_summary, parenting_plan,
+position_statement) with the stdlib writers in src/render.py. Rendering
+runs in a process pool so it never blocks the event loop; workers write
+straight to a cache file keyed by document id and version, and the
+endpoint streams that file to the client in chunks. Concurrent requests
+for the same version share one render, and later requests for an
+unchanged version are served from the cache without touching a worker.
+
+Only a party to the case can export its documents. The export is
+opened as soon as it is found in the cache, with no await in between,
+so a later eviction can only unlink a file that is already being
+streamed.
+"""
+
+import os
+import sys
+import time
+import uuid
+import asyncio
+import tempfile
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Dict, Optional, Tuple
+
+from . import db
+from . import metrics
+from . import render
+from . import summary
+
+
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", "2"))
+EXPORT_CACHE_DIR = os.environ.get("EXPORT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "miam-exports")
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get("EXPORT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+EXPORT_CHUNK_BYTES = int(os.environ.get("EXPORT_CHUNK_BYTES", "65536"))
+
+DOC_TYPES = ("preparation_summary", "parenting_plan", "position_statement")
+MEDIA_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+LATEST_QUERY = """
+    SELECT id, title, version
+    FROM documents
+    WHERE case_id = %s AND doc_type = %s
+    ORDER BY version DESC
+    LIMIT 1
+"""
+CONTENT_QUERY = "SELECT content FROM documents WHERE id = %s"
+
+EXPORTS = metrics.counter(
+    "miam_export_requests_total",
+    "Document exports by format and cache outcome (hit, joined, rendered, error)",
+    ["format", "outcome"],
+)
+RENDER_SECONDS = metrics.histogram(
+    "miam_export_render_seconds",
+    "Time to render a document export in the process pool",
+    ["format"],
+)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_cached: "OrderedDict[str, int]" = OrderedDict()  # path -> size, LRU order
+_cached_bytes = 0
+_inflight: Dict[str, "asyncio.Future[int]"] = {}
+
+
+class Export:
+    """A rendered export ready to stream."""
+    __slots__ = ("path", "handle", "filename", "media_type", "version", "outcome")
+
+    def __init__(self, path: str, handle: IO[bytes], filename: str, media_type: str, version: int, outcome: str):
+        self.path = path
+        self.handle = handle
+        self.filename = filename
+        self.media_type = media_type
+        self.version = version
+        self.outcome = outcome
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Lazy create the render pool (forkserver, so workers never inherit server threads)."""
+    global _pool
+    if _pool is None:
+        os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([render.__name__])
+        _pool = ProcessPoolExecutor(max_workers=EXPORT_WORKERS, mp_context=context)
+        print(f"[EXPORT] Render pool started ({EXPORT_WORKERS} workers, cache {EXPORT_CACHE_DIR})", file=sys.stderr)
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+
+def _remember(path: str, size: int):
+    """Record a cached file and evict least recently used ones over budget."""
+    global _cached_bytes
+    _cached_bytes += size - _cached.pop(path, 0)
+    _cached[path] = size
+    while _cached_bytes > EXPORT_CACHE_MAX_BYTES and len(_cached) > 1:
+        old_path, old_size = _cached.popitem(last=False)
+        _cached_bytes -= old_size
+        try:
+            os.remove(old_path)
+        except OSError:
+            pass
+
+
+def _lookup(path: str) -> bool:
+    if path in _cached:
+        _cached.move_to_end(path)
+        return True
+    if os.path.exists(path):
+        # Rendered by an earlier process; versions never change in place
+        _remember(path, os.path.getsize(path))
+        return True
+    return False
+
+
+def _open(path: str) -> Optional[IO[bytes]]:
+    """Open a cached export for streaming; None if it is not (or no longer) cached."""
+    global _cached_bytes
+    if not _lookup(path):
+        return None
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        _cached_bytes -= _cached.pop(path, 0)
+        return None
+
+
+# =============================================================================
+# Export
+# =============================================================================
+
+def _owned(case_id: str, user_id: str) -> bool:
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            return summary.owns_case(cur, case_id, user_id)
+
+
+def _latest(case_id: str, doc_type: str) -> Optional[Tuple]:
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(LATEST_QUERY, (case_id, doc_type))
+            return cur.fetchone()
+
+
+def _content(document_id) -> str:
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(CONTENT_QUERY, (document_id,))
+            return cur.fetchone()[0]
+
+
+async def _render(fmt: str, document_id, title: str, path: str) -> int:
+    content = await asyncio.to_thread(_content, document_id)
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    size = await loop.run_in_executor(get_pool(), render.render_to_file, fmt, title, content, path)
+    RENDER_SECONDS.observe(time.perf_counter() - started, format=fmt)
+    _remember(path, size)
+    return size
+
+
+async def export(case_id: str, doc_type: str, fmt: str, user_id: str) -> Export:
+    """
+    Render (or reuse) the latest version of a case document for user_id.
+
+    user_id must already be verified (src.identity). Preparation
+    summaries are regenerated from positions first (a no-op when nothing
+    changed). Raises LookupError if the case id is malformed, the case
+    is missing or not user_id's (alike, so cases cannot be probed), or it
+    has no such document, and ValueError for unsupported types or
+    formats. The returned Export holds the file open; the caller streams
+    and closes it.
+    """
+    if doc_type not in DOC_TYPES or fmt not in MEDIA_TYPES:
+        raise ValueError(f"Cannot export {doc_type} as {fmt}")
+    try:
+        uuid.UUID(case_id)
+    except ValueError:
+        raise LookupError(f"No case {case_id}") from None
+
+    if doc_type == summary.DOC_TYPE:
+        # Checks ownership before it writes anything
+        await asyncio.to_thread(summary.generate, case_id, user_id)
+    elif not await asyncio.to_thread(_owned, case_id, user_id):
+        raise LookupError(f"No case {case_id}")
+    latest = await asyncio.to_thread(_latest, case_id, doc_type)
+    if latest is None:
+        raise LookupError(f"No {doc_type} for case {case_id}")
+
+    document_id, title, version = latest
+    path = os.path.join(EXPORT_CACHE_DIR, f"{document_id}-v{version}.{fmt}")
+    outcome = "hit"
+    handle = _open(path)
+    # Another render can evict this one before we resume; render it again once
+    for _ in range(2):
+        if handle is not None:
+            break
+        pending = _inflight.get(path)
+        if pending is not None:
+            outcome = "joined"
+            await asyncio.shield(pending)
+        else:
+            outcome = "rendered"
+            task = asyncio.ensure_future(_render(fmt, document_id, title, path))
+            _inflight[path] = task
+            try:
+                await asyncio.shield(task)
+            except Exception:
+                EXPORTS.inc(format=fmt, outcome="error")
+                raise
+            finally:
+                _inflight.pop(path, None)
+        handle = _open(path)
+    if handle is None:
+        EXPORTS.inc(format=fmt, outcome="error")
+        raise RuntimeError(f"Export {path} was evicted before it could be opened")
+
+    EXPORTS.inc(format=fmt, outcome=outcome)
+    return Export(path, handle, f"{doc_type}-v{version}.{fmt}", MEDIA_TYPES[fmt], version, outcome)
+
+
+async def stream(handle, chunk_bytes: int = EXPORT_CHUNK_BYTES):
+    """Yield an open export file in chunks, closing it when done."""
+    try:
+        while True:
+            chunk = await asyncio.to_thread(handle.read, chunk_bytes)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        handle.close()
@@ -0,0 +1,104 @@
+"""
+Pre-rendered voice greetings and fixed responses for the CLM endpoint.
+
+The opening turn of a Hume call is almost always a bare "hello", and
+the agent's answer to it is a greeting. is_session_start() spots that
+turn so the endpoint can answer at once from a template, while the Zep
+user, memory context (kept on the session) and agent thread are warmed
+in the background for the next turn. Fixed responses (greetings, hold, timeout, error) are
+encoded to SSE frames once per text and chunking config and cached.
+"""
+
+import os
+import re
+import asyncio
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from . import metrics
+from . import sse
+
+
+CLM_GREETING_FAST_PATH = os.environ.get("CLM_GREETING_FAST_PATH", "true").lower() == "true"
+
+GREETING_NAMED = (
+    "Hello {name}. I'm Miam, your mediation preparation assistant. "
+    "I'm here to help you prepare for your MIAM meeting. How are you feeling today?"
+)
+GREETING_ANON = (
+    "Hello. I'm Miam, your mediation preparation assistant. I'm here to help you "
+    "understand the mediation process and prepare for your MIAM meeting. How can I help you today?"
+)
+
+GREETING_MAX_WORDS = 4
+GREETING_WORDS = {
+    "hi", "hello", "hey", "hiya", "morning", "afternoon", "evening", "good",
+    "there", "miam", "hallo", "yo", "howdy", "anyone", "you", "are", "is",
+}
+_WORD = re.compile(r"[a-z']+")
+
+FAST_PATH = metrics.counter(
+    "miam_greeting_fast_path_total",
+    "Opening CLM turns answered from the greeting template cache",
+)
+
+
+def greeting_text(user_name: str = "") -> str:
+    """Personalised opening greeting."""
+    name = (user_name or "").strip()
+    return GREETING_NAMED.format(name=name) if name else GREETING_ANON
+
+
+def is_session_start(messages: list) -> bool:
+    """True if no assistant turn exists yet and the user only said hello."""
+    user_msg = ""
+    for msg in messages:
+        role = msg.get("role")
+        if role == "assistant":
+            return False
+        if role == "user":
+            content = msg.get("content", "")
+            user_msg = content if isinstance(content, str) else ""
+    words = _WORD.findall(user_msg.lower())
+    return len(words) <= GREETING_MAX_WORDS and all(w in GREETING_WORDS for w in words)
+
+
+# =============================================================================
+# Pre-rendered Frames
+# =============================================================================
+
+@lru_cache(maxsize=1024)
+def _frames(text: str, msg_id: str, chunking: str, max_chars: int) -> Tuple[str, ...]:
+    return tuple(sse.encode(text, msg_id, sse.SSEConfig(chunking, max_chars)))
+
+
+def frames(text: str, msg_id: str, config: Optional[sse.SSEConfig] = None) -> Tuple[str, ...]:
+    """Cached SSE frames for a fixed response."""
+    config = config or sse.DEFAULT_CONFIG
+    return _frames(text, msg_id, config.chunking, config.max_chars)
+
+
+async def stream_prerendered(text: str, msg_id: str, config: Optional[sse.SSEConfig] = None):
+    for frame in frames(text, msg_id, config):
+        yield frame
+
+
+def prerender(responses: dict):
+    """Fill the frame cache ({msg_id: text}) so the first caller pays nothing."""
+    for msg_id, text in responses.items():
+        frames(text, msg_id)
+
+
+# =============================================================================
+# Background Warm-up
+# =============================================================================
+
+_warm_tasks = set()
+
+
+def schedule_warmup(coro):
+    """Run a warm-up coroutine in the background, keeping a reference to it."""
+    task = asyncio.create_task(coro)
+    _warm_tasks.add(task)
+    task.add_done_callback(_warm_tasks.discard)
+    return task
@@ -0,0 +1,182 @@
+"""
+Readiness probes for the MIAM.quest agent.
+
+Dependency checks (LLM, Neon pool, Zep) run in a background loop and
+their results are cached, so /readyz only reads memory. /healthz stays
+a static liveness check.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import urllib.request
+from typing import Callable, Dict, Optional
+
+from . import admission
+
+
+READINESS_PROBE_INTERVAL = float(os.environ.get("READINESS_PROBE_INTERVAL", "15"))
+READINESS_PROBE_TIMEOUT = float(os.environ.get("READINESS_PROBE_TIMEOUT", "5"))
+# Results older than this are treated as failed (probe loop stuck or dead)
+READINESS_STALE_AFTER = READINESS_PROBE_INTERVAL * 3
+READINESS_FAIL_WHEN_SATURATED = os.environ.get("READINESS_FAIL_WHEN_SATURATED", "false").lower() == "true"
+
+
+# =============================================================================
+# Probe Registry
+# =============================================================================
+
+# name -> (probe function, required). A probe returns None when healthy,
+# "disabled" when the dependency is not configured, and raises otherwise.
+_probes: Dict[str, tuple] = {}
+_results: Dict[str, dict] = {}
+_probe_task: Optional[asyncio.Task] = None
+
+
+def register_probe(name: str, probe: Callable[[], Optional[str]], required: bool = True):
+    """Register a blocking dependency probe (run in a worker thread)."""
+    _probes[name] = (probe, required)
+
+
+async def _run_probe(name: str, probe: Callable[[], Optional[str]]) -> dict:
+    started = time.monotonic()
+    try:
+        outcome = await asyncio.wait_for(asyncio.to_thread(probe), READINESS_PROBE_TIMEOUT)
+        status = "disabled" if outcome == "disabled" else "ok"
+        detail = ""
+    except asyncio.TimeoutError:
+        status, detail = "error", f"timed out after {READINESS_PROBE_TIMEOUT}s"
+    except Exception as e:
+        status, detail = "error", str(e)[:200]
+
+    return {
+        "status": status,
+        "detail": detail,
+        "latency_ms": round((time.monotonic() - started) * 1000, 1),
+        "checked_at": time.time(),
+    }
+
+
+async def run_probes_once():
+    """Run every registered probe concurrently and cache the results."""
+    names = list(_probes)
+    results = await asyncio.gather(*[_run_probe(n, _probes[n][0]) for n in names])
+    for name, result in zip(names, results):
+        previous = _results.get(name)
+        if result["status"] == "error" and (not previous or previous["status"] != "error"):
+            print(f"[HEALTH] {name} probe failed: {result['detail']}", file=sys.stderr)
+        _results[name] = result
+
+
+async def _probe_loop():
+    while True:
+        try:
+            await run_probes_once()
+        except Exception as e:
+            print(f"[HEALTH] Probe loop error: {e}", file=sys.stderr)
+        await asyncio.sleep(READINESS_PROBE_INTERVAL)
+
+
+def start_probes():
+    """Start the background probe loop (idempotent)."""
+    global _probe_task
+    if _probe_task is None or _probe_task.done():
+        _probe_task = asyncio.create_task(_probe_loop())
+
+
+async def stop_probes():
+    """Cancel the background probe loop."""
+    global _probe_task
+    if _probe_task is not None:
+        _probe_task.cancel()
+        try:
+            await _probe_task
+        except asyncio.CancelledError:
+            pass
+        _probe_task = None
+
+
+# =============================================================================
+# Saturation
+# =============================================================================
+
+def saturation() -> dict:
+    """In-flight agent runs vs the per-worker admission limit."""
+    return admission.controller.stats()
+
+
+# =============================================================================
+# Readiness Report
+# =============================================================================
+
+def readiness() -> tuple:
+    """Return (ready, report) from cached probe results only."""
+    now = time.time()
+    checks = {}
+    ready = True
+
+    for name, (_, required) in _probes.items():
+        result = _results.get(name)
+        if result is None:
+            check = {"status": "pending"}
+        elif now - result["checked_at"] > READINESS_STALE_AFTER:
+            check = {**result, "status": "stale"}
+        else:
+            check = dict(result)
+        check["required"] = required
+        checks[name] = check
+
+        if required and check["status"] not in ("ok", "disabled"):
+            ready = False
+
+    sat = saturation()
+    if READINESS_FAIL_WHEN_SATURATED and sat["saturated"]:
+        ready = False
+
+    return ready, {
+        "status": "ready" if ready else "not_ready",
+        "checks": checks,
+        "saturation": sat,
+    }
+
+
+# =============================================================================
+# Built-in Probes
+# =============================================================================
+
+def make_llm_probe(model_name: str, api_key: Optional[str]) -> Callable[[], Optional[str]]:
+    """Probe the Gemini model metadata endpoint (no tokens are spent)."""
+    def probe():
+        if not api_key:
+            raise RuntimeError("GOOGLE_API_KEY not set")
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}"
+        req = urllib.request.Request(url, headers={"x-goog-api-key": api_key})
+        with urllib.request.urlopen(req, timeout=READINESS_PROBE_TIMEOUT) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}")
+        return None
+    return probe
+
+
+def make_db_probe() -> Callable[[], Optional[str]]:
+    """Probe the Neon pool with SELECT 1."""
+    from . import db
+
+    def probe():
+        if not db.get_database_url():
+            return "disabled"
+        if not db.ping():
+            raise RuntimeError("unexpected SELECT 1 result")
+        return None
+    return probe
+
+
+def make_zep_probe(client) -> Callable[[], Optional[str]]:
+    """Probe Zep with the cheapest authenticated call available."""
+    def probe():
+        if client is None:
+            return "disabled"
+        client.user.list_ordered(page_number=1, page_size=1)
+        return None
+    return probe
@@ -0,0 +1,76 @@
+"""
+Verified caller identity for the MIAM.quest agent.
+
+The agent never sees Neon Auth sessions. The Next.js server does, and
+vouches for the signed-in user by signing their id with the secret it
+shares with the agent (AGENT_AUTH_SECRET):
+
+    <user_id>.<expires_unix>.<hex HMAC-SHA256(secret, "<user_id>.<expires_unix>")>
+
+The token arrives as "Authorization: Bearer <token>" on AG-UI runs and
+exports, and as the third "|" field of Hume's custom_session_id on CLM
+turns. Anything else a client sends about who it is (state.user, the
+session id's user field) is not an identity.
+
+bind() makes the verified user id current for the request; tools read
+it with current() instead of trusting a model-supplied argument.
+"""
+
+import os
+import sys
+import hmac
+import time
+import hashlib
+from contextvars import ContextVar
+from typing import Optional
+
+
+AGENT_AUTH_SECRET = os.environ.get("AGENT_AUTH_SECRET", "")
+AGENT_TOKEN_TTL_SECONDS = int(os.environ.get("AGENT_TOKEN_TTL_SECONDS", "3600"))
+
+if not AGENT_AUTH_SECRET:
+    print("[IDENTITY] AGENT_AUTH_SECRET not set: no caller can be verified", file=sys.stderr)
+
+_user: ContextVar[Optional[str]] = ContextVar("miam_verified_user", default=None)
+
+
+def _signature(payload: str) -> str:
+    return hmac.new(AGENT_AUTH_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+
+def sign(user_id: str, ttl: int = AGENT_TOKEN_TTL_SECONDS) -> str:
+    """Token vouching for user_id for ttl seconds (what the Next.js server mints)."""
+    payload = f"{user_id}.{int(time.time()) + ttl}"
+    return f"{payload}.{_signature(payload)}"
+
+
+def verify(token: Optional[str]) -> Optional[str]:
+    """The user id a token vouches for, or None if it is missing, forged or expired."""
+    if not token or not AGENT_AUTH_SECRET:
+        return None
+    payload, _, signature = token.rpartition(".")
+    user_id, _, expires = payload.rpartition(".")
+    if not user_id or not hmac.compare_digest(signature, _signature(payload)):
+        return None
+    try:
+        if int(expires) < time.time():
+            return None
+    except ValueError:
+        return None
+    return user_id
+
+
+def from_request(request) -> Optional[str]:
+    """Verified user id from a request's bearer token."""
+    scheme, _, token = (request.headers.get("authorization") or "").partition(" ")
+    return verify(token.strip()) if scheme.lower() == "bearer" else None
+
+
+def bind(user_id: Optional[str]):
+    """Make user_id (already verified) the caller for the current context."""
+    _user.set(user_id or None)
+
+
+def current() -> Optional[str]:
+    """The verified caller in this context, or None."""
+    return _user.get()
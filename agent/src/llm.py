@@ -0,0 +1,324 @@
+"""
+Model invocation policy for the MIAM.quest agent.
+
+Every Gemini call made by the agent graph goes through
+ModelPolicyMiddleware, which adds:
+- a per-call timeout (bounded by the request deadline)
+- jittered exponential retries on retryable errors (429 / 5xx / timeouts)
+- optional hedging: a second request after the model's observed p95
+- fallback to a faster model tier once the primary is exhausted
+
+Per-model latency and error counts are exported via metrics.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from . import metrics
+from . import deadline
+
+
+GOOGLE_MODEL = os.environ.get("GOOGLE_MODEL", "gemini-2.0-flash")
+GOOGLE_FALLBACK_MODEL = os.environ.get("GOOGLE_FALLBACK_MODEL", "gemini-2.0-flash-lite")
+
+LLM_CALL_TIMEOUT_SECONDS = float(os.environ.get("LLM_CALL_TIMEOUT_SECONDS", "12"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.25"))
+LLM_RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", "2"))
+
+# Hedging: fire a second request if the first hasn't returned after the
+# model's recent p95 (or LLM_HEDGE_AFTER_SECONDS if set)
+LLM_HEDGE_ENABLED = os.environ.get("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_AFTER_SECONDS = os.environ.get("LLM_HEDGE_AFTER_SECONDS")
+LLM_HEDGE_MIN_SAMPLES = 20
+
+# Threads for sync-path model calls (so they can be timed out)
+LLM_SYNC_WORKERS = int(os.environ.get("LLM_SYNC_WORKERS", "8"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_NAMES = (
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "ServerError", "TooManyRequests",
+    "ConnectError", "ReadTimeout", "RemoteProtocolError",
+)
+
+CALL_SECONDS = metrics.histogram(
+    "miam_llm_call_seconds",
+    "Latency of individual model calls",
+    ["model", "outcome"],
+)
+CALL_ERRORS = metrics.counter(
+    "miam_llm_errors_total",
+    "Model call failures by model and kind",
+    ["model", "kind"],
+)
+FALLBACKS = metrics.counter(
+    "miam_llm_fallbacks_total",
+    "Model calls served by the fallback model",
+    ["from_model", "to_model"],
+)
+HEDGES = metrics.counter(
+    "miam_llm_hedged_total",
+    "Hedged model requests and which attempt won",
+    ["model", "winner"],
+)
+
+
+# =============================================================================
+# Model Factory
+# =============================================================================
+
+_models = {}
+
+
+def make_chat_model(model_name: str = GOOGLE_MODEL, temperature: float = 0.7):
+    """Cached ChatGoogleGenerativeAI; retries are owned by the policy, not the SDK."""
+    key = (model_name, temperature)
+    if key not in _models:
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            raise RuntimeError("GOOGLE_API_KEY not set")
+        _models[key] = ChatGoogleGenerativeAI(
+            model=model_name,
+            temperature=temperature,
+            google_api_key=api_key,
+            timeout=LLM_CALL_TIMEOUT_SECONDS,
+            max_retries=0,
+        )
+    return _models[key]
+
+
+def model_name_of(model) -> str:
+    name = getattr(model, "model", None) or getattr(model, "model_name", None) or type(model).__name__
+    return str(name).removeprefix("models/")
+
+
+# =============================================================================
+# Error Classification
+# =============================================================================
+
+def is_retryable(exc: BaseException) -> bool:
+    """Timeouts, rate limits, 5xx and connection errors are retryable."""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if callable(value):
+            continue
+        try:
+            if int(value) in RETRYABLE_STATUS:
+                return True
+        except (TypeError, ValueError):
+            pass
+    return any(name in type(exc).__name__ for name in RETRYABLE_NAMES)
+
+
+def _error_kind(exc: BaseException) -> str:
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return "timeout"
+    return "retryable" if is_retryable(exc) else "fatal"
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def hedge_delay(model: str) -> Optional[float]:
+    """Seconds to wait before hedging a call to model, or None to not hedge."""
+    if not LLM_HEDGE_ENABLED:
+        return None
+    if LLM_HEDGE_AFTER_SECONDS:
+        return float(LLM_HEDGE_AFTER_SECONDS)
+    if CALL_SECONDS.count(model=model, outcome="ok") < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return CALL_SECONDS.quantiles((0.95,), model=model, outcome="ok")["p95"]
+
+
+# =============================================================================
+# Policy Middleware
+# =============================================================================
+
+_sync_pool: Optional[ThreadPoolExecutor] = None
+_sync_pool_lock = threading.Lock()
+
+
+def _sync_calls() -> ThreadPoolExecutor:
+    global _sync_pool
+    if _sync_pool is None:
+        with _sync_pool_lock:
+            if _sync_pool is None:
+                _sync_pool = ThreadPoolExecutor(max_workers=LLM_SYNC_WORKERS, thread_name_prefix="llm-sync")
+    return _sync_pool
+
+
+class ModelPolicyMiddleware(AgentMiddleware):
+    """Timeout, retry, hedging and fallback around every model call."""
+
+    def __init__(
+        self,
+        fallback_model=None,
+        timeout: float = LLM_CALL_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+    ):
+        super().__init__()
+        self.fallback_model = fallback_model
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def _call_timeout(self) -> float:
+        left = deadline.remaining()
+        if left is None:
+            return self.timeout
+        return max(0.0, min(self.timeout, left))
+
+    async def _timed_call(self, request: ModelRequest, handler) -> ModelResponse:
+        model = model_name_of(request.model)
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(handler(request), self._call_timeout())
+        except asyncio.CancelledError:
+            CALL_SECONDS.observe(time.monotonic() - started, model=model, outcome="cancelled")
+            raise
+        except Exception as e:
+            CALL_SECONDS.observe(time.monotonic() - started, model=model, outcome="error")
+            CALL_ERRORS.inc(model=model, kind=_error_kind(e))
+            raise
+        CALL_SECONDS.observe(time.monotonic() - started, model=model, outcome="ok")
+        return response
+
+    async def _hedged_call(self, request: ModelRequest, handler) -> ModelResponse:
+        model = model_name_of(request.model)
+        delay = hedge_delay(model)
+        if delay is None:
+            return await self._timed_call(request, handler)
+
+        primary = asyncio.ensure_future(self._timed_call(request, handler))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge_request = request
+        if self.fallback_model is not None:
+            hedge_request = request.override(model=self.fallback_model)
+        hedge = asyncio.ensure_future(self._timed_call(hedge_request, handler))
+
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        HEDGES.inc(model=model, winner="primary" if task is primary else "hedge")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (primary, hedge):
+                if not task.done():
+                    task.cancel()
+
+    async def _with_retries(self, request: ModelRequest, handler) -> ModelResponse:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._hedged_call(request, handler)
+            except Exception as e:
+                out_of_time = deadline.expired()
+                if not is_retryable(e) or attempt == self.max_retries or out_of_time:
+                    raise
+                delay = _backoff(attempt)
+                print(
+                    f"[LLM] {model_name_of(request.model)} attempt {attempt + 1} failed "
+                    f"({type(e).__name__}), retrying in {delay:.2f}s",
+                    file=sys.stderr,
+                )
+                await asyncio.sleep(delay)
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelResponse:
+        try:
+            return await self._with_retries(request, handler)
+        except Exception as e:
+            if self.fallback_model is None or deadline.expired():
+                raise
+            primary = model_name_of(request.model)
+            fallback = model_name_of(self.fallback_model)
+            if primary == fallback:
+                raise
+            print(f"[LLM] {primary} exhausted ({type(e).__name__}), falling back to {fallback}", file=sys.stderr)
+            FALLBACKS.inc(from_model=primary, to_model=fallback)
+            return await self._timed_call(request.override(model=self.fallback_model), handler)
+
+    def _timed_call_sync(self, request: ModelRequest, handler) -> ModelResponse:
+        """
+        Sync counterpart of _timed_call.
+
+        The call runs on a helper thread (with this context) so it can be
+        given up on at the timeout; a blocking call cannot be cancelled,
+        so the thread finishes on its own, bounded by the SDK timeout.
+        """
+        model = model_name_of(request.model)
+        started = time.monotonic()
+        future = _sync_calls().submit(contextvars.copy_context().run, handler, request)
+        try:
+            response = future.result(timeout=self._call_timeout())
+        except Exception as e:
+            future.cancel()
+            CALL_SECONDS.observe(time.monotonic() - started, model=model, outcome="error")
+            CALL_ERRORS.inc(model=model, kind=_error_kind(e))
+            raise
+        CALL_SECONDS.observe(time.monotonic() - started, model=model, outcome="ok")
+        return response
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelResponse:
+        """Sync path: the async policy's timeout, retries and fallback (no hedging)."""
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return self._timed_call_sync(request, handler)
+                except Exception as e:
+                    if not is_retryable(e) or attempt == self.max_retries or deadline.expired():
+                        raise
+                    delay = _backoff(attempt)
+                    print(
+                        f"[LLM] {model_name_of(request.model)} attempt {attempt + 1} failed "
+                        f"({type(e).__name__}), retrying in {delay:.2f}s",
+                        file=sys.stderr,
+                    )
+                    time.sleep(delay)
+        except Exception as e:
+            if self.fallback_model is None or deadline.expired():
+                raise
+            primary = model_name_of(request.model)
+            fallback = model_name_of(self.fallback_model)
+            if primary == fallback:
+                raise
+            print(f"[LLM] {primary} exhausted ({type(e).__name__}), falling back to {fallback}", file=sys.stderr)
+            FALLBACKS.inc(from_model=primary, to_model=fallback)
+            return self._timed_call_sync(request.override(model=self.fallback_model), handler)
+
+
+def build_model_policy() -> ModelPolicyMiddleware:
+    """Policy middleware with the configured fallback tier (if any)."""
+    fallback = None
+    if GOOGLE_FALLBACK_MODEL and GOOGLE_FALLBACK_MODEL != GOOGLE_MODEL:
+        fallback = make_chat_model(GOOGLE_FALLBACK_MODEL)
+    return ModelPolicyMiddleware(fallback_model=fallback)
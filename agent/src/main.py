@@ -4,11 +4,14 @@ MIAM.quest Agent - FastAPI Entrypoint
 Exposes:
 - AG-UI endpoint for CopilotKit integration (/)
 - CLM endpoint for Hume EVI voice (/chat/completions)
+- Liveness (/healthz) and readiness (/readyz) probes
+- Prometheus metrics (/metrics)
 """
 
 import os
 import sys
 import json
+import time
 import asyncio
 from typing import Optional
 from dotenv import load_dotenv
@@ -17,13 +20,33 @@ load_dotenv()
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import StreamingResponse
+from starlette.responses import Response, StreamingResponse, JSONResponse, PlainTextResponse
 import uvicorn
 
 from ag_ui_langgraph import add_langgraph_fastapi_endpoint
-from copilotkit import LangGraphAGUIAgent
+from langchain_core.messages import AIMessage, HumanMessage
 
 from .agent import build_agent
+from .llm import GOOGLE_MODEL, GOOGLE_FALLBACK_MODEL
+from . import db
+from . import health
+from . import metrics
+from . import deadline
+from . import tracing
+from . import request_log
+from . import usage
+from . import sse
+from . import speculative
+from . import greetings
+from . import sessions
+from . import export
+from . import safety
+from . import identity
+from . import conversations
+from .executor import executor as tool_executor
+from .agui import DeltaStateAGUIAgent
+from .sse import stream_sse_response
+from .admission import controller as admission, AdmissionRejected
 
 # Zep for CLM memory
 from zep_cloud.client import Zep
@@ -64,18 +87,26 @@ async def get_or_create_zep_user(user_id: str, email: str = None, name: str = No
         return None
 
     try:
-        user = zep_client.user.get(user_id)
+        with tracing.span("zep_ensure"):
+            user = await asyncio.to_thread(
+                zep_client.user.get, user_id, request_options=deadline.request_options()
+            )
         return user
     except NotFoundError:
         first_name = name.split()[0] if name else None
         last_name = " ".join(name.split()[1:]) if name and len(name.split()) > 1 else None
-        zep_client.user.add(
-            user_id=user_id,
-            email=email,
-            first_name=first_name,
-            last_name=last_name
-        )
-        return zep_client.user.get(user_id)
+        with tracing.span("zep_ensure", created=True):
+            await asyncio.to_thread(
+                zep_client.user.add,
+                user_id=user_id,
+                email=email,
+                first_name=first_name,
+                last_name=last_name,
+                request_options=deadline.request_options(),
+            )
+            return await asyncio.to_thread(
+                zep_client.user.get, user_id, request_options=deadline.request_options()
+            )
     except Exception as e:
         print(f"[MAIN] Zep user error: {e}", file=sys.stderr)
         return None
@@ -87,7 +118,10 @@ async def get_user_context(user_id: str) -> str:
         return ""
 
     try:
-        context = zep_client.user.get_context(user_id, min_score=0.5)
+        with tracing.span("zep_context"):
+            context = await asyncio.to_thread(
+                zep_client.user.get_context, user_id, min_score=0.5, request_options=deadline.request_options()
+            )
         if context and context.facts:
             facts = [f.fact for f in context.facts[:5]]
             return "Known about this user: " + "; ".join(facts)
@@ -103,11 +137,13 @@ async def add_conversation_to_zep(user_id: str, user_msg: str, assistant_msg: st
         return
 
     try:
-        zep_client.graph.add(
-            user_id=user_id,
-            type="message",
-            data=f"User shared: {user_msg}\nMiam responded: {assistant_msg}"
-        )
+        with tracing.span("zep_write"):
+            await asyncio.to_thread(
+                zep_client.graph.add,
+                user_id=user_id,
+                type="message",
+                data=f"User shared: {user_msg}\nMiam responded: {assistant_msg}",
+            )
         print(f"[MAIN] Zep: Stored conversation for user {user_id[:8]}...", file=sys.stderr)
     except Exception as e:
         print(f"[MAIN] Zep add error: {e}", file=sys.stderr)
@@ -122,7 +158,7 @@ try:
 
     add_langgraph_fastapi_endpoint(
         app=app,
-        agent=LangGraphAGUIAgent(
+        agent=DeltaStateAGUIAgent(
             name="miam_agent",
             description="AI assistant for MIAM preparation",
             graph=agent_graph,
@@ -137,6 +173,109 @@ except Exception as e:
     raise
 
 
+# =============================================================================
+# Admission Control for AG-UI Runs
+# =============================================================================
+
+@app.middleware("http")
+async def agui_admission(request: Request, call_next):
+    """Hold an admission slot (and a trace) for the lifetime of each AG-UI run stream."""
+    if request.method != "POST" or request.url.path != "/":
+        return await call_next(request)
+
+    with tracing.trace("agui", request.headers.get("x-request-id")) as trace_id:
+        key = request.client.host if request.client else "anonymous"
+        user_text = ""
+        with tracing.span("request_parse"):
+            try:
+                body = json.loads(await request.body() or b"{}")
+                user = (body.get("state") or {}).get("user") or {}
+                key = user.get("id") or body.get("threadId") or key
+                user_text = next(
+                    (m.get("content") for m in reversed(body.get("messages") or []) if m.get("role") == "user"), "",
+                )
+            except (ValueError, AttributeError):
+                pass
+        # Screened alongside the run; the run task copies this context
+        if isinstance(user_text, str):
+            safety.start(user_text)
+        # Tools act for the verified caller only, never for state.user
+        identity.bind(identity.from_request(request))
+
+        try:
+            with tracing.span("admission"):
+                ticket = await admission.acquire(key, endpoint="agui")
+        except AdmissionRejected as e:
+            return JSONResponse(
+                {"error": "busy", "reason": e.reason, "message": HOLD_MESSAGE},
+                status_code=503,
+                headers={"Retry-After": "2"},
+            )
+
+        try:
+            # The run task copies this context, so tools see the AG-UI budget
+            budget = deadline.budget_from_request(request, default=deadline.AGUI_REQUEST_BUDGET_SECONDS)
+            with deadline.scope(time.monotonic() + budget):
+                response = await call_next(request)
+        except BaseException:
+            admission.release(ticket)
+            raise
+
+    body_iterator = response.body_iterator
+
+    async def release_when_done():
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            admission.release(ticket)
+
+    response.body_iterator = tracing.traced_stream(release_when_done(), "agui", trace_id, "event_stream")
+    response.headers["x-trace-id"] = trace_id
+    return response
+
+
+# =============================================================================
+# Readiness Probes
+# =============================================================================
+
+health.register_probe(
+    "llm",
+    health.make_llm_probe(GOOGLE_MODEL, os.environ.get("GOOGLE_API_KEY")),
+)
+health.register_probe("database", health.make_db_probe())
+health.register_probe("memory", health.make_zep_probe(zep_client))
+
+# A call's conversation recording ends with its session
+sessions.registry.add_expiry_hook(conversations.finish_session)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Warm the probe cache so /readyz has results before first traffic."""
+    health.start_probes()
+    usage.start_flusher()
+    conversations.start_flusher()
+    sessions.start_sweeper()
+    greetings.prerender({
+        "greeting": greetings.GREETING_ANON,
+        "hold": HOLD_MESSAGE,
+        "timeout": TIMEOUT_MESSAGE,
+        "error": ERROR_MESSAGE,
+    })
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await health.stop_probes()
+    await usage.stop_flusher()
+    await sessions.stop_sweeper()
+    await conversations.stop_flusher()
+    export.shutdown()
+    tool_executor.shutdown()
+    db.close_pool()
+
+
 # =============================================================================
 # Health & Debug Endpoints
 # =============================================================================
@@ -152,22 +291,104 @@ async def health_check():
     }
 
 
-_last_clm_request = {}
+@app.get("/readyz")
+async def readiness_check():
+    """Readiness from cached dependency probes plus agent-run saturation."""
+    ready, report = health.readiness()
+    return JSONResponse(report, status_code=200 if ready else 503)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/latency")
+async def debug_latency():
+    """Per-stage p50/p95/p99 latency (seconds) for CLM and AG-UI requests."""
+    return {"stages": tracing.stage_quantiles()}
+
+
+@app.get("/usage/heaviest")
+async def heaviest_sessions(limit: int = 20, by: str = "thread", source: str = "db"):
+    """Sessions (or users) with the highest token usage."""
+    limit = max(1, min(limit, 200))
+    by = "user" if by == "user" else "thread"
+    if source == "db" and db.get_database_url():
+        try:
+            rows = await asyncio.to_thread(usage.heaviest_from_db, limit, by)
+            return {"source": "db", "by": by, "rows": jsonable(rows)}
+        except Exception as e:
+            print(f"[MAIN] Usage query error: {e}", file=sys.stderr)
+    return {"source": "memory", "by": by, "rows": usage.ledger.heaviest(limit, by)}
+
+
+def jsonable(rows: list) -> list:
+    """Stringify datetimes from DB rows."""
+    return [{k: (v.isoformat() if hasattr(v, "isoformat") else v) for k, v in row.items()} for row in rows]
 
 
 @app.get("/debug")
-async def debug_info():
-    """Debug information."""
+async def debug_info(
+    limit: int = 20,
+    outcome: Optional[str] = None,
+    path: Optional[str] = None,
+    min_ms: Optional[float] = None,
+):
+    """Debug information plus recent request summaries (filterable)."""
     return {
         "agent_name": "miam_agent",
-        "google_model": os.environ.get("GOOGLE_MODEL", "gemini-2.0-flash"),
+        "google_model": GOOGLE_MODEL,
+        "fallback_model": GOOGLE_FALLBACK_MODEL,
         "has_api_key": bool(os.environ.get("GOOGLE_API_KEY")),
         "has_zep": bool(zep_client),
         "has_database": bool(os.environ.get("DATABASE_URL")),
-        "last_clm_request": _last_clm_request,
+        "recent_requests": request_log.ring.query(
+            limit=min(limit, request_log.ring.size), outcome=outcome, path=path, min_ms=min_ms
+        ),
+        "sessions": {"live": len(sessions.registry), "recent": sessions.registry.snapshot(limit)},
+        "tool_pools": tool_executor.stats(),
+        "conversations": conversations.recorder.stats(),
     }
 
 
+# =============================================================================
+# Document Export
+# =============================================================================
+
+@app.get("/cases/{case_id}/documents/{doc_type}/export")
+async def export_document(request: Request, case_id: str, doc_type: str, format: str = "pdf"):
+    """Stream the latest version of a case document (PDF or DOCX) to a party to the case."""
+    if not db.get_database_url():
+        return JSONResponse({"error": "Database not configured"}, status_code=503)
+    # Identity from the bearer token the Next.js server signs (src.identity)
+    user_id = identity.from_request(request)
+    if not user_id:
+        return JSONResponse({"error": "Sign in required"}, status_code=401)
+    try:
+        result = await export.export(case_id, doc_type, format, user_id)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except LookupError as e:
+        return JSONResponse({"error": str(e)}, status_code=404)
+    except Exception as e:
+        print(f"[MAIN] Export error: {e}", file=sys.stderr)
+        return JSONResponse({"error": "Export failed"}, status_code=503)
+
+    handle = result.handle
+    return StreamingResponse(
+        export.stream(handle),
+        media_type=result.media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{result.filename}"',
+            "Content-Length": str(os.fstat(handle.fileno()).st_size),
+            "x-document-version": str(result.version),
+            "x-export-cache": result.outcome,
+        },
+    )
+
+
 # =============================================================================
 # CLM Endpoint for Hume Voice
 # =============================================================================
@@ -198,53 +419,56 @@ def extract_session_id(request: Request, body: dict) -> Optional[str]:
 def parse_session_id(session_id: Optional[str]) -> dict:
     """Parse session ID to extract user info."""
     if not session_id:
-        return {"user_name": "", "user_id": ""}
+        return {"user_name": "", "user_id": "", "token": ""}
 
     if session_id.startswith("miam_anon_"):
-        return {"user_name": "", "user_id": ""}
+        return {"user_name": "", "user_id": "", "token": ""}
 
-    # Format: miam_username|user_id
+    # Format: miam_username|user_id[|identity token]
     if session_id.startswith("miam_"):
         session_id = session_id[5:]  # Remove "miam_" prefix
 
     parts = session_id.split("|")
     user_name = parts[0] if len(parts) > 0 else ""
     user_id = parts[1] if len(parts) > 1 else ""
+    token = parts[2] if len(parts) > 2 else ""
+
+    return {"user_name": user_name, "user_id": user_id, "token": token}
+
+
+HOLD_MESSAGE = "I'm just gathering my thoughts. Please hold on a moment."
+TIMEOUT_MESSAGE = "I'm sorry, that's taking me longer than it should. Could you say that again?"
+ERROR_MESSAGE = "I'm sorry, I encountered an issue. Can you please try again?"
 
-    return {"user_name": user_name, "user_id": user_id}
-
-
-async def stream_sse_response(content: str, msg_id: str):
-    """Stream response in SSE format for OpenAI compatibility."""
-    words = content.split(' ')
-    for i, word in enumerate(words):
-        chunk = {
-            "id": msg_id,
-            "object": "chat.completion.chunk",
-            "choices": [{
-                "index": 0,
-                "delta": {"content": word + (' ' if i < len(words) - 1 else '')},
-                "finish_reason": None
-            }]
-        }
-        yield f"data: {json.dumps(chunk)}\n\n"
-        await asyncio.sleep(0.01)
 
-    yield f"data: {json.dumps({'id': msg_id, 'choices': [{'delta': {}, 'finish_reason': 'stop'}]})}\n\n"
-    yield "data: [DONE]\n\n"
+def clm_context_message(user_name: str, zep_context: str) -> str:
+    """Name and memory context prepended to the first user message of a thread."""
+    context_parts = []
+    if user_name:
+        context_parts.append(f"User's name is {user_name}.")
+    if zep_context:
+        context_parts.append(zep_context)
+    return " ".join(context_parts) if context_parts else ""
 
 
-async def run_agent_for_clm(user_message: str, user_name: str, user_id: str, zep_context: str, conversation_history: list = None) -> str:
-    """Run the LangChain agent for CLM requests."""
+def with_context(context_msg: str, user_message: str) -> str:
+    return f"{context_msg}\n\nUser message: {user_message}"
+
+
+def record_clm_turn(session, user_msg: str, response_text: str, positions_before: int = 0):
+    """Buffer the exchange on the call's conversation recording (no DB write here)."""
+    if session is not None and response_text:
+        conversations.recorder.record_turn(
+            session.session_id, session.user_id, "voice", user_msg, response_text,
+            captured=session.positions[positions_before:], safety=session.safety,
+        )
+
+
+async def run_agent_for_clm(user_message: str, user_name: str, user_id: str, zep_context: str, conversation_history: list = None, speculator=None, session=None) -> str:
+    """Run the LangChain agent for CLM requests (streaming into speculator if given)."""
     try:
         # Build context message
-        context_parts = []
-        if user_name:
-            context_parts.append(f"User's name is {user_name}.")
-        if zep_context:
-            context_parts.append(zep_context)
-
-        context_msg = " ".join(context_parts) if context_parts else ""
+        context_msg = clm_context_message(user_name, zep_context)
 
         # Format messages for the agent
         messages = []
@@ -263,7 +487,7 @@ async def run_agent_for_clm(user_message: str, user_name: str, user_id: str, zep
         # Add current user message with context
         current_message = user_message
         if context_msg and not messages:  # Only add context on first message
-            current_message = f"{context_msg}\n\nUser message: {user_message}"
+            current_message = with_context(context_msg, user_message)
 
         messages.append({
             "role": "user",
@@ -271,19 +495,34 @@ async def run_agent_for_clm(user_message: str, user_name: str, user_id: str, zep
         })
 
         # Invoke the agent graph
-        config = {
+        config = session.thread_config if session is not None else {
             "configurable": {
                 "thread_id": user_id or "anonymous",
             }
         }
 
-        result = await agent_graph.ainvoke(
-            {"messages": messages},
-            config=config,
-        )
+        with tracing.span("agent_run"):
+            if speculator is None:
+                result = await agent_graph.ainvoke(
+                    {"messages": messages},
+                    config=config,
+                )
+            else:
+                result = None
+                async for mode, event in agent_graph.astream(
+                    {"messages": messages},
+                    config=config,
+                    stream_mode=["messages", "values"],
+                ):
+                    if mode == "messages":
+                        speculator.feed(*event)
+                    else:
+                        result = event
 
         # Extract response
         if result and "messages" in result:
+            if session is not None:
+                session.record_positions(result["messages"])
             for msg in reversed(result["messages"]):
                 if hasattr(msg, "content") and msg.content:
                     return msg.content
@@ -297,29 +536,128 @@ async def run_agent_for_clm(user_message: str, user_name: str, user_id: str, zep
         return ""
 
 
+async def run_clm_turn(user_msg: str, user_name: str, user_id: str, conversation_history: list, speculator=None, session=None) -> str:
+    """Fetch Zep context then run the agent; cancelled as a unit on deadline/disconnect."""
+    usage.bind_user(user_id)
+    if session is not None and session.zep_ready:
+        zep_context = session.zep_context
+    else:
+        zep_context = ""
+        if user_id and zep_client:
+            try:
+                await get_or_create_zep_user(user_id, None, user_name)
+                zep_context = await get_user_context(user_id)
+                if session is not None:
+                    session.set_context(zep_context)
+            except Exception as e:
+                print(f"[CLM] Zep error: {e}", file=sys.stderr)
+        elif session is not None:
+            session.set_context("")
+
+    return await run_agent_for_clm(
+        user_msg, user_name, user_id, zep_context,
+        conversation_history=conversation_history, speculator=speculator, session=session,
+    )
+
+
+async def warm_session(user_msg: str, user_name: str, user_id: str, greeting: str, session=None):
+    """
+    Do the first turn's slow work while the cached greeting plays.
+
+    Creates the Zep user, prefetches memory context onto the session,
+    seeds the agent thread with the greeting exchange (as if the agent
+    had produced it) and records the exchange in Zep.
+    """
+    if not user_id and session is None:
+        return
+    with tracing.trace("clm_warmup"):
+        zep_context = ""
+        if user_id and zep_client:
+            try:
+                await get_or_create_zep_user(user_id, None, user_name)
+                zep_context = await get_user_context(user_id)
+                if session is not None:
+                    session.set_context(zep_context)
+            except Exception as e:
+                print(f"[CLM] Warm-up Zep error: {e}", file=sys.stderr)
+        elif session is not None:
+            session.set_context("")
+
+        context_msg = clm_context_message(user_name, zep_context)
+        try:
+            with tracing.span("thread_seed"):
+                await agent_graph.aupdate_state(
+                    session.thread_config if session is not None else {"configurable": {"thread_id": user_id}},
+                    {"messages": [
+                        HumanMessage(with_context(context_msg, user_msg) if context_msg else user_msg),
+                        AIMessage(greeting),
+                    ]},
+                    as_node="model",
+                )
+        except Exception as e:
+            print(f"[CLM] Warm-up thread seed error: {e}", file=sys.stderr)
+
+        if user_id and zep_client and user_msg:
+            await add_conversation_to_zep(user_id, user_msg, greeting)
+
+
 @app.post("/chat/completions")
 async def clm_endpoint(request: Request):
     """OpenAI-compatible CLM endpoint for Hume EVI voice."""
-    import time
+    started = time.monotonic()
+    summary = {
+        "timestamp": time.time(),
+        "path": "clm",
+        "body_bytes": int(request.headers.get("content-length") or 0),
+    }
+
+    with tracing.trace("clm", request.headers.get("x-request-id")) as trace_id:
+        summary["trace_id"] = trace_id
+        response = await handle_clm_request(request, summary)
+
+    if isinstance(response, StreamingResponse):
+        response.body_iterator = record_when_sent(
+            tracing.traced_stream(response.body_iterator, "clm", trace_id, "sse_emit"),
+            summary,
+            started,
+        )
+    else:
+        summary["total_ms"] = round((time.monotonic() - started) * 1000, 1)
+        request_log.record_later(summary)
+    response.headers["x-trace-id"] = trace_id
+    return response
 
-    global _last_clm_request
 
+async def record_when_sent(body_iterator, summary: dict, started: float):
+    """Pass the stream through, then log the request summary off the hot path."""
     try:
-        body = await request.json()
-        messages = body.get("messages", [])
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        summary["total_ms"] = round((time.monotonic() - started) * 1000, 1)
+        request_log.record_later(summary)
 
-        _last_clm_request = {
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "body_keys": list(body.keys()),
-            "messages": [{"role": m.get("role"), "content_preview": str(m.get("content", ""))[:200]} for m in messages]
-        }
 
-        session_id = extract_session_id(request, body)
-        parsed = parse_session_id(session_id)
-        user_name = parsed["user_name"]
-        user_id = parsed["user_id"]
+async def handle_clm_request(request: Request, summary: dict):
+    """Handle one CLM turn inside the request trace; fills in summary."""
+    summary["outcome"] = "error"
+    sse_config = sse.config_from_request(request)
+    try:
+        with tracing.span("request_parse"):
+            body = await request.json()
+        messages = body.get("messages", [])
+        summary["message_count"] = len(messages)
+
+        with tracing.span("session_extract"):
+            session_id = extract_session_id(request, body)
+            session = sessions.registry.resolve(session_id, parse_session_id) if session_id else None
+            parsed = parse_session_id(session_id) if session is None else None
+        user_name = session.user_name if session is not None else parsed["user_name"]
+        user_id = session.user_id if session is not None else parsed["user_id"]
 
         print(f"[CLM] Session: name={user_name}, id={user_id[:8] if user_id else 'anon'}", file=sys.stderr)
+        # Tools act for the verified caller only, never for the session id's user field
+        identity.bind(identity.verify((parsed or parse_session_id(session_id)).get("token")))
 
         user_msg = ""
         for msg in reversed(messages):
@@ -331,45 +669,165 @@ async def clm_endpoint(request: Request):
             user_msg = "Hello"
 
         print(f"[CLM] User message: {user_msg[:80]}", file=sys.stderr)
+        summary["user"] = user_id or "anon"
+        summary["preview"] = user_msg
+        # Screened alongside the agent run, which picks the result up when ready
+        safety.start(user_msg, session)
+
+        if greetings.CLM_GREETING_FAST_PATH and greetings.is_session_start(messages):
+            greeting = greetings.greeting_text(user_name)
+            print("[CLM] Session start, answering from greeting cache", file=sys.stderr)
+            greetings.FAST_PATH.inc()
+            summary["outcome"] = "greeting"
+            summary["response_chars"] = len(greeting)
+            record_clm_turn(session, user_msg, greeting)
+            greetings.schedule_warmup(warm_session(user_msg, user_name, user_id, greeting, session))
+            return StreamingResponse(
+                greetings.stream_prerendered(greeting, "greeting", sse_config),
+                media_type="text/event-stream"
+            )
 
-        zep_context = ""
-        if user_id and zep_client:
+        msg_id = f"clm-{hash(user_msg) % 100000}"
+        positions_before = len(session.positions) if session is not None else 0
+        expires_at = time.monotonic() + deadline.budget_from_request(request)
+        with deadline.scope(expires_at):
             try:
-                await get_or_create_zep_user(user_id, None, user_name)
-                zep_context = await get_user_context(user_id)
-            except Exception as e:
-                print(f"[CLM] Zep error: {e}", file=sys.stderr)
-
-        response_text = await run_agent_for_clm(user_msg, user_name, user_id, zep_context, conversation_history=messages)
-
-        if not response_text:
-            if user_name:
-                response_text = f"Hello {user_name}. I'm Miam, your mediation preparation assistant. I'm here to help you prepare for your MIAM meeting. How are you feeling today?"
-            else:
-                response_text = "Hello. I'm Miam, your mediation preparation assistant. I'm here to help you understand the mediation process and prepare for your MIAM meeting. How can I help you today?"
-
-        print(f"[CLM] Response: {response_text[:80]}", file=sys.stderr)
+                if speculative.CLM_SPECULATIVE_EMIT:
+                    # Admitted and run from the body, so a body never sent holds no slot
+                    return StreamingResponse(
+                        stream_speculative_turn(
+                            request, user_id or session_id or "anonymous", expires_at, summary, sse_config, msg_id,
+                            user_msg, user_name, user_id, messages, session=session, positions_before=positions_before,
+                        ),
+                        media_type="text/event-stream",
+                    )
+
+                async with admission.admit(
+                    user_id or session_id or "anonymous",
+                    endpoint="clm",
+                    max_wait=min(admission.max_wait, deadline.remaining()),
+                ):
+                    outcome, response_text = await deadline.run_until_deadline_or_disconnect(
+                        run_clm_turn(user_msg, user_name, user_id, messages, session=session),
+                        request,
+                        endpoint="clm",
+                    )
+            except AdmissionRejected as e:
+                print(f"[CLM] Saturated ({e.reason}), asking caller to hold", file=sys.stderr)
+                summary["outcome"] = f"hold_{e.reason}"
+                return StreamingResponse(
+                    greetings.stream_prerendered(HOLD_MESSAGE, "hold", sse_config),
+                    media_type="text/event-stream",
+                    headers={"Retry-After": "2"},
+                )
+
+        summary["outcome"] = outcome
+        if outcome == "disconnect":
+            print("[CLM] Client disconnected, abandoned agent run", file=sys.stderr)
+            return Response(status_code=499)
+
+        if outcome == "deadline":
+            print("[CLM] Request budget exhausted, abandoned agent run", file=sys.stderr)
+            return StreamingResponse(
+                greetings.stream_prerendered(TIMEOUT_MESSAGE, "timeout", sse_config),
+                media_type="text/event-stream"
+            )
+
+        if response_text:
+            print(f"[CLM] Response: {response_text[:80]}", file=sys.stderr)
+            frames = stream_sse_response(response_text, msg_id, sse_config)
+        else:
+            # The run finished without an answer; the greeting is what the caller hears
+            summary["outcome"] = "fallback_greeting"
+            response_text = greetings.greeting_text(user_name)
+            frames = greetings.stream_prerendered(response_text, "greeting", sse_config)
+
+        summary["response_chars"] = len(response_text)
+        record_clm_turn(session, user_msg, response_text, positions_before)
 
         if user_id and zep_client and user_msg:
             asyncio.create_task(add_conversation_to_zep(user_id, user_msg, response_text))
 
-        msg_id = f"clm-{hash(user_msg) % 100000}"
-        return StreamingResponse(
-            stream_sse_response(response_text, msg_id),
-            media_type="text/event-stream"
-        )
+        return StreamingResponse(frames, media_type="text/event-stream")
 
     except Exception as e:
         print(f"[CLM] ERROR: {e}", file=sys.stderr)
         import traceback
         traceback.print_exc()
-        error_response = "I'm sorry, I encountered an issue. Can you please try again?"
         return StreamingResponse(
-            stream_sse_response(error_response, "error"),
+            greetings.stream_prerendered(ERROR_MESSAGE, "error", sse_config),
             media_type="text/event-stream"
         )
 
 
+async def stream_speculative_turn(request: Request, key: str, expires_at: float, summary: dict, sse_config,
+                                  msg_id: str, user_msg: str, user_name: str, user_id: str, messages: list,
+                                  session=None, positions_before: int = 0):
+    """Admit and run the turn, emitting the answer once its model call has finished, then any rest."""
+    speculator = speculative.AnswerSpeculator()
+    with deadline.scope(expires_at):
+        try:
+            ticket = await admission.acquire(key, endpoint="clm", max_wait=min(admission.max_wait, deadline.remaining()))
+        except AdmissionRejected as e:
+            ticket = None
+            print(f"[CLM] Saturated ({e.reason}), asking caller to hold", file=sys.stderr)
+            summary["outcome"] = f"hold_{e.reason}"
+        else:
+            # The task copies this context, so the run keeps the deadline
+            turn = asyncio.ensure_future(deadline.run_until_deadline_or_disconnect(
+                run_clm_turn(user_msg, user_name, user_id, messages, speculator=speculator, session=session),
+                request,
+                endpoint="clm",
+            ))
+    if ticket is None:
+        async for frame in greetings.stream_prerendered(HOLD_MESSAGE, "hold", sse_config):
+            yield frame
+        return
+
+    template = sse.FrameTemplate(msg_id)
+    try:
+        async for delta in speculator.deltas(turn):
+            for chunk in sse.chunk_text(delta, sse_config):
+                yield template.delta(chunk)
+
+        try:
+            outcome, response_text = turn.result()
+        except Exception as e:
+            print(f"[CLM] ERROR: {e}", file=sys.stderr)
+            outcome, response_text = "error", ""
+        summary["outcome"] = outcome
+
+        if outcome == "disconnect":
+            print("[CLM] Client disconnected, abandoned agent run", file=sys.stderr)
+            return
+        if outcome == "deadline":
+            print("[CLM] Request budget exhausted, abandoned agent run", file=sys.stderr)
+            response_text = "" if speculator.spoken else TIMEOUT_MESSAGE
+        elif outcome == "error":
+            response_text = "" if speculator.spoken else ERROR_MESSAGE
+        elif not response_text and not speculator.spoken:
+            summary["outcome"] = "fallback_greeting"
+            response_text = greetings.greeting_text(user_name)
+
+        remainder = speculator.finish(response_text) if response_text else ""
+        for chunk in sse.chunk_text(remainder, sse_config):
+            yield template.delta(chunk)
+        yield template.stop
+        yield sse.DONE_FRAME
+
+        # What the caller heard is the turn's answer
+        answer = speculator.spoken + remainder
+        summary["response_chars"] = len(answer)
+        if outcome == "ok":
+            record_clm_turn(session, user_msg, answer, positions_before)
+        if outcome == "ok" and user_id and zep_client and user_msg and answer:
+            asyncio.create_task(add_conversation_to_zep(user_id, user_msg, answer))
+    finally:
+        admission.release(ticket)
+        if not turn.done():
+            turn.cancel()
+
+
 # =============================================================================
 # Run Server
 # =============================================================================
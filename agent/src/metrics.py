@@ -0,0 +1,213 @@
+"""
+In-process metrics for the MIAM.quest agent.
+
+Minimal Counter / Gauge / Histogram types rendered in the Prometheus
+text exposition format at /metrics. No client library dependency: the
+agent runs as a single uvicorn worker per Railway service, so a
+process-local registry is all we need.
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+# Latency buckets tuned for voice turns (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Recent samples kept per label set for in-process quantiles
+QUANTILE_WINDOW = 2048
+
+_registry: Dict[str, "_Metric"] = {}
+_registry_lock = threading.Lock()
+
+
+def _label_key(labelnames: Tuple[str, ...], labels: dict) -> Tuple[str, ...]:
+    return tuple(str(labels.get(n, "")) for n in labelnames)
+
+
+def _format_labels(labelnames: Tuple[str, ...], key: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(labelnames, key)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+# =============================================================================
+# Metric Types
+# =============================================================================
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter."""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def render(self):
+        for key, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Point-in-time value, either set explicitly or read from a callback."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def set(self, value: float, **labels):
+        self._values[_label_key(self.labelnames, labels)] = value
+
+    def set_function(self, callback: Callable[[], Dict[Tuple[str, ...], float]]):
+        """Read values at render time; callback returns {label tuple: value}."""
+        self._callback = callback
+
+    def render(self):
+        values = self._callback() if self._callback else self._values
+        for key, value in list(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram that also keeps a window for quantiles."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def _get_series(self, key):
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(
+                    key, [[0] * len(self.buckets), 0.0, 0, deque(maxlen=QUANTILE_WINDOW)]
+                )
+        return series
+
+    def observe(self, value: float, **labels):
+        series = self._get_series(_label_key(self.labelnames, labels))
+        counts = series[0]
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+            series[3].append(value)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return series[2] if series else 0
+
+    def quantiles(self, qs=(0.5, 0.95, 0.99), **labels) -> Dict[str, float]:
+        """Quantiles over the recent sample window for one label set."""
+        series = self._series.get(_label_key(self.labelnames, labels))
+        if not series or not series[3]:
+            return {}
+        samples = sorted(series[3])
+        last = len(samples) - 1
+        return {f"p{int(q * 100)}": samples[min(last, int(q * len(samples)))] for q in qs}
+
+    def all_quantiles(self, qs=(0.5, 0.95, 0.99)) -> Dict[str, dict]:
+        """Quantiles plus count for every label set, keyed by joined labels."""
+        out = {}
+        for key in list(self._series):
+            labels = dict(zip(self.labelnames, key))
+            out[",".join(key) or "_"] = {
+                **{k: round(v, 4) for k, v in self.quantiles(qs, **labels).items()},
+                "count": self._series[key][2],
+            }
+        return out
+
+    def render(self):
+        for key, (counts, total, count, _) in list(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+# =============================================================================
+# Registry
+# =============================================================================
+
+def _register(cls, name, documentation, labelnames, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = cls(name, documentation, labelnames, **kwargs)
+            _registry[name] = metric
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} already registered as {metric.kind}")
+    return metric
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    """Get or create a counter."""
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+    """Get or create a gauge."""
+    return _register(Gauge, name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+    """Get or create a histogram."""
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def get_metric(name: str) -> Optional[_Metric]:
+    return _registry.get(name)
+
+
+def render_prometheus() -> str:
+    """Render every registered metric in Prometheus text format."""
+    lines = []
+    for metric in list(_registry.values()):
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
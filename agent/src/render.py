@@ -0,0 +1,244 @@
+"""
+Streaming document renderers (PDF and DOCX, stdlib only).
+
+Both renderers walk a document's Markdown line by line and write their
+output incrementally to a file object: the PDF writer emits each page as
+soon as it is full and keeps only object offsets for the xref table, and
+the DOCX writer streams paragraphs into a deflated zip member. Neither
+holds the rendered file in memory, and this module imports nothing from
+the agent so process-pool workers start quickly.
+"""
+
+import os
+import re
+import zipfile
+import textwrap
+from typing import Iterator, Tuple
+from xml.sax.saxutils import escape
+
+
+# Paragraph style -> (font size pt, bold, space before pt)
+STYLES = {
+    "title": (18, True, 0),
+    "heading": (14, True, 10),
+    "subheading": (12, True, 6),
+    "bullet": (11, False, 2),
+    "body": (11, False, 4),
+    "note": (9, False, 8),
+}
+
+INLINE_MARKUP = re.compile(r"\*\*|__|`")
+
+
+def paragraphs(content: str) -> Iterator[Tuple[str, str]]:
+    """(style, text) for each non-empty Markdown line."""
+    for raw in content.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith("### "):
+            style, line = "subheading", line[4:]
+        elif line.startswith("## "):
+            style, line = "heading", line[3:]
+        elif line.startswith("# "):
+            style, line = "title", line[2:]
+        elif line[:2] in ("- ", "* "):
+            style, line = "bullet", line[2:]
+        elif len(line) > 2 and line[0] == line[-1] == "_":
+            style, line = "note", line[1:-1]
+        else:
+            style = "body"
+        yield style, INLINE_MARKUP.sub("", line)
+
+
+# =============================================================================
+# PDF
+# =============================================================================
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 56
+LEADING = 1.3
+# Average Helvetica glyph width as a fraction of the font size
+AVG_CHAR_WIDTH = 0.5
+
+CATALOG, PAGES, FONT, FONT_BOLD = 1, 2, 3, 4
+
+
+class PdfWriter:
+    """Writes a text-only PDF one page at a time."""
+
+    def __init__(self, out, title: str):
+        self.out = out
+        self.title = title
+        self.offsets = {}
+        self.position = 0
+        self.next_id = FONT_BOLD + 1
+        self.page_ids = []
+        self.ops = []
+        self.y = 0.0
+
+    def _write(self, data: bytes):
+        self.out.write(data)
+        self.position += len(data)
+
+    def _object(self, obj_id: int, body: bytes):
+        self.offsets[obj_id] = self.position
+        self._write(b"%d 0 obj\n" % obj_id + body + b"\nendobj\n")
+
+    def _allocate(self) -> int:
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def begin(self):
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._object(CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % PAGES)
+        self._object(FONT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        self._object(FONT_BOLD, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def _flush_page(self):
+        if not self.ops:
+            return
+        stream = "\n".join(self.ops).encode("cp1252", "replace")
+        content_id, page_id = self._allocate(), self._allocate()
+        self._object(content_id, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        self._object(page_id, (
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>"
+        ) % (PAGES, PAGE_WIDTH, PAGE_HEIGHT, FONT, FONT_BOLD, content_id))
+        self.page_ids.append(page_id)
+        self.ops = []
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def paragraph(self, style: str, text: str):
+        size, bold, before = STYLES[style]
+        indent = 14 if style == "bullet" else 0
+        width = int((PAGE_WIDTH - 2 * MARGIN - indent) / (size * AVG_CHAR_WIDTH))
+        lines = textwrap.wrap(text, width) or [""]
+        self.y -= before
+        for i, line in enumerate(lines):
+            self.y -= size * LEADING
+            if self.y < MARGIN:
+                self._flush_page()
+                self.y -= size * LEADING
+            if style == "bullet" and i == 0:
+                self.ops.append(f"BT /F1 {size} Tf {MARGIN} {self.y:.1f} Td (\u2022) Tj ET")
+            self.ops.append(
+                f"BT /F{2 if bold else 1} {size} Tf {MARGIN + indent} {self.y:.1f} Td ({pdf_escape(line)}) Tj ET"
+            )
+
+    def end(self):
+        self._flush_page()
+        if not self.page_ids:
+            self.ops.append("")
+            self._flush_page()
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.page_ids)
+        self._object(PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.page_ids)))
+        info_id = self._allocate()
+        self._object(info_id, b"<< /Title (%s) /Producer (MIAM.quest) >>" % pdf_escape(self.title).encode("cp1252", "replace"))
+
+        xref_at = self.position
+        size = self.next_id
+        entries = [b"0000000000 65535 f \n"]
+        entries += [b"%010d 00000 n \n" % self.offsets[i] for i in range(1, size)]
+        self._write(b"xref\n0 %d\n" % size + b"".join(entries))
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            size, CATALOG, info_id, xref_at,
+        ))
+
+
+def pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(out, title: str, content: str):
+    writer = PdfWriter(out, title)
+    writer.begin()
+    for style, text in paragraphs(content):
+        writer.paragraph(style, text)
+    writer.end()
+
+
+# =============================================================================
+# DOCX
+# =============================================================================
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>'
+    '</Types>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" '
+    'Target="docProps/core.xml"/>'
+    '</Relationships>'
+)
+CORE_PROPS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+    'xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:title>{title}</dc:title></cp:coreProperties>'
+)
+DOCUMENT_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+)
+DOCUMENT_TAIL = (
+    '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+    '<w:pgMar w:top="1134" w:right="1134" w:bottom="1134" w:left="1134"/></w:sectPr>'
+    '</w:body></w:document>'
+)
+
+
+def docx_paragraph(style: str, text: str) -> str:
+    size, bold, before = STYLES[style]
+    indent = '<w:ind w:left="360" w:hanging="360"/>' if style == "bullet" else ""
+    prefix = "•\t" if style == "bullet" else ""
+    run = f'<w:sz w:val="{size * 2}"/>' + ("<w:b/>" if bold else "") + ("<w:i/>" if style == "note" else "")
+    return (
+        f'<w:p><w:pPr><w:spacing w:before="{before * 20}"/>{indent}</w:pPr>'
+        f'<w:r><w:rPr>{run}</w:rPr><w:t xml:space="preserve">{escape(prefix + text)}</w:t></w:r></w:p>'
+    )
+
+
+def write_docx(out, title: str, content: str):
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", CONTENT_TYPES)
+        archive.writestr("_rels/.rels", ROOT_RELS)
+        archive.writestr("docProps/core.xml", CORE_PROPS.format(title=escape(title)))
+        with archive.open("word/document.xml", "w") as part:
+            part.write(DOCUMENT_HEAD.encode())
+            for style, text in paragraphs(content):
+                part.write(docx_paragraph(style, text).encode())
+            part.write(DOCUMENT_TAIL.encode())
+
+
+# =============================================================================
+# Worker Entry Point
+# =============================================================================
+
+WRITERS = {"pdf": write_pdf, "docx": write_docx}
+
+
+def render_to_file(fmt: str, title: str, content: str, path: str) -> int:
+    """Render into path (atomically, via a temp file). Returns the file size."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as out:
+            WRITERS[fmt](out, title, content)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return os.path.getsize(path)
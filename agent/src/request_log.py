@@ -0,0 +1,111 @@
+"""
+Fixed-size ring buffer of recent request summaries for /debug.
+
+Writers claim a slot with next() on an itertools.count, which is atomic
+under the GIL, so appends take no lock and never contend. Memory is
+bounded by REQUEST_LOG_SIZE slots of small, truncated records. Records
+are built with loop.call_soon after the response has been sent, keeping
+summary construction and redaction off the voice hot path.
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import itertools
+from typing import Optional
+
+
+REQUEST_LOG_SIZE = int(os.environ.get("REQUEST_LOG_SIZE", "256"))
+REQUEST_LOG_SAMPLE_RATE = float(os.environ.get("REQUEST_LOG_SAMPLE_RATE", "1.0"))
+PREVIEW_CHARS = 80
+
+_REDACTIONS = [
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "<email>"),
+    (re.compile(r"\b[A-Z]{1,2}\d[A-Z\d]?\s*\d[A-Z]{2}\b", re.IGNORECASE), "<postcode>"),
+    (re.compile(r"(?:\+?\d[\s-]?){9,}"), "<number>"),
+]
+
+
+def redact(text: str, limit: int = PREVIEW_CHARS) -> str:
+    """Truncate and mask emails, postcodes and long numbers."""
+    text = str(text or "")[: limit * 2]
+    for pattern, mask in _REDACTIONS:
+        text = pattern.sub(mask, text)
+    return text[:limit]
+
+
+class RequestSummary:
+    """One recent request; slotted so each ring entry has a fixed footprint."""
+    __slots__ = (
+        "seq", "timestamp", "path", "trace_id", "outcome", "total_ms",
+        "message_count", "body_bytes", "response_chars", "user", "preview",
+    )
+
+    def __init__(self, seq: int, fields: dict):
+        self.seq = seq
+        self.timestamp = fields.get("timestamp", time.time())
+        self.path = fields.get("path", "")
+        self.trace_id = fields.get("trace_id")
+        self.outcome = fields.get("outcome", "unknown")
+        self.total_ms = fields.get("total_ms")
+        self.message_count = fields.get("message_count", 0)
+        self.body_bytes = fields.get("body_bytes", 0)
+        self.response_chars = fields.get("response_chars", 0)
+        self.user = redact(fields.get("user", ""), 12)
+        self.preview = redact(fields.get("preview", ""))
+
+    def to_dict(self) -> dict:
+        out = {name: getattr(self, name) for name in self.__slots__}
+        out["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(self.timestamp))
+        return out
+
+
+class RequestRing:
+    """Lock-free, fixed-size ring of RequestSummary records."""
+
+    def __init__(self, size: int = REQUEST_LOG_SIZE):
+        self.size = size
+        self._slots = [None] * size
+        self._counter = itertools.count()
+
+    def append(self, fields: dict):
+        seq = next(self._counter)
+        self._slots[seq % self.size] = RequestSummary(seq, fields)
+
+    def query(
+        self,
+        limit: int = 20,
+        outcome: Optional[str] = None,
+        path: Optional[str] = None,
+        min_ms: Optional[float] = None,
+    ) -> list:
+        """Newest-first records matching the filters."""
+        records = [r for r in list(self._slots) if r is not None]
+        records.sort(key=lambda r: r.seq, reverse=True)
+        out = []
+        for r in records:
+            if outcome and r.outcome != outcome:
+                continue
+            if path and r.path != path:
+                continue
+            if min_ms is not None and (r.total_ms or 0) < min_ms:
+                continue
+            out.append(r.to_dict())
+            if len(out) >= limit:
+                break
+        return out
+
+
+ring = RequestRing()
+
+
+def record_later(fields: dict):
+    """Sample and append a summary on the next loop iteration."""
+    if REQUEST_LOG_SAMPLE_RATE < 1.0 and random.random() >= REQUEST_LOG_SAMPLE_RATE:
+        return
+    try:
+        asyncio.get_running_loop().call_soon(ring.append, fields)
+    except RuntimeError:
+        ring.append(fields)
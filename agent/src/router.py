@@ -0,0 +1,159 @@
+"""
+Latency-tiered model routing for the MIAM.quest agent.
+
+Classifies each model step and dispatches it to an appropriately sized
+model:
+- safety: messages flagged by the safety detector (src.safety: domestic
+  abuse, child safety, abduction risk) -> careful tier (full model, lower
+  temperature). Always wins.
+- ack: short acknowledgements ("ok", "thank you") -> fast tier
+- tool: steps that only relay deterministic tool output -> fast tier
+- default: everything else -> GOOGLE_MODEL
+
+Each decision is logged and per-tier latency is exported so the tiers
+can be tuned for voice responsiveness.
+"""
+
+import os
+import re
+import sys
+import time
+from typing import Awaitable, Callable, Tuple
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+
+from . import metrics
+from . import safety
+from .llm import GOOGLE_MODEL, GOOGLE_FALLBACK_MODEL, make_chat_model
+
+
+GOOGLE_MODEL_FAST = os.environ.get("GOOGLE_MODEL_FAST", GOOGLE_FALLBACK_MODEL or GOOGLE_MODEL)
+GOOGLE_MODEL_SAFETY = os.environ.get("GOOGLE_MODEL_SAFETY", GOOGLE_MODEL)
+MODEL_ROUTING_ENABLED = os.environ.get("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+
+# Tier -> (model, temperature)
+TIERS = {
+    "safety": (GOOGLE_MODEL_SAFETY, 0.3),
+    "ack": (GOOGLE_MODEL_FAST, 0.7),
+    "tool": (GOOGLE_MODEL_FAST, 0.5),
+    "default": (GOOGLE_MODEL, 0.7),
+}
+
+ACK_MAX_WORDS = 4
+# Yes/no are deliberately absent: they usually answer a real question
+# ("is that a must-have?") and deserve the full model.
+ACK_WORDS = {
+    "ok", "okay", "k", "sure", "fine",
+    "thanks", "thank", "you", "cheers", "great", "good", "right", "alright",
+    "cool", "got", "it", "understood", "i", "see", "mhm", "hmm", "uh", "huh",
+    "perfect", "lovely", "brilliant", "that's", "thats", "helpful", "bye",
+}
+
+# Tools whose output is static or deterministic: relaying it needs no reasoning
+DETERMINISTIC_TOOLS = {
+    "get_miam_info", "get_position_summary", "check_exemption_eligibility",
+    "generate_preparation_summary", "capture_position",
+}
+
+_WORD = re.compile(r"[a-z']+")
+
+ROUTED = metrics.counter(
+    "miam_router_decisions_total",
+    "Model routing decisions by tier",
+    ["tier", "model"],
+)
+TIER_SECONDS = metrics.histogram(
+    "miam_router_tier_seconds",
+    "Model step latency by routing tier",
+    ["tier"],
+)
+
+
+# =============================================================================
+# Classification
+# =============================================================================
+
+def _text_of(message) -> str:
+    content = getattr(message, "content", "")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+    return ""
+
+
+def is_acknowledgement(text: str) -> bool:
+    words = _WORD.findall(text.lower())
+    return 0 < len(words) <= ACK_MAX_WORDS and all(w in ACK_WORDS for w in words)
+
+
+def classify(messages) -> Tuple[str, str]:
+    """Return (tier, reason) for the next model step."""
+    last_human = next((m for m in reversed(messages) if getattr(m, "type", "") == "human"), None)
+    human_text = _text_of(last_human) if last_human is not None else ""
+
+    flag = safety.flag_for(human_text)
+    if flag is not None:
+        return "safety", f"flagged {','.join(flag['categories'])} ('{flag['matched'][0]}')"
+
+    trailing_tools = []
+    for message in reversed(messages):
+        if getattr(message, "type", "") != "tool":
+            break
+        trailing_tools.append(getattr(message, "name", "") or "")
+    if trailing_tools:
+        if all(name in DETERMINISTIC_TOOLS for name in trailing_tools):
+            return "tool", "relaying " + ",".join(sorted(set(trailing_tools)))
+        return "default", "non-deterministic tool output"
+
+    if messages and messages[-1] is last_human and is_acknowledgement(human_text):
+        return "ack", "short acknowledgement"
+
+    return "default", "general turn"
+
+
+# =============================================================================
+# Router Middleware
+# =============================================================================
+
+class ModelRouterMiddleware(AgentMiddleware):
+    """Swap the request model per step according to its routing tier."""
+
+    def _route(self, request: ModelRequest) -> Tuple[str, ModelRequest]:
+        tier, reason = classify(request.messages)
+        model_name, temperature = TIERS[tier]
+        model = make_chat_model(model_name, temperature)
+        ROUTED.inc(tier=tier, model=model_name)
+        print(f"[ROUTER] tier={tier} model={model_name} ({reason})", file=sys.stderr)
+        if model is request.model:
+            return tier, request
+        return tier, request.override(model=model)
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], Awaitable[ModelResponse]],
+    ) -> ModelResponse:
+        tier, routed = self._route(request)
+        started = time.monotonic()
+        try:
+            return await handler(routed)
+        finally:
+            TIER_SECONDS.observe(time.monotonic() - started, tier=tier)
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest,
+        handler: Callable[[ModelRequest], ModelResponse],
+    ) -> ModelResponse:
+        tier, routed = self._route(request)
+        started = time.monotonic()
+        try:
+            return handler(routed)
+        finally:
+            TIER_SECONDS.observe(time.monotonic() - started, tier=tier)
+
+
+def build_model_router():
+    """Router middleware, or None when MODEL_ROUTING_ENABLED is false."""
+    return ModelRouterMiddleware() if MODEL_ROUTING_ENABLED else None
@@ -0,0 +1,254 @@
+"""
+Safety-signal detection for user messages.
+
+The system prompt asks the model to handle domestic abuse and child
+safety carefully, but noticing them was left to the model on every
+turn. This module screens each user message with a compiled phrase
+index (screening.PhraseIndex over abuse, child-safety and urgency
+phrases, scored the same way as exemption screening).
+
+start() runs the detector in its own task alongside the agent run, so
+the run never waits for it. The task records a flag on the CLM session.
+Inside the graph, flag_for() reuses the task's result once it is done
+and only screens inline when it is not. When a message is flagged:
+
+- the router sends the step to its careful "safety" tier
+- SafetyMiddleware adds the flag to graph state ("safety") and gives the
+  model the matching exemption information (domestic abuse, child
+  protection, urgency) up front, instead of leaving it a
+  check_exemption_eligibility round trip
+"""
+
+import os
+import sys
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain.agents.middleware import AgentMiddleware, AgentState, ExtendedModelResponse, ModelResponse
+from langchain_core.messages import AIMessage, SystemMessage
+from langgraph.types import Command
+from typing_extensions import NotRequired
+
+from . import metrics
+from . import screening
+from .state import MIAM_EXEMPTIONS
+
+
+SAFETY_MIN_CONFIDENCE = float(os.environ.get("SAFETY_MIN_CONFIDENCE", "0.5"))
+SAFETY_EXEMPTION_HINTS = os.environ.get("SAFETY_EXEMPTION_HINTS", "true").lower() == "true"
+
+# Safety category -> the MIAM exemption it points to
+CATEGORY_EXEMPTIONS = {
+    "domestic_abuse": "domestic_abuse",
+    "child_safety": "child_protection",
+    "urgency": "urgency",
+}
+
+# Urgency phrases that are about hardship rather than anyone's safety
+_NOT_SAFETY = {"homeless", "unreasonable hardship", "urgen*", "emergency"}
+
+# category -> [(phrase, weight)], same phrase syntax as screening
+SAFETY_PHRASES: Dict[str, List[Tuple[str, float]]] = {
+    "domestic_abuse": screening.EXEMPTION_PHRASES["domestic_abuse"] + [
+        # Everyday words sit below SAFETY_MIN_CONFIDENCE: they flag only together
+        # with another phrase ("scared" + "police"), not in "scared of court"
+        ("scared", 0.3), ("afraid", 0.3), ("frightened", 0.3), ("terrified", 0.4), ("unsafe", 0.45),
+        ("police", 0.3), ("threat", 0.35), ("threats", 0.35),
+        ("terrified of him", 0.7), ("terrified of her", 0.7), ("frightened of him", 0.6),
+        ("frightened of her", 0.6), ("hitting me", 0.8), ("hurting me", 0.7), ("coercive", 0.8),
+    ],
+    "child_safety": screening.EXEMPTION_PHRASES["child_protection"] + [
+        ("hurt the kids", 0.8), ("hurts the kids", 0.8), ("hurting the kids", 0.8),
+        ("hurt the children", 0.8), ("hurts the children", 0.8), ("hurting the children", 0.8),
+        ("not safe with", 0.7), ("neglect*", 0.7), ("groom*", 0.7),
+    ],
+    "urgency": [
+        (phrase, weight) for phrase, weight in screening.EXEMPTION_PHRASES["urgency"]
+        if phrase not in _NOT_SAFETY
+    ],
+}
+
+_index = screening.PhraseIndex(
+    (phrase, (category, phrase, weight))
+    for category, phrases in SAFETY_PHRASES.items()
+    for phrase, weight in phrases
+)
+
+FLAGS = metrics.counter(
+    "miam_safety_flags_total",
+    "User messages flagged by the safety detector by category",
+    ["category"],
+)
+LOOKUPS = metrics.counter(
+    "miam_safety_lookups_total",
+    "Safety lookups by model steps by source (concurrent result ready, inline)",
+    ["source"],
+)
+
+# (text, task) for the message being screened in this request
+_turn: ContextVar[Optional[tuple]] = ContextVar("miam_safety_turn", default=None)
+
+
+# =============================================================================
+# Detection
+# =============================================================================
+
+def detect(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Safety flag for a message, or None.
+
+    The flag is {"categories", "exemptions", "confidence", "matched"},
+    covering every category at or above SAFETY_MIN_CONFIDENCE.
+    """
+    hits = [
+        hit for hit in screening.score(_index, text)
+        if hit["confidence"] >= SAFETY_MIN_CONFIDENCE
+    ]
+    if not hits:
+        return None
+    return {
+        "categories": [hit["exemption"] for hit in hits],
+        "exemptions": [CATEGORY_EXEMPTIONS[hit["exemption"]] for hit in hits],
+        "confidence": hits[0]["confidence"],
+        "matched": [phrase for hit in hits for phrase in hit["matched"]],
+    }
+
+
+def merge(current: Optional[dict], flag: Optional[dict]) -> Optional[dict]:
+    """Union of two flags; a conversation stays flagged once it has been."""
+    if not current or not flag:
+        return flag or current
+    return {
+        "categories": list(dict.fromkeys(current["categories"] + flag["categories"])),
+        "exemptions": list(dict.fromkeys(current["exemptions"] + flag["exemptions"])),
+        "confidence": max(current["confidence"], flag["confidence"]),
+        "matched": list(dict.fromkeys(current["matched"] + flag["matched"])),
+    }
+
+
+async def _screen(text: str, session=None) -> Optional[dict]:
+    flag = detect(text)
+    if flag is not None:
+        for category in flag["categories"]:
+            FLAGS.inc(category=category)
+        if session is not None:
+            session.safety = merge(session.safety, flag)
+        print(f"[SAFETY] Flagged {','.join(flag['categories'])} ({', '.join(flag['matched'][:3])})", file=sys.stderr)
+    return flag
+
+
+def start(text: str, session=None) -> Optional[asyncio.Task]:
+    """Screen text in its own task; model steps in this context reuse the result."""
+    if not text:
+        return None
+    task = asyncio.get_running_loop().create_task(_screen(text, session))
+    _turn.set((text, task))
+    return task
+
+
+def flag_for(text: str) -> Optional[dict]:
+    """Flag for a message: the concurrent result if it is ready, else screened inline."""
+    turn = _turn.get()
+    # CLM prepends name and memory context to a thread's first message
+    if turn is not None and turn[1].done() and not turn[1].cancelled() and text.endswith(turn[0]):
+        LOOKUPS.inc(source="concurrent")
+        return turn[1].result()
+    LOOKUPS.inc(source="inline")
+    return detect(text)
+
+
+def turn_flag() -> Optional[dict]:
+    """Flag the server screened for this request's message, or None."""
+    turn = _turn.get()
+    if turn is None:
+        return None
+    if turn[1].done() and not turn[1].cancelled():
+        return turn[1].result()
+    return detect(turn[0])
+
+
+# =============================================================================
+# Exemption Hints
+# =============================================================================
+
+def _hint(key: str) -> str:
+    exemption = MIAM_EXEMPTIONS[key]
+    evidence = "; ".join(exemption.get("evidence_required", []))
+    return f"- {exemption['label']}: {exemption['description']}" + (f" Evidence: {evidence}." if evidence else "")
+
+
+HINTS = {key: _hint(key) for key in CATEGORY_EXEMPTIONS.values()}
+
+
+def exemption_note(flag: dict) -> str:
+    """System note pointing the model at the exemptions a flag suggests."""
+    return (
+        "\n\n## SAFETY SIGNAL (this conversation)\n"
+        "The user has mentioned something that may affect their or their children's safety. "
+        "Be supportive, not probing. These MIAM exemptions may apply; you can explain them "
+        "without calling check_exemption_eligibility:\n"
+        + "\n".join(HINTS[key] for key in flag["exemptions"])
+    )
+
+
+# =============================================================================
+# Middleware
+# =============================================================================
+
+class SafetyState(AgentState):
+    safety: NotRequired[Optional[Dict[str, Any]]]
+
+
+def human_text(messages) -> str:
+    """Text of the latest human message."""
+    for message in reversed(messages):
+        if getattr(message, "type", "") == "human":
+            content = message.content
+            if isinstance(content, list):
+                return " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+            return content if isinstance(content, str) else ""
+    return ""
+
+
+def _with_note(system_message: Optional[SystemMessage], note: str) -> SystemMessage:
+    if system_message is None:
+        return SystemMessage(note.lstrip())
+    content = system_message.content
+    if isinstance(content, list):
+        return SystemMessage(content=[*content, {"type": "text", "text": note}])
+    return SystemMessage(content=content + note)
+
+
+class SafetyMiddleware(AgentMiddleware):
+    """Attach safety flags to state and surface exemption info to the model."""
+
+    state_schema = SafetyState
+
+    def _apply(self, request) -> Tuple[Any, Optional[Command]]:
+        flag = flag_for(human_text(request.messages))
+        if flag is None:
+            return request, None
+        current = (request.state or {}).get("safety")
+        merged = merge(current, flag)
+        if SAFETY_EXEMPTION_HINTS:
+            request = request.override(system_message=_with_note(request.system_message, exemption_note(merged)))
+        return request, None if merged == current else Command(update={"safety": merged})
+
+    @staticmethod
+    def _respond(response, command: Optional[Command]):
+        if command is None:
+            return response
+        if isinstance(response, AIMessage):
+            response = ModelResponse(result=[response])
+        if isinstance(response, ModelResponse):
+            return ExtendedModelResponse(model_response=response, command=command)
+        return response
+
+    async def awrap_model_call(self, request, handler: Callable[..., Awaitable]):
+        request, command = self._apply(request)
+        return self._respond(await handler(request), command)
+
+    def wrap_model_call(self, request, handler):
+        request, command = self._apply(request)
+        return self._respond(handler(request), command)
@@ -0,0 +1,265 @@
+"""
+MIAM exemption screening over free-text circumstances.
+
+Maps what users actually say ("my ex is in prison", "he lives in Spain")
+to MIAM_EXEMPTIONS keys with a confidence score, so the tool can answer
+in one call without the model translating into snake_case first.
+
+All phrases and synonyms are compiled once at import into a single
+Aho-Corasick automaton (PhraseIndex), and screen() finds every phrase in
+one pass over the normalised text. Each phrase carries a weight; weights
+for the same exemption combine as a noisy-OR, and a negation ("not",
+"never", ...) shortly before a phrase discounts it.
+"""
+
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+from .state import MIAM_EXEMPTIONS
+
+
+SCREENING_MIN_CONFIDENCE = 0.5
+NEGATION_WINDOW = 3  # words before a phrase that can negate it
+NEGATION_DISCOUNT = 0.2
+
+# Normalised words, so "isn't" arrives as "isn" "t"
+NEGATIONS = {
+    "no", "not", "never", "without", "isn", "isnt", "wasn", "wasnt", "hasn", "hasnt",
+    "haven", "havent", "don", "dont", "doesn", "doesnt", "didn", "didnt",
+}
+
+# exemption key -> [(phrase, weight)]. Phrases match on word boundaries;
+# a trailing "*" matches any word starting with the stem.
+EXEMPTION_PHRASES: Dict[str, List[Tuple[str, float]]] = {
+    "domestic_abuse": [
+        ("domestic abuse", 0.95), ("domestic violence", 0.95), ("coercive control", 0.9),
+        ("abus*", 0.75), ("violen*", 0.6), ("assault*", 0.7), ("hit me", 0.8), ("hits me", 0.8),
+        ("beat me", 0.85), ("beats me", 0.85), ("hurt me", 0.7), ("hurts me", 0.7), ("threaten*", 0.6),
+        ("controlling", 0.5), ("stalk*", 0.7), ("harass*", 0.6), ("non molestation", 0.9),
+        ("occupation order", 0.85), ("injunction", 0.6), ("restraining order", 0.85), ("refuge", 0.75),
+        ("marac", 0.9), ("idva", 0.85), ("police caution", 0.6), ("scared of him", 0.6),
+        ("scared of her", 0.6), ("afraid of him", 0.6), ("afraid of her", 0.6),
+        # What was done, in the words people use for it
+        *((f"{verb} me", 0.8) for verb in (
+            "pushed", "pushes", "shoved", "punched", "punches", "kicked", "kicks", "slapped", "slaps",
+            "strangled", "choked", "grabbed", "attacked", "attacks", "attacking", "hurting", "hitting",
+            "beating", "threw", "spat at",
+        )),
+        ("punch*", 0.6), ("strangl*", 0.85), ("smash*", 0.4), ("intimidat*", 0.7), ("bully*", 0.5),
+        ("controls all", 0.6), ("controls my", 0.6), ("controls the money", 0.7), ("checks my phone", 0.7),
+        ("won t let me", 0.55), ("wont let me", 0.55), ("isolat*", 0.5), ("following me", 0.6),
+        ("turning up outside", 0.5), ("turns up outside", 0.5), ("called the police", 0.55),
+        ("call the police", 0.55), ("arrested", 0.5), ("convicted", 0.4), ("from contacting me", 0.75),
+        ("not allowed to contact me", 0.8), ("protective order", 0.8), ("protection order", 0.7),
+    ],
+    "child_protection": [
+        ("child protection", 0.95), ("social services", 0.85), ("social worker", 0.8),
+        ("children s services", 0.85), ("childrens services", 0.85), ("local authority", 0.4),
+        ("section 47", 0.9), ("child protection plan", 0.95), ("safeguarding", 0.7), ("care proceedings", 0.85),
+        ("social care", 0.7), ("child in need", 0.85), ("section 17", 0.7), ("taken into care", 0.9),
+        ("foster care", 0.75), ("emergency protection order", 0.95), ("police protection", 0.85),
+        ("local authority are involved", 0.75), ("local authority is involved", 0.75),
+        ("local authority got involved", 0.75), ("welfare", 0.3), ("at risk", 0.3),
+    ],
+    "urgency": [
+        ("urgen*", 0.8), ("emergency", 0.7), ("abduct*", 0.9), ("kidnap*", 0.85),
+        ("take the children abroad", 0.9), ("take the kids abroad", 0.9), ("taken the children", 0.7),
+        ("taken the kids", 0.7), ("won t bring them back", 0.85), ("wont bring them back", 0.85),
+        ("won t return", 0.7), ("flee the country", 0.9), ("risk of harm", 0.8), ("immediate danger", 0.85),
+        ("in danger", 0.6), ("homeless", 0.6), ("unreasonable hardship", 0.8),
+        # Removal from the country or hiding the children
+        ("passport*", 0.6), ("one way flight*", 0.85), ("booked flights", 0.6), ("keep him there", 0.7),
+        ("keep her there", 0.7), ("keep them there", 0.7), ("not bring them back", 0.85),
+        ("disappeared with", 0.85), ("won t tell me where", 0.8), ("wont tell me where", 0.8),
+        ("don t know where they are", 0.8), ("dont know where they are", 0.8), ("took the children", 0.6),
+        ("took the kids", 0.6), ("taken the baby", 0.7), ("took the baby", 0.7),
+        # Losing the home
+        ("evict*", 0.75), ("out on the street", 0.8), ("lose our home", 0.7), ("lose my home", 0.7),
+        ("repossess*", 0.7),
+        # Harm or delay that cannot wait for mediation
+        ("could be hurt", 0.75), ("could be harmed", 0.75), ("will be hurt", 0.75), ("be at risk", 0.6),
+        ("at risk", 0.5), ("unsafe", 0.5), ("straight away", 0.5), ("can t wait", 0.6), ("cant wait", 0.6),
+        ("immediately", 0.5), ("right now", 0.3),
+    ],
+    "previous_miam": [
+        ("previous miam", 0.95), ("already had a miam", 0.95), ("already attended a miam", 0.95),
+        ("already did a miam", 0.95), ("had a miam", 0.8), ("attended a miam", 0.8), ("did a miam", 0.75), ("went to a miam", 0.8),
+        ("been to a miam", 0.8),
+        ("last miam", 0.8), ("miam certificate", 0.5), ("already been to mediation", 0.7),
+        ("mediation last month", 0.7), ("mediation a few months ago", 0.7),
+        ("mediation information meeting", 0.9), ("mediation information and assessment meeting", 0.95),
+        ("mediation assessment meeting", 0.9), ("mediation assessment", 0.7), ("went through a miam", 0.85),
+        ("done a miam", 0.8), ("done the miam", 0.8), ("miam already", 0.8), ("a miam", 0.45),
+        ("attended a mediation", 0.8), ("attended mediation", 0.75), ("been through mediation", 0.6),
+        ("been to mediation", 0.7), ("already", 0.3),
+    ],
+    "other_party_overseas": [
+        ("other party overseas", 0.95), ("overseas", 0.75), ("abroad", 0.45), ("lives abroad", 0.85),
+        ("living abroad", 0.85), ("moved abroad", 0.85), ("another country", 0.8),
+        ("outside the uk", 0.85), ("outside england", 0.85), ("emigrated", 0.8), ("moved away to", 0.4),
+        ("lives in", 0.1), ("living in", 0.1), ("relocated", 0.5), ("went back to", 0.3),
+        ("moved back to", 0.4), ("not in the uk", 0.85), ("not in this country", 0.85),
+        ("never in the country", 0.8), ("left the country", 0.85), ("left the uk", 0.85),
+        ("works overseas", 0.85), ("deported", 0.8),
+        *((country, 0.7) for country in (
+            "spain", "france", "germany", "italy", "portugal", "poland", "romania", "greece", "cyprus",
+            "netherlands", "belgium", "ireland", "northern ireland", "scotland", "usa", "america",
+            "united states", "canada", "australia", "new zealand", "india", "pakistan", "bangladesh",
+            "nigeria", "ghana", "south africa", "jamaica", "dubai", "uae", "turkey", "brazil", "thailand",
+            "morocco", "algeria", "egypt", "kenya", "somalia", "zimbabwe", "philippines", "china",
+            "hong kong", "singapore", "japan", "mexico", "sweden", "norway", "denmark", "switzerland",
+            "austria", "czech republic", "hungary", "bulgaria", "lithuania", "latvia", "slovakia",
+            "albania", "ukraine", "russia", "iran", "iraq", "afghanistan", "sri lanka", "nepal",
+            "saudi arabia", "qatar", "trinidad", "barbados",
+        )),
+    ],
+    "other_party_prison": [
+        ("other party prison", 0.95), ("prison", 0.9), ("jail", 0.9), ("gaol", 0.9),
+        ("in custody", 0.85), ("on remand", 0.85), ("incarcerated", 0.9), ("locked up", 0.8),
+        ("behind bars", 0.85), ("serving a sentence", 0.85), ("serving time", 0.85),
+        ("secure hospital", 0.9), ("sectioned", 0.6),
+        ("hmp", 0.9), ("remanded", 0.85), ("sent down", 0.85), ("sentenced", 0.7), ("year sentence", 0.8),
+        ("years sentence", 0.8), ("month sentence", 0.8), ("prison sentence", 0.95), ("young offender*", 0.85),
+        ("yoi", 0.85), ("immigration detention", 0.85), ("detention centre", 0.7), ("being held at", 0.4),
+    ],
+    "disability": [
+        ("disab*", 0.85), ("wheelchair", 0.75), ("housebound", 0.8), ("bedbound", 0.8),
+        ("can t leave the house", 0.8), ("cant leave the house", 0.8), ("agoraphob*", 0.75),
+        ("deaf", 0.6), ("blind", 0.6), ("reasonable adjustments", 0.8), ("chronic illness", 0.6),
+        ("mobility", 0.7), ("hard of hearing", 0.8), ("sign language", 0.75), ("signer", 0.7), ("bsl", 0.8),
+        ("partially sighted", 0.8), ("visually impaired", 0.8), ("learning difficult*", 0.75),
+        ("learning disab*", 0.85), ("autis*", 0.6), ("severe anxiety", 0.6), ("mental health", 0.5),
+        ("can t travel", 0.5), ("cant travel", 0.5), ("can t go out", 0.6), ("cant go out", 0.6),
+        ("can t manage stairs", 0.7), ("cant manage stairs", 0.7), ("no lift", 0.5),
+    ],
+    "no_mediator_available": [
+        ("no mediator available", 0.95), ("no mediator", 0.85), ("no mediators", 0.85),
+        ("no authorised mediator", 0.95), ("can t find a mediator", 0.8), ("cant find a mediator", 0.8),
+        ("couldn t find a mediator", 0.8), ("nearest mediator", 0.6), ("within 15 miles", 0.7),
+        ("no mediator within", 0.9),
+        ("none of the mediators", 0.85), ("no mediation service", 0.85), ("no mediator near", 0.9),
+        ("isn t a mediator", 0.85), ("isn t an authorised mediator", 0.9), ("aren t any mediators", 0.9),
+        ("closest mediator", 0.6), ("mediator nearby", 0.6), ("mediator near", 0.6),
+        ("mediators i contacted", 0.6), ("mediators i rang", 0.6), ("mediators i called", 0.6),
+        ("any mediator", 0.4), ("an hour away", 0.4), ("miles away", 0.4), ("no appointments", 0.6),
+        ("no availability", 0.6), ("waiting list", 0.5), ("couldn t get an appointment", 0.6),
+        ("could see me", 0.4),
+    ],
+}
+
+_NORMALISE = re.compile(r"[^a-z0-9]+")
+
+
+def normalise(text: str) -> str:
+    """Lowercase words separated by single spaces, padded with one space each side."""
+    return " " + _NORMALISE.sub(" ", text.lower()).strip() + " "
+
+
+class PhraseIndex:
+    """Aho-Corasick automaton over word-bounded phrases."""
+
+    def __init__(self, phrases: Iterable[Tuple[str, object]]):
+        # Per state: transitions, failure link, outputs [(payload, length)]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[object, int]]] = [[]]
+        for phrase, payload in phrases:
+            pattern = normalise(phrase.rstrip("*"))
+            if phrase.endswith("*"):
+                pattern = pattern[:-1]
+            self._add(pattern, payload)
+        self._link()
+
+    def _add(self, pattern: str, payload):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((payload, len(pattern)))
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                link = self._goto[fallback].get(char, 0)
+                self._fail[child] = link if link != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def search(self, text: str) -> List[Tuple[object, int, int]]:
+        """(payload, start, end) for every phrase in already-normalised text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = []
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for payload, length in out[state]:
+                found.append((payload, i + 1 - length, i + 1))
+        return found
+
+
+def _phrases():
+    for key, phrases in EXEMPTION_PHRASES.items():
+        for phrase, weight in phrases:
+            yield phrase, (key, phrase, weight)
+    # Exemption keys and labels always match themselves
+    for key, exemption in MIAM_EXEMPTIONS.items():
+        for text in {key.replace("_", " "), exemption["label"].lower()}:
+            yield text, (key, text, 0.95)
+
+
+_index = PhraseIndex(_phrases())
+
+
+def _negated(text: str, start: int) -> bool:
+    return any(word in NEGATIONS for word in text[:start].split()[-NEGATION_WINDOW:])
+
+
+def score(index: PhraseIndex, text: str) -> List[Dict[str, object]]:
+    """
+    Keys suggested by text under an index of (key, phrase, weight) payloads.
+
+    Returns [{"exemption", "confidence", "matched"}] for every key with at
+    least one phrase match, most confident first.
+    """
+    text = normalise(text)
+    misses: Dict[str, float] = {}
+    matched: Dict[str, List[str]] = {}
+    for (key, phrase, weight), start, _ in index.search(text):
+        if _negated(text, start):
+            weight *= NEGATION_DISCOUNT
+        misses[key] = misses.get(key, 1.0) * (1.0 - weight)
+        phrases = matched.setdefault(key, [])
+        if phrase not in phrases:
+            phrases.append(phrase)
+
+    results = [
+        {"exemption": key, "confidence": round(min(0.99, 1.0 - miss), 2), "matched": matched[key]}
+        for key, miss in misses.items()
+    ]
+    results.sort(key=lambda r: (-r["confidence"], r["exemption"]))
+    return results
+
+
+def screen(circumstances: str) -> List[Dict[str, object]]:
+    """
+    Exemptions suggested by free text, most confident first.
+
+    Returns [{"exemption", "confidence", "matched"}] for every exemption
+    with at least one phrase match (including ones below
+    SCREENING_MIN_CONFIDENCE).
+    """
+    return score(_index, circumstances)
@@ -0,0 +1,208 @@
+"""
+Warm per-session state for Hume CLM calls, keyed by custom_session_id.
+
+Hume sends every turn of a call as a separate /chat/completions request
+carrying the same custom_session_id. The registry keeps what the first
+turn resolved (identity, Zep user and memory context, thread config and
+the positions captured so far) so later turns skip that setup. Sessions
+idle for SESSION_IDLE_SECONDS are expired by a background sweeper;
+expiry hooks let other modules finalise a session when it ends.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from .state import Position, category_counts
+
+
+SESSION_IDLE_SECONDS = float(os.environ.get("SESSION_IDLE_SECONDS", "900"))
+SESSION_MAX = int(os.environ.get("SESSION_MAX", "5000"))
+SESSION_SWEEP_SECONDS = float(os.environ.get("SESSION_SWEEP_SECONDS", "30"))
+
+# Keeps async expiry hooks referenced until they finish
+_hook_tasks = set()
+
+
+def _latest_human(messages: list) -> int:
+    for i in range(len(messages) - 1, -1, -1):
+        if getattr(messages[i], "type", "") == "human":
+            return i
+    return 0
+
+
+class Session:
+    """Resolved state for one Hume call."""
+    __slots__ = (
+        "session_id", "user_name", "user_id", "thread_config",
+        "zep_ready", "zep_context", "positions", "scanned",
+        "safety", "turns", "created_at", "last_seen",
+    )
+
+    def __init__(self, session_id: str, user_name: str, user_id: str):
+        now = time.monotonic()
+        self.session_id = session_id
+        self.user_name = user_name
+        self.user_id = user_id
+        # Anonymous callers get a thread per call instead of sharing "anonymous"
+        self.thread_config = {"configurable": {"thread_id": user_id or f"session:{session_id}"}}
+        self.zep_ready = False
+        self.zep_context = ""
+        self.positions: List[Position] = []
+        # Messages already scanned for captures; None until this call's first turn
+        self.scanned: Optional[int] = None
+        # Merged safety flag (src.safety) once any turn has been flagged
+        self.safety: Optional[dict] = None
+        self.turns = 0
+        self.created_at = now
+        self.last_seen = now
+
+    @property
+    def thread_id(self) -> str:
+        return self.thread_config["configurable"]["thread_id"]
+
+    def set_context(self, zep_context: str):
+        self.zep_context = zep_context
+        self.zep_ready = True
+
+    def record_positions(self, messages: list):
+        """
+        Pick up capture_position results from messages not yet scanned.
+
+        The thread is keyed by user, so on this call's first turn (or after
+        the history shrinks) it already holds earlier calls; only messages
+        from the latest user message on belong to this call.
+        """
+        if self.scanned is None or len(messages) < self.scanned:
+            self.scanned = _latest_human(messages)
+        for message in messages[self.scanned:]:
+            if getattr(message, "type", "") != "tool" or getattr(message, "name", "") != "capture_position":
+                continue
+            try:
+                captured = json.loads(message.content).get("captured")
+            except (TypeError, ValueError, AttributeError):
+                continue
+            position = Position.from_wire(captured) if isinstance(captured, dict) else None
+            if position is not None:
+                self.positions.append(position)
+        self.scanned = len(messages)
+
+    def position_summary(self) -> dict:
+        """Counts of captured positions by category."""
+        return {"total": len(self.positions), "by_category": category_counts(self.positions)}
+
+    def to_dict(self) -> dict:
+        now = time.monotonic()
+        return {
+            "session": self.session_id[:12],
+            "user": (self.user_id or "anon")[:8],
+            "turns": self.turns,
+            "zep_ready": self.zep_ready,
+            "positions": self.position_summary(),
+            "safety": self.safety["categories"] if self.safety else None,
+            "age_s": round(now - self.created_at, 1),
+            "idle_s": round(now - self.last_seen, 1),
+        }
+
+
+class SessionRegistry:
+    """LRU of live sessions with idle expiry."""
+
+    def __init__(self, idle_seconds: float = SESSION_IDLE_SECONDS, max_sessions: int = SESSION_MAX):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._expiry_hooks: List[Callable[[Session], object]] = []
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        return self._sessions.get(session_id)
+
+    def resolve(self, session_id: str, parse: Callable[[str], dict]) -> Session:
+        """Existing session for session_id, or a new one built from parse()."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            parsed = parse(session_id)
+            session = Session(session_id, parsed["user_name"], parsed["user_id"])
+            self._sessions[session_id] = session
+            if len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self._run_hooks(evicted)
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_seen = time.monotonic()
+        session.turns += 1
+        return session
+
+    def add_expiry_hook(self, hook: Callable[[Session], object]):
+        """Call hook(session) when a session expires or is evicted."""
+        self._expiry_hooks.append(hook)
+
+    def _run_hooks(self, session: Session):
+        for hook in self._expiry_hooks:
+            try:
+                result = hook(session)
+                if asyncio.iscoroutine(result):
+                    task = asyncio.get_running_loop().create_task(result)
+                    _hook_tasks.add(task)
+                    task.add_done_callback(_hook_tasks.discard)
+            except Exception as e:
+                print(f"[SESSIONS] Expiry hook error: {e}", file=sys.stderr)
+
+    def expire(self, now: Optional[float] = None) -> List[Session]:
+        """Remove sessions idle past the limit (oldest first) and run hooks."""
+        now = now or time.monotonic()
+        expired = []
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen < self.idle_seconds:
+                break
+            del self._sessions[session_id]
+            expired.append(session)
+        for session in expired:
+            self._run_hooks(session)
+        return expired
+
+    def snapshot(self, limit: int = 50) -> list:
+        return [s.to_dict() for s in list(self._sessions.values())[-limit:][::-1]]
+
+
+registry = SessionRegistry()
+
+
+# =============================================================================
+# Sweeper
+# =============================================================================
+
+_sweep_task: Optional[asyncio.Task] = None
+
+
+async def _sweep_loop():
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_SECONDS)
+        expired = registry.expire()
+        if expired:
+            print(f"[SESSIONS] Expired {len(expired)} idle session(s), {len(registry)} live", file=sys.stderr)
+
+
+def start_sweeper():
+    global _sweep_task
+    if _sweep_task is None or _sweep_task.done():
+        _sweep_task = asyncio.create_task(_sweep_loop())
+
+
+async def stop_sweeper():
+    global _sweep_task
+    if _sweep_task is not None:
+        _sweep_task.cancel()
+        try:
+            await _sweep_task
+        except asyncio.CancelledError:
+            pass
+        _sweep_task = None
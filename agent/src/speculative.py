@@ -0,0 +1,110 @@
+"""
+Speculative early emission for the Hume CLM endpoint.
+
+With CLM_SPECULATIVE_EMIT on, the CLM turn streams the graph with
+stream_mode="messages" and AnswerSpeculator forwards the model's
+answer as soon as the model call that wrote it has finished, instead of
+waiting for the rest of the run (state writes, checkpointing, the final
+values). Nothing is sent that the caller might have to unhear:
+- only chunks from the agent's "model" node count (not tools,
+  subagents or middleware model calls);
+- text is held until its model call ends (chunk_position "last"), and a
+  call that emitted tool-call chunks is never spoken from, so a preamble
+  that turns into a tool call, a hedge that loses or a call that fails
+  is never heard;
+- once a call has been spoken, other calls are ignored.
+
+Hume's CLM client has no way to take back speech, so if the final
+answer somehow does not continue what was spoken, the spoken text
+stands as the turn's answer and the rest is dropped.
+"""
+
+import os
+import sys
+import time
+import asyncio
+from typing import AsyncIterator, Dict, Optional, Set
+
+from langchain_core.messages import AIMessageChunk
+
+from . import metrics
+
+
+CLM_SPECULATIVE_EMIT = os.environ.get("CLM_SPECULATIVE_EMIT", "false").lower() == "true"
+
+SPECULATION = metrics.counter(
+    "miam_speculative_turns_total",
+    "Speculative CLM turns by outcome",
+    ["outcome"],
+)
+FIRST_SPOKEN_SECONDS = metrics.histogram(
+    "miam_first_sentence_seconds",
+    "Time from turn start to the first speculatively emitted text",
+)
+
+
+def _text_of(chunk) -> str:
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    # Gemini can return content blocks
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in content or []
+    )
+
+
+class AnswerSpeculator:
+    """Decides which streamed model text is safe to speak early."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self.texts: Dict[str, str] = {}
+        self.tool_runs: Set[str] = set()
+        self.run_id: Optional[str] = None
+        self.spoken = ""
+
+    def feed(self, chunk, metadata: dict):
+        """Consume one ("messages" mode) chunk; queue a model call's text once it has ended."""
+        if not isinstance(chunk, AIMessageChunk) or metadata.get("langgraph_node") != "model":
+            return
+        run_id = chunk.id or ""
+        if chunk.tool_call_chunks:
+            self.tool_runs.add(run_id)
+            return
+        text = self.texts.get(run_id, "") + _text_of(chunk)
+        self.texts[run_id] = text
+        if chunk.chunk_position != "last" or self.run_id is not None or run_id in self.tool_runs or not text.strip():
+            return
+        self.run_id = run_id
+        self.spoken = text
+        FIRST_SPOKEN_SECONDS.observe(time.monotonic() - self.started)
+        self.queue.put_nowait(text)
+
+    async def deltas(self, turn: asyncio.Future) -> AsyncIterator[str]:
+        """Yield queued deltas until turn completes and the queue is drained."""
+        while True:
+            if not self.queue.empty():
+                yield self.queue.get_nowait()
+                continue
+            if turn.done():
+                return
+            getter = asyncio.ensure_future(self.queue.get())
+            await asyncio.wait({getter, turn}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+            else:
+                getter.cancel()
+
+    def finish(self, final_text: str) -> str:
+        """What is left to send once the graph has finished."""
+        if not self.spoken:
+            SPECULATION.inc(outcome="not_spoken")
+            return final_text
+        if final_text.startswith(self.spoken):
+            SPECULATION.inc(outcome="confirmed")
+            return final_text[len(self.spoken):]
+        SPECULATION.inc(outcome="diverged")
+        print(f"[CLM] Final answer diverged from the {len(self.spoken)} chars spoken, keeping them", file=sys.stderr)
+        return ""
@@ -0,0 +1,158 @@
+"""
+OpenAI-style SSE encoder for the Hume EVI CLM endpoint.
+
+Responses are cut into sentence or phrase chunks (whole clauses give
+TTS better prosody than single words) and each chunk is written into a
+frame template serialised once per response, so only the delta text is
+JSON-escaped per frame. orjson is used for escaping when installed.
+Frames are emitted back to back with no artificial pacing.
+
+Chunking is configurable per client with the `sse_chunking` /
+`sse_max_chunk` query params or the `x-sse-chunking` /
+`x-sse-max-chunk` headers, defaulting to SSE_CHUNKING / SSE_MAX_CHUNK_CHARS.
+"""
+
+import os
+import re
+import json
+from typing import AsyncIterator, List, Optional
+
+try:
+    import orjson
+
+    def escape(text: str) -> str:
+        return orjson.dumps(text).decode()
+except ImportError:
+    def escape(text: str) -> str:
+        return json.dumps(text, ensure_ascii=False)
+
+
+CHUNKING_MODES = ("sentence", "phrase", "word", "none")
+SSE_CHUNKING = os.environ.get("SSE_CHUNKING", "phrase")
+SSE_MAX_CHUNK_CHARS = int(os.environ.get("SSE_MAX_CHUNK_CHARS", "160"))
+# Phrases shorter than this are merged into the next one
+SSE_MIN_CHUNK_CHARS = int(os.environ.get("SSE_MIN_CHUNK_CHARS", "12"))
+
+DONE_FRAME = "data: [DONE]\n\n"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]]*\s+")
+_PHRASE_END = re.compile(r"(?<=[.!?…,;:—–])[\"')\]]*\s+")
+
+
+class SSEConfig:
+    """Per-client chunking settings."""
+    __slots__ = ("chunking", "max_chars", "min_chars")
+
+    def __init__(self, chunking: str = SSE_CHUNKING, max_chars: int = SSE_MAX_CHUNK_CHARS,
+                 min_chars: int = SSE_MIN_CHUNK_CHARS):
+        self.chunking = chunking if chunking in CHUNKING_MODES else "phrase"
+        self.max_chars = max(1, max_chars)
+        self.min_chars = min_chars
+
+
+DEFAULT_CONFIG = SSEConfig()
+
+
+def config_from_request(request) -> SSEConfig:
+    """Resolve chunking settings from query params / headers, else defaults."""
+    chunking = request.query_params.get("sse_chunking") or request.headers.get("x-sse-chunking")
+    max_chars = request.query_params.get("sse_max_chunk") or request.headers.get("x-sse-max-chunk")
+    if not chunking and not max_chars:
+        return DEFAULT_CONFIG
+    try:
+        max_chars = int(max_chars) if max_chars else SSE_MAX_CHUNK_CHARS
+    except ValueError:
+        max_chars = SSE_MAX_CHUNK_CHARS
+    return SSEConfig(chunking or SSE_CHUNKING, max_chars)
+
+
+# =============================================================================
+# Chunking
+# =============================================================================
+
+def _split_long(piece: str, max_chars: int) -> List[str]:
+    """Break an over-long piece on word boundaries."""
+    out = []
+    while len(piece) > max_chars:
+        cut = piece.rfind(" ", 0, max_chars) + 1 or max_chars
+        out.append(piece[:cut])
+        piece = piece[cut:]
+    if piece:
+        out.append(piece)
+    return out
+
+
+def chunk_text(content: str, config: SSEConfig = DEFAULT_CONFIG) -> List[str]:
+    """
+    Split content into deltas that concatenate back to content exactly.
+
+    Boundary whitespace stays on the end of the preceding chunk.
+    """
+    if not content:
+        return []
+    if config.chunking == "none":
+        return [content]
+    if config.chunking == "word":
+        words = content.split(" ")
+        return [w + " " for w in words[:-1]] + [words[-1]]
+
+    pattern = _SENTENCE_END if config.chunking == "sentence" else _PHRASE_END
+    pieces = []
+    start = 0
+    for match in pattern.finditer(content):
+        pieces.append(content[start:match.end()])
+        start = match.end()
+    if start < len(content):
+        pieces.append(content[start:])
+
+    chunks = []
+    pending = ""
+    for piece in pieces:
+        pending += piece
+        if len(pending) < config.min_chars:
+            continue
+        chunks.extend(_split_long(pending, config.max_chars))
+        pending = ""
+    if pending:
+        if chunks and len(chunks[-1]) + len(pending) <= config.max_chars:
+            chunks[-1] += pending
+        else:
+            chunks.append(pending)
+    return chunks
+
+
+# =============================================================================
+# Frames
+# =============================================================================
+
+class FrameTemplate:
+    """A chat.completion.chunk frame serialised once per message id."""
+    __slots__ = ("prefix", "stop")
+
+    SUFFIX = '},"finish_reason":null}]}\n\n'
+
+    def __init__(self, msg_id: str):
+        quoted = escape(msg_id)
+        self.prefix = (
+            f'data: {{"id":{quoted},"object":"chat.completion.chunk",'
+            f'"choices":[{{"index":0,"delta":{{"content":'
+        )
+        self.stop = f'data: {{"id":{quoted},"choices":[{{"delta":{{}},"finish_reason":"stop"}}]}}\n\n'
+
+    def delta(self, text: str) -> str:
+        return self.prefix + escape(text) + self.SUFFIX
+
+
+def encode(content: str, msg_id: str, config: SSEConfig = DEFAULT_CONFIG) -> List[str]:
+    """All frames for a complete response, including stop and [DONE]."""
+    template = FrameTemplate(msg_id)
+    frames = [template.delta(chunk) for chunk in chunk_text(content, config)]
+    frames.append(template.stop)
+    frames.append(DONE_FRAME)
+    return frames
+
+
+async def stream_sse_response(content: str, msg_id: str, config: Optional[SSEConfig] = None) -> AsyncIterator[str]:
+    """Stream a complete response in SSE format for OpenAI compatibility."""
+    for frame in encode(content, msg_id, config or DEFAULT_CONFIG):
+        yield frame
@@ -3,9 +3,15 @@ State schemas for MIAM.quest agent.
 
 Uses TypedDict for CopilotKit compatibility.
 State is automatically synced with frontend via CopilotKitMiddleware.
+
+The TypedDicts are the wire format. Internally, positions are held as
+slotted Position records with category and topic interned as small
+ints. Positions are not part of graph state, so they never reach the
+AG-UI boundary; Position.to_wire() gives the wire shape where one is
+needed.
 """
 
-from typing import TypedDict, Optional, List
+from typing import Any, Dict, Iterable, TypedDict, Optional, List
 
 
 class UserState(TypedDict, total=False):
@@ -67,6 +73,67 @@ POSITION_TOPICS = [
     "activities_hobbies", "religious_cultural", "travel_relocation", "other"
 ]
 
+# Interned codes: index into the lists above (append only, never reorder)
+CATEGORY_CODES = {name: i for i, name in enumerate(POSITION_CATEGORIES)}
+TOPIC_CODES = {name: i for i, name in enumerate(POSITION_TOPICS)}
+OTHER_TOPIC = TOPIC_CODES["other"]
+
+
+# =============================================================================
+# Compact Records
+# =============================================================================
+
+class Position:
+    """Compact PositionItem: category and topic are codes, not strings."""
+    __slots__ = ("id", "category", "topic", "item", "context")
+
+    def __init__(self, id: str, category: int, topic: int, item: str, context: Optional[str] = None):
+        self.id = id
+        self.category = category
+        self.topic = topic
+        self.item = item
+        self.context = context
+
+    @classmethod
+    def from_wire(cls, data: Dict[str, Any]) -> Optional["Position"]:
+        """Build from a PositionItem dict; None if the category is unknown."""
+        category = CATEGORY_CODES.get(data.get("category"))
+        if category is None:
+            return None
+        return cls(
+            data.get("id", ""),
+            category,
+            TOPIC_CODES.get(data.get("topic"), OTHER_TOPIC),
+            data.get("item", ""),
+            data.get("context"),
+        )
+
+    @property
+    def category_name(self) -> str:
+        return POSITION_CATEGORIES[self.category]
+
+    @property
+    def topic_name(self) -> str:
+        return POSITION_TOPICS[self.topic]
+
+    def to_wire(self) -> PositionItem:
+        return {
+            "id": self.id,
+            "category": POSITION_CATEGORIES[self.category],
+            "topic": POSITION_TOPICS[self.topic],
+            "item": self.item,
+            "context": self.context,
+        }
+
+
+def category_counts(positions: Iterable[Position]) -> Dict[str, int]:
+    """Position counts keyed by category name."""
+    counts = [0] * len(POSITION_CATEGORIES)
+    for position in positions:
+        counts[position.category] += 1
+    return {POSITION_CATEGORIES[i]: n for i, n in enumerate(counts) if n}
+
+
 MIAM_EXEMPTIONS = {
     "domestic_abuse": {
         "label": "Domestic Abuse",
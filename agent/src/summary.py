@@ -0,0 +1,220 @@
+"""
+Preparation summary engine.
+
+Builds a case's preparation summary from its persisted position_items:
+one indexed query (idx_position_items_case) reads the rows, and a
+single pass both groups them by category and topic and hashes their
+content. The rendered Markdown is cached by that content hash and
+written to `documents` as a new `version` only when the hash differs
+from the latest preparation_summary for the case, so regenerating an
+unchanged summary renders nothing and writes nothing. generate() only
+runs for a party to the case; for anyone else the case does not exist.
+"""
+
+import os
+import sys
+import json
+import uuid
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from . import db
+from . import metrics
+from .state import POSITION_CATEGORIES, POSITION_TOPICS, CATEGORY_CODES, TOPIC_CODES, OTHER_TOPIC, Position
+
+
+SUMMARY_CACHE_SIZE = int(os.environ.get("SUMMARY_CACHE_SIZE", "256"))
+
+DOC_TYPE = "preparation_summary"
+TITLE = "MIAM Preparation Summary"
+DISCLAIMER = (
+    "This summary is for preparation purposes only. It is not legal advice "
+    "and cannot replace professional mediation."
+)
+CATEGORY_LABELS = ["Must-Haves", "Priorities", "Nice-to-Haves", "Red Lines"]
+TOPIC_LABELS = [topic.replace("_", " ").title() for topic in POSITION_TOPICS]
+
+OWNER_QUERY = "SELECT 1 FROM cases WHERE id = %s AND (party_a_id = %s OR party_b_id = %s)"
+# Held until commit, so concurrent generate() calls for a case pick versions one at a time
+OWNER_LOCK_QUERY = OWNER_QUERY + " FOR UPDATE"
+POSITIONS_QUERY = """
+    SELECT id, category, topic, item, context
+    FROM position_items
+    WHERE case_id = %s
+    ORDER BY created_at, id
+"""
+LATEST_QUERY = """
+    SELECT id, version, metadata
+    FROM documents
+    WHERE case_id = %s AND doc_type = %s
+    ORDER BY version DESC
+    LIMIT 1
+"""
+INSERT_QUERY = """
+    INSERT INTO documents (case_id, user_id, doc_type, title, content, version, metadata)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    RETURNING id
+"""
+
+GENERATIONS = metrics.counter(
+    "miam_summary_generations_total",
+    "Preparation summary generations by outcome (written, unchanged, empty)",
+    ["outcome"],
+)
+
+_rendered: "OrderedDict[str, str]" = OrderedDict()
+
+
+class Grouped:
+    """Positions grouped by category then topic, with their content hash."""
+    __slots__ = ("groups", "count", "content_hash")
+
+    def __init__(self, groups: List[Dict[int, List[Position]]], count: int, content_hash: str):
+        self.groups = groups
+        self.count = count
+        self.content_hash = content_hash
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            POSITION_CATEGORIES[category]: sum(len(items) for items in topics.values())
+            for category, topics in enumerate(self.groups) if topics
+        }
+
+    def topics_covered(self) -> List[str]:
+        covered = set()
+        for topics in self.groups:
+            covered.update(topics)
+        return [POSITION_TOPICS[topic] for topic in sorted(covered)]
+
+    def sections(self) -> Dict[str, list]:
+        """Structured summary for the tool response."""
+        return {
+            CATEGORY_LABELS[category]: [
+                {"topic": TOPIC_LABELS[topic], "item": p.item, "context": p.context}
+                for topic, items in topics.items() for p in items
+            ]
+            for category, topics in enumerate(self.groups) if topics
+        }
+
+
+# =============================================================================
+# Grouping and Rendering
+# =============================================================================
+
+def group_rows(rows) -> Grouped:
+    """One pass over (id, category, topic, item, context) rows: group and hash."""
+    groups: List[Dict[int, List[Position]]] = [{} for _ in POSITION_CATEGORIES]
+    digest = hashlib.sha256()
+    count = 0
+    for row_id, category, topic, item, context in rows:
+        code = CATEGORY_CODES.get(category)
+        if code is None:
+            continue
+        topic_code = TOPIC_CODES.get(topic, OTHER_TOPIC)
+        groups[code].setdefault(topic_code, []).append(Position(str(row_id), code, topic_code, item, context))
+        digest.update(f"{row_id}\x1f{code}\x1f{topic_code}\x1f{item}\x1f{context or ''}\x1e".encode())
+        count += 1
+    return Grouped(groups, count, digest.hexdigest())
+
+
+def render(grouped: Grouped) -> str:
+    """Markdown document for a grouped summary (cached by content hash)."""
+    cached = _rendered.get(grouped.content_hash)
+    if cached is not None:
+        _rendered.move_to_end(grouped.content_hash)
+        return cached
+
+    lines = [f"# {TITLE}", ""]
+    for category, topics in enumerate(grouped.groups):
+        if not topics:
+            continue
+        lines.append(f"## {CATEGORY_LABELS[category]}")
+        for topic in sorted(topics):
+            lines.append(f"### {TOPIC_LABELS[topic]}")
+            for p in topics[topic]:
+                lines.append(f"- {p.item}" + (f" ({p.context})" if p.context else ""))
+            lines.append("")
+    lines.append(f"_{DISCLAIMER}_")
+    content = "\n".join(lines) + "\n"
+
+    _rendered[grouped.content_hash] = content
+    if len(_rendered) > SUMMARY_CACHE_SIZE:
+        _rendered.popitem(last=False)
+    return content
+
+
+# =============================================================================
+# Generation
+# =============================================================================
+
+def owns_case(cur, case_id: str, user_id: Optional[str], lock: bool = False) -> bool:
+    """
+    Whether user_id is either party to case_id (False for ids that are not UUIDs).
+
+    With lock, the case row stays locked until the transaction ends.
+    """
+    try:
+        uuid.UUID(str(case_id))
+        uuid.UUID(str(user_id))
+    except ValueError:
+        return False
+    cur.execute(OWNER_LOCK_QUERY if lock else OWNER_QUERY, (case_id, user_id, user_id))
+    return cur.fetchone() is not None
+
+
+def _metadata_hash(metadata: Any) -> Optional[str]:
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            return None
+    return metadata.get("content_hash") if isinstance(metadata, dict) else None
+
+
+def generate(case_id: str, user_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Build (or reuse) a case's preparation summary document for user_id.
+
+    Returns the document id, version, content and whether a new version
+    was written. Raises LookupError, whether the case is missing or not
+    user_id's, so callers cannot tell the two apart, and raises if the
+    database is not configured or fails.
+    """
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            if not owns_case(cur, case_id, user_id, lock=True):
+                raise LookupError(f"No case {case_id}")
+            cur.execute(POSITIONS_QUERY, (case_id,))
+            grouped = group_rows(cur.fetchall())
+            if grouped.count == 0:
+                GENERATIONS.inc(outcome="empty")
+                return {"case_id": case_id, "count": 0, "changed": False}
+
+            cur.execute(LATEST_QUERY, (case_id, DOC_TYPE))
+            latest = cur.fetchone()
+            if latest is not None and _metadata_hash(latest[2]) == grouped.content_hash:
+                GENERATIONS.inc(outcome="unchanged")
+                document_id, version, changed = str(latest[0]), latest[1], False
+            else:
+                version = (latest[1] if latest is not None else 0) + 1
+                metadata = {"content_hash": grouped.content_hash, "positions": grouped.count}
+                cur.execute(INSERT_QUERY, (
+                    case_id, user_id, DOC_TYPE, TITLE, render(grouped), version, json.dumps(metadata),
+                ))
+                document_id, changed = str(cur.fetchone()[0]), True
+                GENERATIONS.inc(outcome="written")
+                print(f"[SUMMARY] Case {str(case_id)[:8]}: wrote version {version} ({grouped.count} positions)", file=sys.stderr)
+
+    return {
+        "case_id": case_id,
+        "document_id": document_id,
+        "version": version,
+        "changed": changed,
+        "count": grouped.count,
+        "counts": grouped.counts(),
+        "topics_covered": grouped.topics_covered(),
+        "sections": grouped.sections(),
+        "content_hash": grouped.content_hash,
+        "content": render(grouped),
+    }
@@ -0,0 +1,50 @@
+"""
+Pre-serialised responses for deterministic tools.
+
+A tool that returns a dict has it JSON-encoded into its ToolMessage on
+every call. Tools whose output depends only on their arguments can
+instead return the JSON string itself, encoded exactly as the ToolMessage
+would carry it (json.dumps with ensure_ascii=False). Then the string can
+be built once and reused:
+
+    serialize(value)   encode one constant response at import time
+    pure_tool          memoise a pure tool function's encoded response
+"""
+
+import json
+import functools
+from typing import Any, Callable
+
+
+PURE_TOOL_CACHE_SIZE = 256
+
+
+def serialize(value: Any) -> str:
+    """Encode a tool response exactly as the ToolMessage would carry it."""
+    return json.dumps(value, ensure_ascii=False)
+
+
+def pure_tool(func: Callable = None, *, maxsize: int = PURE_TOOL_CACHE_SIZE):
+    """
+    Memoise a pure tool function and return its pre-serialised JSON.
+
+    Apply under @tool. Arguments must be hashable. The response for each
+    distinct set of arguments is built and encoded once and then served
+    from an LRU cache of maxsize entries. Only the encoded str is cached,
+    so the decorated function returns str whatever func is annotated with.
+    """
+    def decorate(func: Callable) -> Callable:
+        @functools.lru_cache(maxsize=maxsize)
+        def cached(*args, **kwargs) -> str:
+            return serialize(func(*args, **kwargs))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> str:
+            return cached(*args, **kwargs)
+
+        wrapper.__annotations__ = {**func.__annotations__, "return": str}
+        wrapper.cache_info = cached.cache_info
+        wrapper.cache_clear = cached.cache_clear
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
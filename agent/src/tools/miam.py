@@ -7,8 +7,9 @@ Integrates with Zep for user memory and Neon for mediator search.
 
 import os
 import uuid
+from types import MappingProxyType
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
 from langchain.tools import tool
 from pydantic import BaseModel, Field
 
@@ -16,8 +17,26 @@ from pydantic import BaseModel, Field
 from zep_cloud.client import Zep
 from zep_cloud import NotFoundError
 
-# Neon PostgreSQL
-import psycopg2
+# Neon PostgreSQL (pooled)
+from .. import db
+
+# Request deadline propagated from the endpoint
+from .. import deadline
+
+# Preparation summary engine
+from .. import summary
+
+# Verified caller for the request (never a model-supplied id)
+from .. import identity
+
+# Free-text exemption screening
+from .. import screening
+
+# Managed io/cpu pools for async tool calls
+from ..executor import install as use_managed_executor
+
+# Pre-serialised responses for deterministic tools
+from .memo import serialize, pure_tool
 
 # Import state constants
 from ..state import POSITION_CATEGORIES, POSITION_TOPICS, MIAM_EXEMPTIONS
@@ -28,7 +47,6 @@ from ..state import POSITION_CATEGORIES, POSITION_TOPICS, MIAM_EXEMPTIONS
 # =============================================================================
 
 _zep_client = None
-_database_url = None
 
 
 def get_zep_client():
@@ -43,10 +61,7 @@ def get_zep_client():
 
 def get_database_url():
     """Get database URL."""
-    global _database_url
-    if _database_url is None:
-        _database_url = os.environ.get("DATABASE_URL")
-    return _database_url
+    return db.get_database_url()
 
 
 # =============================================================================
@@ -60,7 +75,7 @@ async def get_or_create_zep_user(user_id: str, email: str = None, name: str = No
         return None
 
     try:
-        user = client.user.get(user_id)
+        user = client.user.get(user_id, request_options=deadline.request_options())
         return user
     except NotFoundError:
         first_name = name.split()[0] if name else None
@@ -69,9 +84,10 @@ async def get_or_create_zep_user(user_id: str, email: str = None, name: str = No
             user_id=user_id,
             email=email,
             first_name=first_name,
-            last_name=last_name
+            last_name=last_name,
+            request_options=deadline.request_options(),
         )
-        return client.user.get(user_id)
+        return client.user.get(user_id, request_options=deadline.request_options())
     except Exception as e:
         print(f"[TOOLS] Zep user error: {e}")
         return None
@@ -84,7 +100,9 @@ async def get_user_context(user_id: str) -> str:
         return ""
 
     try:
-        context = client.user.get_context(user_id, min_score=0.5)
+        context = client.user.get_context(
+            user_id, min_score=0.5, request_options=deadline.request_options()
+        )
         if context and context.facts:
             facts = [f.fact for f in context.facts[:5]]
             return "Known about this user: " + "; ".join(facts)
@@ -143,7 +161,7 @@ class MIAMInfoInput(BaseModel):
 class ExemptionInput(BaseModel):
     """Input schema for check_exemption_eligibility tool."""
     circumstances: str = Field(
-        description="Comma-separated list of circumstances (e.g., 'domestic_abuse, urgency')"
+        description="The user's circumstances in their own words, or exemption keys (e.g., 'my ex is in prison', 'domestic_abuse, urgency')"
     )
 
 
@@ -163,6 +181,14 @@ class MediatorSearchInput(BaseModel):
     )
 
 
+class SummaryInput(BaseModel):
+    """Input schema for generate_preparation_summary tool."""
+    case_id: Optional[str] = Field(
+        default=None,
+        description="Case ID to build the summary from saved positions (omit for an outline)"
+    )
+
+
 class LoadMemoryInput(BaseModel):
     """Input schema for load_user_memory tool."""
     user_id: str = Field(
@@ -179,93 +205,15 @@ class LoadMemoryInput(BaseModel):
 
 
 # =============================================================================
-# MIAM Tools
+# Precomputed Responses
 # =============================================================================
+# Built and serialised once at import; the deterministic tools below
+# return these strings as-is.
 
-@tool(args_schema=PositionInput)
-def capture_position(category: str, topic: str, item: str, context: Optional[str] = None) -> Dict[str, Any]:
-    """
-    Capture a position item from the user's conversation.
-
-    Use this to record what the user wants from their mediation - their priorities,
-    must-haves, nice-to-haves, and red lines.
-
-    Args:
-        category: Position category (must_have, priority, nice_to_have, red_line)
-        topic: Topic area (living_arrangements, school_education, etc.)
-        item: The actual position statement
-        context: Optional additional context
-
-    Returns:
-        Confirmation of captured position
-    """
-    if category not in POSITION_CATEGORIES:
-        return {
-            "success": False,
-            "error": f"Invalid category. Use: {', '.join(POSITION_CATEGORIES)}"
-        }
-
-    if topic not in POSITION_TOPICS:
-        topic = "other"
-
-    position_id = str(uuid.uuid4())[:8]
-
-    return {
-        "success": True,
-        "captured": {
-            "id": position_id,
-            "category": category,
-            "topic": topic,
-            "item": item,
-            "context": context
-        },
-        "message": f"I've captured that as a {category.replace('_', ' ')} item about {topic.replace('_', ' ')}."
-    }
-
-
-@tool
-def get_position_summary() -> Dict[str, Any]:
-    """
-    Get a summary of position topics available.
-
-    Use this to show the user what topics they should consider discussing
-    when preparing for their MIAM.
-
-    Returns:
-        List of topics to discuss
-    """
-    return {
-        "position_categories": POSITION_CATEGORIES,
-        "available_topics": POSITION_TOPICS,
-        "suggested_discussion": [
-            "What are your absolute must-haves for living arrangements?",
-            "What are your priorities for school and education decisions?",
-            "How would you like holidays and special occasions handled?",
-            "What communication style works best between households?",
-            "Are there any red lines you won't compromise on?"
-        ],
-        "tip": "Help the user explore each topic, asking if items are must-haves, priorities, nice-to-haves, or red lines."
-    }
-
-
-@tool(args_schema=MIAMInfoInput)
-def get_miam_info(topic: str = "overview") -> Dict[str, Any]:
-    """
-    Get information about the MIAM process.
-
-    Use this to answer user questions about MIAMs, certificates, costs,
-    and what to expect.
-
-    Args:
-        topic: overview, cost, process, certificate, or what_to_expect
-
-    Returns:
-        Information about the requested topic
-    """
-    info = {
-        "overview": {
-            "title": "What is a MIAM?",
-            "content": """A MIAM (Mediation Information Assessment Meeting) is a mandatory meeting before applying to family court in England and Wales.
+MIAM_INFO = {
+    "overview": {
+        "title": "What is a MIAM?",
+        "content": """A MIAM (Mediation Information Assessment Meeting) is a mandatory meeting before applying to family court in England and Wales.
 
 Key points:
 - Duration: Typically 45-60 minutes
@@ -273,10 +221,10 @@ Key points:
 - Purpose: A mediator explains mediation and assesses suitability
 - Outcome: You receive a certificate confirming attendance
 - Requirement: Needed before submitting C100 form to court"""
-        },
-        "cost": {
-            "title": "MIAM & Mediation Costs",
-            "content": """MIAM Costs:
+    },
+    "cost": {
+        "title": "MIAM & Mediation Costs",
+        "content": """MIAM Costs:
 - Typical cost: £90-150 per person
 - Free with legal aid if you qualify
 
@@ -293,10 +241,10 @@ Compared to Court:
 - Court application fee: £232
 - Full court process can cost £5,000-50,000+ with solicitors
 - Mediation is typically 5-10x cheaper"""
-        },
-        "process": {
-            "title": "The MIAM Process",
-            "content": """What happens at a MIAM:
+    },
+    "process": {
+        "title": "The MIAM Process",
+        "content": """What happens at a MIAM:
 
 1. Initial Contact
    - You contact an FMC-accredited mediator
@@ -316,10 +264,10 @@ Compared to Court:
    - If suitable: book full mediation sessions
    - If not suitable: can proceed to court with certificate
    - Certificate valid for 4 months"""
-        },
-        "certificate": {
-            "title": "MIAM Certificate",
-            "content": """About the MIAM Certificate:
+    },
+    "certificate": {
+        "title": "MIAM Certificate",
+        "content": """About the MIAM Certificate:
 
 - Official document proving MIAM attendance (Form FM1)
 - Required when submitting a C100 court application
@@ -333,10 +281,10 @@ What if other parent won't attend:
 - You can still get a certificate
 - It will note the other party didn't attend/respond
 - This satisfies the court requirement"""
-        },
-        "what_to_expect": {
-            "title": "What to Expect at Your MIAM",
-            "content": """Preparing for Your MIAM:
+    },
+    "what_to_expect": {
+        "title": "What to Expect at Your MIAM",
+        "content": """Preparing for Your MIAM:
 
 Before:
 - Think about what outcomes you want
@@ -357,48 +305,193 @@ Tips:
 - Being prepared (like working with me) helps
 - The mediator wants to help, not judge
 - It's okay to be emotional"""
+    }
+}
+
+POSITION_SUMMARY = {
+    "position_categories": POSITION_CATEGORIES,
+    "available_topics": POSITION_TOPICS,
+    "suggested_discussion": [
+        "What are your absolute must-haves for living arrangements?",
+        "What are your priorities for school and education decisions?",
+        "How would you like holidays and special occasions handled?",
+        "What communication style works best between households?",
+        "Are there any red lines you won't compromise on?"
+    ],
+    "tip": "Help the user explore each topic, asking if items are must-haves, priorities, nice-to-haves, or red lines."
+}
+
+PREPARATION_OUTLINE = {
+    "summary_sections": [
+        {
+            "title": "Must-Haves",
+            "description": "Non-negotiable items - things you absolutely need in any agreement"
+        },
+        {
+            "title": "Priorities",
+            "description": "Important items you'd like but could be flexible on"
+        },
+        {
+            "title": "Nice-to-Haves",
+            "description": "Items that would be good but aren't essential"
+        },
+        {
+            "title": "Red Lines",
+            "description": "Absolute deal-breakers you won't compromise on"
+        }
+    ],
+    "key_topics": [
+        "Living arrangements - where children will live primarily",
+        "School & education decisions",
+        "Holidays and special occasions",
+        "Communication between households",
+        "Decision-making responsibilities",
+        "Financial support"
+    ],
+    "tip": "The more prepared you are, the more productive your MIAM will be.",
+    "disclaimer": "This summary is for preparation purposes only. It is not legal advice and cannot replace professional mediation."
+}
+
+EXEMPTION_KEYS = list(MIAM_EXEMPTIONS.keys())
+EXEMPTION_NOTE = "Exemptions must be declared on the C100 form. Some require evidence. If you're unsure, discuss with a solicitor or the mediator."
+EXEMPTION_DISCLAIMER = "I can provide information about exemptions, but cannot determine eligibility. This is not legal advice."
+
+MIAM_INFO_JSON = MappingProxyType({topic: serialize(entry) for topic, entry in MIAM_INFO.items()})
+POSITION_SUMMARY_JSON = serialize(POSITION_SUMMARY)
+PREPARATION_OUTLINE_JSON = serialize(PREPARATION_OUTLINE)
+CASE_NOT_FOUND_JSON = serialize({
+    "success": False,
+    "error": "Case not found",
+    "message": "I couldn't find that case on your account.",
+})
+
+
+# =============================================================================
+# MIAM Tools
+# =============================================================================
+
+@tool(args_schema=PositionInput)
+def capture_position(category: str, topic: str, item: str, context: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Capture a position item from the user's conversation.
+
+    Use this to record what the user wants from their mediation - their priorities,
+    must-haves, nice-to-haves, and red lines.
+
+    Args:
+        category: Position category (must_have, priority, nice_to_have, red_line)
+        topic: Topic area (living_arrangements, school_education, etc.)
+        item: The actual position statement
+        context: Optional additional context
+
+    Returns:
+        Confirmation of captured position
+    """
+    if category not in POSITION_CATEGORIES:
+        return {
+            "success": False,
+            "error": f"Invalid category. Use: {', '.join(POSITION_CATEGORIES)}"
         }
+
+    if topic not in POSITION_TOPICS:
+        topic = "other"
+
+    position_id = str(uuid.uuid4())[:8]
+
+    return {
+        "success": True,
+        "captured": {
+            "id": position_id,
+            "category": category,
+            "topic": topic,
+            "item": item,
+            "context": context
+        },
+        "message": f"I've captured that as a {category.replace('_', ' ')} item about {topic.replace('_', ' ')}."
     }
 
-    return info.get(topic, info["overview"])
 
+@tool
+def get_position_summary() -> str:
+    """
+    Get a summary of position topics available.
+
+    Use this to show the user what topics they should consider discussing
+    when preparing for their MIAM.
 
-@tool(args_schema=ExemptionInput)
-def check_exemption_eligibility(circumstances: str) -> Dict[str, Any]:
+    Returns:
+        List of topics to discuss
     """
-    Check if user may qualify for MIAM exemption.
+    return POSITION_SUMMARY_JSON
 
-    Use this when user mentions circumstances that might exempt them
-    from attending a MIAM.
+
+@tool(args_schema=MIAMInfoInput)
+def get_miam_info(topic: str = "overview") -> str:
+    """
+    Get information about the MIAM process.
+
+    Use this to answer user questions about MIAMs, certificates, costs,
+    and what to expect.
 
     Args:
-        circumstances: Comma-separated circumstances (e.g., 'domestic_abuse, urgency')
+        topic: overview, cost, process, certificate, or what_to_expect
 
     Returns:
-        Information about potential exemptions
+        Information about the requested topic
     """
-    circumstances_list = [c.strip().lower().replace(" ", "_") for c in circumstances.split(",")]
-    potential_exemptions = []
+    return MIAM_INFO_JSON.get(topic) or MIAM_INFO_JSON["overview"]
 
-    for circ in circumstances_list:
-        if circ in MIAM_EXEMPTIONS:
-            exemption = MIAM_EXEMPTIONS[circ]
-            potential_exemptions.append({
-                "exemption": circ,
-                "label": exemption["label"],
-                "description": exemption["description"],
-                "evidence_required": exemption.get("evidence_required", [])
-            })
+
+def _exemption_payload(matches: Tuple[Tuple[str, float, Tuple[str, ...]], ...]) -> Dict[str, Any]:
+    """Eligibility response for screened (exemption, confidence, matched) tuples."""
+    potential_exemptions = []
+    for key, confidence, matched in matches:
+        exemption = MIAM_EXEMPTIONS[key]
+        potential_exemptions.append({
+            "exemption": key,
+            "label": exemption["label"],
+            "description": exemption["description"],
+            "evidence_required": exemption.get("evidence_required", []),
+            "confidence": confidence,
+            "matched": list(matched),
+        })
 
     return {
         "has_potential_exemption": len(potential_exemptions) > 0,
         "potential_exemptions": potential_exemptions,
-        "all_exemptions": list(MIAM_EXEMPTIONS.keys()),
-        "important_note": "Exemptions must be declared on the C100 form. Some require evidence. If you're unsure, discuss with a solicitor or the mediator.",
-        "disclaimer": "I can provide information about exemptions, but cannot determine eligibility. This is not legal advice."
+        "all_exemptions": EXEMPTION_KEYS,
+        "important_note": EXEMPTION_NOTE,
+        "disclaimer": EXEMPTION_DISCLAIMER,
     }
 
 
+# Cached as its encoded JSON, so every caller shares an immutable str, never the dict
+_exemption_response: Callable[..., str] = pure_tool(_exemption_payload)
+
+
+@tool(args_schema=ExemptionInput)
+def check_exemption_eligibility(circumstances: str) -> str:
+    """
+    Check if user may qualify for MIAM exemption.
+
+    Use this when user mentions circumstances that might exempt them
+    from attending a MIAM.
+
+    Args:
+        circumstances: The user's circumstances in their own words, or exemption
+            keys (e.g., 'my ex is in prison', 'domestic_abuse, urgency')
+
+    Returns:
+        Information about potential exemptions, with confidence scores
+    """
+    # Free text rarely repeats but screening outcomes do, so cache on those
+    return _exemption_response(tuple(
+        (match["exemption"], match["confidence"], tuple(match["matched"]))
+        for match in screening.screen(circumstances)
+        if match["confidence"] >= screening.SCREENING_MIN_CONFIDENCE
+    ))
+
+
 @tool(args_schema=MediatorSearchInput)
 def search_mediators(location: Optional[str] = None, remote_only: bool = False, legal_aid_only: bool = False) -> Dict[str, Any]:
     """
@@ -422,10 +515,16 @@ def search_mediators(location: Optional[str] = None, remote_only: bool = False,
             "fmc_url": "https://www.familymediationcouncil.org.uk/find-local-mediator/"
         }
 
-    try:
-        conn = psycopg2.connect(database_url)
-        cur = conn.cursor()
+    remaining = deadline.remaining()
+    if remaining is not None and remaining <= 0:
+        return {
+            "success": False,
+            "error": "Request deadline exceeded",
+            "fallback": "Visit familymediationcouncil.org.uk to find accredited mediators.",
+            "fmc_url": "https://www.familymediationcouncil.org.uk/find-local-mediator/"
+        }
 
+    try:
         query = """
             SELECT id, name, fmc_number, specializations, location, postcode,
                    remote_available, in_person_available, miam_cost, legal_aid_available
@@ -444,10 +543,12 @@ def search_mediators(location: Optional[str] = None, remote_only: bool = False,
 
         query += " ORDER BY name LIMIT 10"
 
-        cur.execute(query, params)
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                if remaining is not None:
+                    cur.execute("SET LOCAL statement_timeout = %s", (max(1, int(remaining * 1000)),))
+                cur.execute(query, params)
+                rows = cur.fetchall()
 
         mediators = []
         for row in rows:
@@ -486,47 +587,34 @@ def search_mediators(location: Optional[str] = None, remote_only: bool = False,
         }
 
 
-@tool
-def generate_preparation_summary() -> Dict[str, Any]:
+@tool(args_schema=SummaryInput)
+def generate_preparation_summary(case_id: Optional[str] = None) -> Union[Dict[str, Any], str]:
     """
-    Generate information about what a preparation summary includes.
+    Generate the user's preparation summary, or describe what it includes.
+
+    With a case_id, builds the summary from the positions saved for that
+    case and stores it as a document. Without one, returns the sections
+    and topics a preparation summary covers.
 
-    Use this when the user wants to know what they should prepare
-    before their MIAM.
+    Args:
+        case_id: Optional case ID to summarise
 
     Returns:
-        Information about preparation summary contents
+        The summary (grouped positions and document version) or an outline
     """
-    return {
-        "summary_sections": [
-            {
-                "title": "Must-Haves",
-                "description": "Non-negotiable items - things you absolutely need in any agreement"
-            },
-            {
-                "title": "Priorities",
-                "description": "Important items you'd like but could be flexible on"
-            },
-            {
-                "title": "Nice-to-Haves",
-                "description": "Items that would be good but aren't essential"
-            },
-            {
-                "title": "Red Lines",
-                "description": "Absolute deal-breakers you won't compromise on"
-            }
-        ],
-        "key_topics": [
-            "Living arrangements - where children will live primarily",
-            "School & education decisions",
-            "Holidays and special occasions",
-            "Communication between households",
-            "Decision-making responsibilities",
-            "Financial support"
-        ],
-        "tip": "The more prepared you are, the more productive your MIAM will be.",
-        "disclaimer": "This summary is for preparation purposes only. It is not legal advice and cannot replace professional mediation."
-    }
+    if case_id and get_database_url():
+        try:
+            # Only the signed-in caller's own cases; anything else is "not found"
+            result = summary.generate(case_id, identity.current())
+            if result["count"]:
+                result.pop("content")
+                return {"success": True, **result, "disclaimer": summary.DISCLAIMER}
+        except LookupError:
+            return CASE_NOT_FOUND_JSON
+        except Exception as e:
+            print(f"[TOOLS] generate_preparation_summary error: {e}")
+
+    return PREPARATION_OUTLINE_JSON
 
 
 @tool(args_schema=LoadMemoryInput)
@@ -555,6 +643,13 @@ def load_user_memory(user_id: str, user_name: Optional[str] = None, user_email:
             "user_id": user_id
         }
 
+    if deadline.expired():
+        return {
+            "success": False,
+            "error": "Request deadline exceeded",
+            "user_id": user_id[:8] + "..."
+        }
+
     try:
         # Run async in sync context
         loop = asyncio.new_event_loop()
@@ -583,7 +678,7 @@ def load_user_memory(user_id: str, user_name: Optional[str] = None, user_email:
 
 
 # Export all tools as a list
-MIAM_TOOLS = [
+MIAM_TOOLS = use_managed_executor([
     capture_position,
     get_position_summary,
     get_miam_info,
@@ -591,4 +686,4 @@ MIAM_TOOLS = [
     search_mediators,
     generate_preparation_summary,
     load_user_memory,
-]
+])
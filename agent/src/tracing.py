@@ -0,0 +1,166 @@
+"""
+Per-stage latency tracing for the CLM and AG-UI paths.
+
+span("stage") times a block, records it in the miam_stage_seconds
+histogram (p50/p95/p99 at /debug/latency, buckets at /metrics) and, when
+TRACE_LOG is on, writes one JSON line per span to stderr with the
+request's trace id. If the OpenTelemetry SDK is installed and
+OTEL_EXPORTER_OTLP_ENDPOINT is set, spans are also exported to the local
+collector; otherwise the OTel path is skipped entirely.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional
+
+from langchain.agents.middleware import AgentMiddleware
+
+from . import metrics
+
+
+TRACE_LOG = os.environ.get("TRACE_LOG", "false").lower() == "true"
+OTEL_ENDPOINT = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT")
+
+STAGE_SECONDS = metrics.histogram(
+    "miam_stage_seconds",
+    "Latency of each request stage",
+    ["path", "stage"],
+)
+
+_trace_id: ContextVar[Optional[str]] = ContextVar("miam_trace_id", default=None)
+_path: ContextVar[str] = ContextVar("miam_trace_path", default="")
+
+
+# =============================================================================
+# Optional OpenTelemetry Export
+# =============================================================================
+
+_tracer = None
+
+if OTEL_ENDPOINT:
+    try:
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        _provider = TracerProvider(resource=Resource.create({"service.name": "miam-quest-agent"}))
+        _provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        otel_trace.set_tracer_provider(_provider)
+        _tracer = otel_trace.get_tracer("miam.agent")
+        print(f"[TRACE] Exporting spans to {OTEL_ENDPOINT}", file=sys.stderr)
+    except ImportError:
+        print("[TRACE] OTEL_EXPORTER_OTLP_ENDPOINT set but opentelemetry-sdk not installed", file=sys.stderr)
+
+
+# =============================================================================
+# Spans
+# =============================================================================
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+@contextmanager
+def trace(path: str, trace_id: Optional[str] = None):
+    """Start a request trace; spans inside inherit its id and path."""
+    id_token = _trace_id.set(trace_id or uuid.uuid4().hex[:16])
+    path_token = _path.set(path)
+    try:
+        with span("request"):
+            yield _trace_id.get()
+    finally:
+        _path.reset(path_token)
+        _trace_id.reset(id_token)
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """Time a stage of the current request."""
+    path = _path.get() or "internal"
+    otel_span = None
+    if _tracer is not None:
+        otel_span = _tracer.start_as_current_span(
+            stage, attributes={"miam.path": path, "miam.trace_id": _trace_id.get() or "", **attributes}
+        )
+        otel_span.__enter__()
+
+    started = time.monotonic()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        elapsed = time.monotonic() - started
+        STAGE_SECONDS.observe(elapsed, path=path, stage=stage)
+        if otel_span is not None:
+            otel_span.__exit__(None, None, None)
+        if TRACE_LOG:
+            record = {
+                "trace": _trace_id.get(),
+                "path": path,
+                "stage": stage,
+                "ms": round(elapsed * 1000, 2),
+                **attributes,
+            }
+            if error:
+                record["error"] = error
+            print(f"[TRACE] {json.dumps(record, default=str)}", file=sys.stderr)
+
+
+async def traced_stream(body_iterator, path: str, trace_id: str, stage: str):
+    """Re-enter a request trace to time a streamed response body."""
+    # The generator may be closed from another context on disconnect, where
+    # reset() raises ValueError; each reset is guarded so one cannot skip the other
+    id_token = _trace_id.set(trace_id)
+    try:
+        path_token = _path.set(path)
+        try:
+            with span(stage):
+                async for chunk in body_iterator:
+                    yield chunk
+        finally:
+            with suppress(ValueError):
+                _path.reset(path_token)
+    finally:
+        with suppress(ValueError):
+            _trace_id.reset(id_token)
+
+
+def stage_quantiles() -> dict:
+    """p50/p95/p99 (seconds) and counts per path,stage."""
+    return STAGE_SECONDS.all_quantiles()
+
+
+# =============================================================================
+# Agent Middleware: per model call and per tool call spans
+# =============================================================================
+
+class TracingMiddleware(AgentMiddleware):
+    """Record a span around every model call and tool call in the graph."""
+
+    async def awrap_model_call(self, request, handler: Callable[..., Awaitable]):
+        with span("model_call"):
+            return await handler(request)
+
+    def wrap_model_call(self, request, handler):
+        with span("model_call"):
+            return handler(request)
+
+    async def awrap_tool_call(self, request, handler: Callable[..., Awaitable]):
+        name = (request.tool_call or {}).get("name", "unknown")
+        with span(f"tool:{name}"):
+            return await handler(request)
+
+    def wrap_tool_call(self, request, handler):
+        name = (request.tool_call or {}).get("name", "unknown")
+        with span(f"tool:{name}"):
+            return handler(request)
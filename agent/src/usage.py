@@ -0,0 +1,297 @@
+"""
+Token and cost accounting for the MIAM.quest agent.
+
+TokenUsageMiddleware reads usage_metadata from every model response in
+the graph and aggregates it per thread_id, per user, per model and per
+tool loop (the model steps that consume a tool's results). Deltas are
+buffered in memory and upserted into the token_usage table (migration
+005) in batches by a background flusher, never on the request path.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional
+
+from langchain.agents.middleware import AgentMiddleware
+
+from . import db
+from . import metrics
+from .llm import model_name_of
+
+
+USAGE_FLUSH_SECONDS = float(os.environ.get("USAGE_FLUSH_SECONDS", "30"))
+USAGE_FLUSH_BATCH = int(os.environ.get("USAGE_FLUSH_BATCH", "200"))
+USAGE_MAX_THREADS = int(os.environ.get("USAGE_MAX_THREADS", "10000"))
+
+# USD per 1M tokens (input, output); override with MODEL_PRICES_JSON
+MODEL_PRICES = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+}
+MODEL_PRICES.update({k: tuple(v) for k, v in json.loads(os.environ.get("MODEL_PRICES_JSON", "{}")).items()})
+
+TOKENS = metrics.counter(
+    "miam_llm_tokens_total",
+    "Model tokens consumed",
+    ["model", "direction"],
+)
+
+_current_user: ContextVar[Optional[str]] = ContextVar("miam_usage_user", default=None)
+
+
+def bind_user(user_id: Optional[str]):
+    """Attribute model calls in the current context to user_id."""
+    _current_user.set(user_id or None)
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    prices = MODEL_PRICES.get(model)
+    if not prices:
+        return 0.0
+    return (input_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000
+
+
+# =============================================================================
+# Aggregation
+# =============================================================================
+
+def _empty() -> dict:
+    return {"model_calls": 0, "input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+
+def _add(bucket: dict, input_tokens: int, output_tokens: int):
+    bucket["model_calls"] += 1
+    bucket["input_tokens"] += input_tokens
+    bucket["output_tokens"] += output_tokens
+    bucket["total_tokens"] += input_tokens + output_tokens
+
+
+class UsageLedger:
+    """In-memory per-thread totals plus pending deltas awaiting a flush."""
+
+    def __init__(self, max_threads: int = USAGE_MAX_THREADS):
+        self.max_threads = max_threads
+        # thread_id -> {"user_id", "cost_usd", "scopes": {scope: bucket}}
+        self.threads: "OrderedDict[str, dict]" = OrderedDict()
+        # (thread_id, scope) -> [user_id, bucket]
+        self.pending: Dict[tuple, list] = {}
+
+    def record(self, thread_id: str, user_id: Optional[str], model: str, tools: list,
+               input_tokens: int, output_tokens: int):
+        entry = self.threads.get(thread_id)
+        if entry is None:
+            entry = {"user_id": user_id, "cost_usd": 0.0, "scopes": {}}
+            self.threads[thread_id] = entry
+            if len(self.threads) > self.max_threads:
+                self.threads.popitem(last=False)
+        else:
+            self.threads.move_to_end(thread_id)
+        entry["user_id"] = entry["user_id"] or user_id
+        entry["cost_usd"] += estimate_cost(model, input_tokens, output_tokens)
+
+        for scope in ["total", f"model:{model}"] + [f"tool:{t}" for t in tools]:
+            _add(entry["scopes"].setdefault(scope, _empty()), input_tokens, output_tokens)
+            pending = self.pending.setdefault((thread_id, scope), [user_id, _empty()])
+            pending[0] = pending[0] or user_id
+            _add(pending[1], input_tokens, output_tokens)
+
+    def take_pending(self) -> Dict[tuple, list]:
+        pending, self.pending = self.pending, {}
+        return pending
+
+    def restore_pending(self, pending: Dict[tuple, list]):
+        """Merge a failed batch back so it is retried on the next flush."""
+        for key, (user_id, bucket) in pending.items():
+            current = self.pending.setdefault(key, [user_id, _empty()])
+            for field in bucket:
+                current[1][field] += bucket[field]
+
+    def heaviest(self, limit: int = 20, by: str = "thread") -> list:
+        if by == "user":
+            users: Dict[str, dict] = {}
+            for entry in self.threads.values():
+                user = users.setdefault(entry["user_id"] or "anonymous", {**_empty(), "cost_usd": 0.0, "threads": 0})
+                for field, value in entry["scopes"]["total"].items():
+                    user[field] += value
+                user["cost_usd"] += entry["cost_usd"]
+                user["threads"] += 1
+            rows = [{"user_id": k, **v} for k, v in users.items()]
+        else:
+            rows = [
+                {
+                    "thread_id": thread_id,
+                    "user_id": entry["user_id"],
+                    **entry["scopes"]["total"],
+                    "cost_usd": entry["cost_usd"],
+                    "by_scope": {k: v for k, v in entry["scopes"].items() if k != "total"},
+                }
+                for thread_id, entry in self.threads.items()
+            ]
+        rows.sort(key=lambda r: r["total_tokens"], reverse=True)
+        for row in rows[:limit]:
+            row["cost_usd"] = round(row["cost_usd"], 6)
+        return rows[:limit]
+
+
+ledger = UsageLedger()
+
+
+# =============================================================================
+# Middleware
+# =============================================================================
+
+def _usage_of(response) -> Optional[dict]:
+    messages = getattr(response, "result", None) or [response]
+    for message in reversed(messages):
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            return usage
+    return None
+
+
+def _thread_id() -> str:
+    try:
+        from langgraph.config import get_config
+        return str(get_config().get("configurable", {}).get("thread_id") or "unknown")
+    except RuntimeError:
+        return "unknown"
+
+
+def _tools_consumed(messages) -> list:
+    tools = []
+    for message in reversed(messages):
+        if getattr(message, "type", "") != "tool":
+            break
+        tools.append(getattr(message, "name", "") or "unknown")
+    return sorted(set(tools))
+
+
+class TokenUsageMiddleware(AgentMiddleware):
+    """Capture usage_metadata from every model response in the graph."""
+
+    def _record(self, request, response):
+        usage = _usage_of(response)
+        if not usage:
+            return
+        input_tokens = int(usage.get("input_tokens", 0))
+        output_tokens = int(usage.get("output_tokens", 0))
+        model = model_name_of(request.model)
+        user_id = _current_user.get() or ((request.state or {}).get("user") or {}).get("id")
+        ledger.record(_thread_id(), user_id, model, _tools_consumed(request.messages), input_tokens, output_tokens)
+        TOKENS.inc(input_tokens, model=model, direction="input")
+        TOKENS.inc(output_tokens, model=model, direction="output")
+
+    async def awrap_model_call(self, request, handler: Callable[..., Awaitable]):
+        response = await handler(request)
+        self._record(request, response)
+        return response
+
+    def wrap_model_call(self, request, handler):
+        response = handler(request)
+        self._record(request, response)
+        return response
+
+
+# =============================================================================
+# Batched Persistence
+# =============================================================================
+
+UPSERT_SQL = """
+    INSERT INTO token_usage
+        (thread_id, scope, user_id, model_calls, input_tokens, output_tokens, total_tokens)
+    VALUES %s
+    ON CONFLICT (thread_id, scope) DO UPDATE SET
+        user_id = COALESCE(token_usage.user_id, EXCLUDED.user_id),
+        model_calls = token_usage.model_calls + EXCLUDED.model_calls,
+        input_tokens = token_usage.input_tokens + EXCLUDED.input_tokens,
+        output_tokens = token_usage.output_tokens + EXCLUDED.output_tokens,
+        total_tokens = token_usage.total_tokens + EXCLUDED.total_tokens,
+        last_seen_at = NOW()
+"""
+
+
+def _write_batch(pending: Dict[tuple, list]):
+    from psycopg2.extras import execute_values
+
+    rows = [
+        (thread_id, scope, user_id, b["model_calls"], b["input_tokens"], b["output_tokens"], b["total_tokens"])
+        for (thread_id, scope), (user_id, b) in pending.items()
+    ]
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, UPSERT_SQL, rows, page_size=USAGE_FLUSH_BATCH)
+
+
+async def flush():
+    """Write pending deltas in one batch; failed batches are kept for retry."""
+    if not ledger.pending or not db.get_database_url():
+        return
+    pending = ledger.take_pending()
+    try:
+        await asyncio.to_thread(_write_batch, pending)
+    except Exception as e:
+        ledger.restore_pending(pending)
+        print(f"[USAGE] Flush failed ({len(pending)} rows kept): {e}", file=sys.stderr)
+
+
+_flush_task: Optional[asyncio.Task] = None
+
+
+async def _flush_loop():
+    last = time.monotonic()
+    while True:
+        await asyncio.sleep(1)
+        if len(ledger.pending) >= USAGE_FLUSH_BATCH or time.monotonic() - last >= USAGE_FLUSH_SECONDS:
+            await flush()
+            last = time.monotonic()
+
+
+def start_flusher():
+    global _flush_task
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_loop())
+
+
+async def stop_flusher():
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    await flush()
+
+
+def heaviest_from_db(limit: int = 20, by: str = "thread") -> list:
+    """Heaviest threads or users across all workers, from token_usage."""
+    if by == "user":
+        query = """
+            SELECT COALESCE(user_id, 'anonymous'), COUNT(*), SUM(model_calls),
+                   SUM(input_tokens), SUM(output_tokens), SUM(total_tokens)
+            FROM token_usage WHERE scope = 'total'
+            GROUP BY 1 ORDER BY 6 DESC LIMIT %s
+        """
+        keys = ("user_id", "threads", "model_calls", "input_tokens", "output_tokens", "total_tokens")
+    else:
+        query = """
+            SELECT thread_id, user_id, model_calls, input_tokens, output_tokens,
+                   total_tokens, last_seen_at
+            FROM token_usage WHERE scope = 'total'
+            ORDER BY total_tokens DESC LIMIT %s
+        """
+        keys = ("thread_id", "user_id", "model_calls", "input_tokens", "output_tokens", "total_tokens", "last_seen_at")
+
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, (limit,))
+            rows = cur.fetchall()
+    return [dict(zip(keys, row)) for row in rows]
@@ -0,0 +1,24 @@
+-- Token Usage Table
+-- Per-thread token accounting written in batches by the Python agent
+-- Run this migration against your Neon database
+
+CREATE TABLE IF NOT EXISTS token_usage (
+    thread_id VARCHAR(255) NOT NULL,             -- LangGraph thread_id (CLM user_id or AG-UI threadId)
+    scope VARCHAR(150) NOT NULL,                 -- 'total', 'model:<name>' or 'tool:<name>' (tool loop cost)
+    user_id VARCHAR(255),                        -- Neon Auth user id when known
+    model_calls INTEGER DEFAULT 0,
+    input_tokens BIGINT DEFAULT 0,
+    output_tokens BIGINT DEFAULT 0,
+    total_tokens BIGINT DEFAULT 0,
+    first_seen_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_seen_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (thread_id, scope)
+);
+
+-- Indexes for "heaviest sessions" queries
+CREATE INDEX IF NOT EXISTS idx_token_usage_total ON token_usage(total_tokens DESC) WHERE scope = 'total';
+CREATE INDEX IF NOT EXISTS idx_token_usage_user ON token_usage(user_id);
+CREATE INDEX IF NOT EXISTS idx_token_usage_last_seen ON token_usage(last_seen_at DESC);
+
+-- Verify the table
+SELECT 'token_usage table created successfully' as status;